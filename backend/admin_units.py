@@ -0,0 +1,204 @@
+"""
+Vietnamese administrative units for listing location filters.
+
+Listings store `city` and `district` as free text ("TP.HCM", "Hồ Chí Minh",
+"Q.1", "Quận 1"), and filtering used a case-insensitive $regex, so "Quận 1"
+also matched "Quận 10" and no index could help. Each property and land now
+also stores `city_code` and `district_code`, resolved here at write time;
+query parameters go through the same resolution, so filters are exact,
+index-backed equality matches.
+
+Codes are slugs of the folded canonical name: "ho-chi-minh", "quan-1",
+"binh-thanh". Provinces are looked up in the table below (with common
+abbreviations and the provincial cities listings often name instead);
+districts are normalized by stripping their type ("Quận", "Huyện", "Q.",
+"TP", "District") and leading zeros. A value the table does not know still
+gets a slug code, so it stays filterable; the migration script reports such
+values so aliases can be added.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from search_text import tokenize
+
+# Province-level units (63, as before the 2025 mergers), with aliases in any spelling
+PROVINCES: Dict[str, List[str]] = {
+    "Hà Nội": ["HN"],
+    "Hà Giang": [],
+    "Cao Bằng": [],
+    "Bắc Kạn": ["Bắc Cạn"],
+    "Tuyên Quang": [],
+    "Lào Cai": [],
+    "Điện Biên": [],
+    "Lai Châu": [],
+    "Sơn La": [],
+    "Yên Bái": [],
+    "Hòa Bình": [],
+    "Thái Nguyên": [],
+    "Lạng Sơn": [],
+    "Quảng Ninh": ["Hạ Long"],
+    "Bắc Giang": [],
+    "Phú Thọ": ["Việt Trì"],
+    "Vĩnh Phúc": [],
+    "Bắc Ninh": [],
+    "Hải Dương": [],
+    "Hải Phòng": ["HP"],
+    "Hưng Yên": [],
+    "Thái Bình": [],
+    "Hà Nam": [],
+    "Nam Định": [],
+    "Ninh Bình": [],
+    "Thanh Hóa": [],
+    "Nghệ An": ["Vinh"],
+    "Hà Tĩnh": [],
+    "Quảng Bình": ["Đồng Hới"],
+    "Quảng Trị": [],
+    "Thừa Thiên Huế": ["Huế", "TT Huế"],
+    "Đà Nẵng": ["ĐN"],
+    "Quảng Nam": ["Hội An"],
+    "Quảng Ngãi": [],
+    "Bình Định": ["Quy Nhơn"],
+    "Phú Yên": ["Tuy Hòa"],
+    "Khánh Hòa": ["Nha Trang"],
+    "Ninh Thuận": ["Phan Rang"],
+    "Bình Thuận": ["Phan Thiết"],
+    "Kon Tum": [],
+    "Gia Lai": ["Pleiku"],
+    "Đắk Lắk": ["Đắc Lắc", "Buôn Ma Thuột"],
+    "Đắk Nông": ["Đắc Nông"],
+    "Lâm Đồng": ["Đà Lạt"],
+    "Bình Phước": [],
+    "Tây Ninh": [],
+    "Bình Dương": ["Thủ Dầu Một"],
+    "Đồng Nai": ["Biên Hòa"],
+    "Bà Rịa - Vũng Tàu": ["Vũng Tàu", "BRVT", "Bà Rịa"],
+    "Hồ Chí Minh": ["HCM", "TPHCM", "Sài Gòn", "SG"],
+    "Long An": [],
+    "Tiền Giang": ["Mỹ Tho"],
+    "Bến Tre": [],
+    "Trà Vinh": [],
+    "Vĩnh Long": [],
+    "Đồng Tháp": [],
+    "An Giang": [],
+    "Kiên Giang": ["Rạch Giá", "Phú Quốc"],
+    "Cần Thơ": ["CT"],
+    "Hậu Giang": [],
+    "Sóc Trăng": [],
+    "Bạc Liêu": [],
+    "Cà Mau": [],
+}
+
+# Districts of the provinces most listings are in; others resolve by normalization alone
+DISTRICTS: Dict[str, List[str]] = {
+    "Hồ Chí Minh": [
+        "Quận 1", "Quận 2", "Quận 3", "Quận 4", "Quận 5", "Quận 6", "Quận 7", "Quận 8",
+        "Quận 9", "Quận 10", "Quận 11", "Quận 12", "Bình Thạnh", "Gò Vấp", "Phú Nhuận",
+        "Tân Bình", "Tân Phú", "Bình Tân", "Thủ Đức", "Củ Chi", "Hóc Môn", "Bình Chánh",
+        "Nhà Bè", "Cần Giờ",
+    ],
+    "Hà Nội": [
+        "Ba Đình", "Hoàn Kiếm", "Tây Hồ", "Long Biên", "Cầu Giấy", "Đống Đa", "Hai Bà Trưng",
+        "Hoàng Mai", "Thanh Xuân", "Nam Từ Liêm", "Bắc Từ Liêm", "Hà Đông", "Sơn Tây",
+        "Sóc Sơn", "Đông Anh", "Gia Lâm", "Thanh Trì", "Mê Linh", "Ba Vì", "Phúc Thọ",
+        "Đan Phượng", "Hoài Đức", "Quốc Oai", "Thạch Thất", "Chương Mỹ", "Thanh Oai",
+        "Thường Tín", "Phú Xuyên", "Ứng Hòa", "Mỹ Đức",
+    ],
+    "Đà Nẵng": [
+        "Hải Châu", "Thanh Khê", "Sơn Trà", "Ngũ Hành Sơn", "Liên Chiểu", "Cẩm Lệ",
+        "Hòa Vang", "Hoàng Sa",
+    ],
+    "Hải Phòng": [
+        "Hồng Bàng", "Ngô Quyền", "Lê Chân", "Hải An", "Kiến An", "Đồ Sơn", "Dương Kinh",
+        "Thủy Nguyên", "An Dương", "An Lão", "Kiến Thụy", "Tiên Lãng", "Vĩnh Bảo", "Cát Hải",
+        "Bạch Long Vĩ",
+    ],
+    "Cần Thơ": [
+        "Ninh Kiều", "Bình Thủy", "Cái Răng", "Ô Môn", "Thốt Nốt", "Phong Điền", "Cờ Đỏ",
+        "Thới Lai", "Vĩnh Thạnh",
+    ],
+}
+
+# Leading words naming the kind of unit rather than the unit itself
+_CITY_PREFIXES = (("thanh", "pho"), ("tp",), ("tinh",))
+_DISTRICT_PREFIXES = (("thanh", "pho"), ("thi", "xa"), ("tp",), ("tx",), ("quan",), ("huyen",), ("q",), ("h",))
+# Only urban districts (quận) are numbered
+_NUMBERED_PREFIXES = ("quan", "q", "district")
+_NUMBERED = re.compile(r"q?(\d+)")
+
+
+def _strip(tokens: List[str], prefixes) -> List[str]:
+    for prefix in prefixes:
+        if tuple(tokens[:len(prefix)]) == prefix and len(tokens) > len(prefix):
+            return tokens[len(prefix):]
+    return tokens
+
+
+def _city_key(value: str) -> Optional[str]:
+    tokens = _strip(tokenize(value), _CITY_PREFIXES)
+    return "-".join(tokens) or None
+
+
+def _build_city_codes() -> Dict[str, str]:
+    codes = {}
+    for name, aliases in PROVINCES.items():
+        code = _city_key(name)
+        for alias in [name, *aliases]:
+            key = _city_key(alias)
+            codes[key] = code
+            codes[key.replace("-", "")] = code  # "hochiminh", "tphcm", "danang"
+    return codes
+
+
+_CITY_CODES = _build_city_codes()
+_PROVINCE_CODES = set(_CITY_CODES.values())
+
+
+def city_code(value: Optional[str]) -> Optional[str]:
+    """Province code for a city name: "TP.HCM", "Sài Gòn" and "Hồ Chí Minh" -> "ho-chi-minh" """
+    if not isinstance(value, str):
+        return None
+    key = _city_key(value)
+    if key is None:
+        return None
+    return _CITY_CODES.get(key) or _CITY_CODES.get(key.replace("-", "")) or key
+
+
+def district_code(value: Optional[str]) -> Optional[str]:
+    """District code for a district name: "Q.1", "Quận 01" and "District 1" -> "quan-1" """
+    if not isinstance(value, str):
+        return None
+    tokens = tokenize(value)
+    if len(tokens) > 1 and tokens[-1] == "district":
+        tokens = tokens[:-1]  # "Binh Thanh District"
+    if len(tokens) == 2 and tokens[0] in _NUMBERED_PREFIXES:
+        tokens = tokens[1:]
+    number = _NUMBERED.fullmatch(tokens[0]) if len(tokens) == 1 else None
+    if number:
+        return f"quan-{int(number.group(1))}"
+    return "-".join(_strip(tokens, _DISTRICT_PREFIXES)) or None
+
+
+_KNOWN_DISTRICTS = {
+    city_code(city): {district_code(name) for name in names} for city, names in DISTRICTS.items()
+}
+
+
+def is_known(city: Optional[str], district: Optional[str] = None) -> bool:
+    """Whether a city (and district, if given) resolve to units in the table"""
+    code = city_code(city)
+    if code not in _PROVINCE_CODES:
+        return False
+    if district is None or code not in _KNOWN_DISTRICTS:
+        return True
+    return district_code(district) in _KNOWN_DISTRICTS[code]
+
+
+def location_codes(doc: dict) -> dict:
+    """city_code/district_code for the city/district fields present in a document or update"""
+    codes = {}
+    if "city" in doc:
+        codes["city_code"] = city_code(doc["city"])
+    if "district" in doc:
+        codes["district_code"] = district_code(doc["district"])
+    return codes
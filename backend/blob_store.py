@@ -0,0 +1,308 @@
+"""
+Content-addressed blob storage for listing images, news images and avatars.
+
+Blobs are keyed by the SHA-256 of their bytes, so an image is stored once no
+matter how many documents reference it. Documents keep only the media URL
+(/api/media/<sha256>); the bytes live on the local filesystem (default) or in
+GridFS, and a small `blobs` collection records content type and size.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+MEDIA_URL_PREFIX = "/api/media/"
+BLOB_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+DATA_URL_RE = re.compile(r"^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(?:;[\w=.-]+)*;base64,", re.IGNORECASE)
+
+# Magic numbers for images sent as bare base64 without a data: prefix
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+IMAGE_CONTENT_TYPES = {"image/png", "image/jpeg", "image/gif", "image/webp"}
+DEFAULT_MAX_INLINE_SIZE = 10 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class InvalidBlobData(ValueError):
+    """Raised when an inline image value cannot be decoded"""
+
+def sniff_content_type(data: bytes) -> str:
+    """Guess an image content type from its leading bytes"""
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+def blob_url(blob_id: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{blob_id}"
+
+def is_inline_image(value: str) -> bool:
+    """True for data: URLs and for bare base64 that starts like an image"""
+    if not value:
+        return False
+    if value[:5].lower() == "data:":
+        return True
+    try:
+        # 24 base64 characters decode to the 18 leading bytes the signatures need
+        head = base64.b64decode("".join(value[:64].split())[:24], validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    return sniff_content_type(head) in IMAGE_CONTENT_TYPES
+
+def decode_inline_image(value: str, max_size: int = DEFAULT_MAX_INLINE_SIZE):
+    """Decode a data: URL or bare base64 string into (bytes, content_type).
+
+    The content type is sniffed from the bytes; the one declared in a data:
+    URL is ignored, since media is served back under the stored type.
+    """
+    match = DATA_URL_RE.match(value)
+    if value[:5].lower() == "data:" and not match:
+        raise InvalidBlobData("Only base64 data: URLs are supported")
+    payload = "".join((value[match.end():] if match else value).split())
+    if len(payload) // 4 * 3 > max_size:
+        raise InvalidBlobData(f"Image exceeds {max_size} bytes")
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidBlobData(f"Invalid base64 image data: {e}")
+    if not data:
+        raise InvalidBlobData("Empty image data")
+    content_type = sniff_content_type(data)
+    if content_type not in IMAGE_CONTENT_TYPES:
+        raise InvalidBlobData("Image data is not a PNG, JPEG, GIF or WebP image")
+    return data, content_type
+
+
+class BlobStore(ABC):
+    """Base class; subclasses store bytes, metadata goes to the `blobs` collection"""
+
+    def __init__(self, db, max_inline_size: int = DEFAULT_MAX_INLINE_SIZE):
+        self.db = db
+        self.max_inline_size = max_inline_size
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        """Store bytes once and return their blob ID (SHA-256 hex digest)"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        if not await self.exists(blob_id):
+            await self._write(blob_id, data)
+        await self._record(blob_id, content_type, len(data))
+        return blob_id
+
+    def writer(self) -> "BlobWriter":
+        """Start an incremental write, for uploads streamed in chunks"""
+        return BlobWriter(self)
+
+    async def _record(self, blob_id: str, content_type: str, size: int):
+        await self.db.blobs.update_one(
+            {"id": blob_id},
+            {"$setOnInsert": {
+                "id": blob_id,
+                "content_type": content_type,
+                "size": size,
+                "created_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    async def get_metadata(self, blob_id: str) -> Optional[dict]:
+        return await self.db.blobs.find_one({"id": blob_id}, {"_id": 0})
+
+    async def store_image(self, value: Optional[str]) -> Optional[str]:
+        """Move an inline (base64) image into the store, returning its media URL.
+
+        Blob IDs returned by the upload endpoint resolve to their URL; URLs,
+        including ones already pointing at the store, pass through unchanged.
+        """
+        if value and BLOB_ID_RE.match(value):
+            if not await self.get_metadata(value):
+                raise InvalidBlobData(f"Unknown blob ID: {value}")
+            return blob_url(value)
+        if not value or not is_inline_image(value):
+            return value
+        data, content_type = decode_inline_image(value, self.max_inline_size)
+        blob_id = await self.put(data, content_type)
+        return blob_url(blob_id)
+
+    async def store_images(self, values: Optional[List[str]]) -> Optional[List[str]]:
+        if values is None:
+            return None
+        return [await self.store_image(value) for value in values]
+
+    @abstractmethod
+    async def exists(self, blob_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def _write(self, blob_id: str, data: bytes):
+        ...
+
+    @abstractmethod
+    async def _write_from_file(self, blob_id: str, tmp_path: str):
+        """Move a fully written temp file into the store, taking ownership of it"""
+
+    def staging_dir(self) -> Optional[Path]:
+        """Directory for in-progress uploads (None for the system temp dir)"""
+        return None
+
+    def local_path(self, blob_id: str) -> Optional[Path]:
+        """Filesystem path of a blob, for backends that can serve files directly"""
+        return None
+
+    @abstractmethod
+    def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        """Iterate over the blob's bytes in chunks"""
+
+
+class LocalBlobStore(BlobStore):
+    """Stores blobs as files under root/ab/cd/<sha256>"""
+
+    def __init__(self, db, root: Path, **kwargs):
+        super().__init__(db, **kwargs)
+        self.root = Path(root)
+
+    def local_path(self, blob_id: str) -> Path:
+        return self.root / blob_id[:2] / blob_id[2:4] / blob_id
+
+    async def exists(self, blob_id: str) -> bool:
+        return await asyncio.to_thread(self.local_path(blob_id).exists)
+
+    def _write_file(self, blob_id: str, data: bytes):
+        path = self.local_path(blob_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def _write(self, blob_id: str, data: bytes):
+        await asyncio.to_thread(self._write_file, blob_id, data)
+
+    def staging_dir(self) -> Path:
+        # Same filesystem as the blobs, so committing an upload is a rename
+        return self.root / ".incoming"
+
+    def _move_file(self, blob_id: str, tmp_path: str):
+        path = self.local_path(blob_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+
+    async def _write_from_file(self, blob_id: str, tmp_path: str):
+        await asyncio.to_thread(self._move_file, blob_id, tmp_path)
+
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        file = await asyncio.to_thread(self.local_path(blob_id).open, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(file.read, STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(file.close)
+
+
+class GridFSBlobStore(BlobStore):
+    """Stores blobs in a GridFS bucket, using the blob ID as filename"""
+
+    def __init__(self, db, bucket_name: str = "media", **kwargs):
+        super().__init__(db, **kwargs)
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f"{bucket_name}.files"]
+
+    async def exists(self, blob_id: str) -> bool:
+        return await self.files.find_one({"filename": blob_id}, {"_id": 1}) is not None
+
+    async def _write(self, blob_id: str, data: bytes):
+        await self.bucket.upload_from_stream(blob_id, data)
+
+    async def _write_from_file(self, blob_id: str, tmp_path: str):
+        try:
+            with open(tmp_path, "rb") as f:
+                await self.bucket.upload_from_stream(blob_id, f)
+        finally:
+            os.unlink(tmp_path)
+
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream_by_name(blob_id)
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+
+class BlobWriter:
+    """Writes a blob chunk by chunk to a temp file, hashing as it goes.
+
+    Nothing is visible in the store until commit(); abort() discards the data.
+    """
+
+    def __init__(self, store: BlobStore):
+        self.store = store
+        self.size = 0
+        self.head = b""
+        self._hash = hashlib.sha256()
+        staging = store.staging_dir()
+        if staging is not None:
+            staging.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=staging, prefix="upload-")
+        self._file = os.fdopen(fd, "wb")
+
+    async def write(self, data: bytes):
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self._hash.update(data)
+        self.size += len(data)
+        await asyncio.to_thread(self._file.write, data)
+
+    @property
+    def content_type(self) -> str:
+        return sniff_content_type(self.head)
+
+    async def commit(self) -> str:
+        """Move the written data into the store and return its blob ID"""
+        self._file.close()
+        blob_id = self._hash.hexdigest()
+        if await self.store.exists(blob_id):
+            os.unlink(self.tmp_path)
+        else:
+            await self.store._write_from_file(blob_id, self.tmp_path)
+        await self.store._record(blob_id, self.content_type, self.size)
+        return blob_id
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+def create_blob_store(db, backend: str, media_root: Path,
+                      max_inline_size: int = DEFAULT_MAX_INLINE_SIZE) -> BlobStore:
+    """Build the blob store selected by BLOB_BACKEND ("local" or "gridfs")"""
+    if backend == "gridfs":
+        return GridFSBlobStore(db, max_inline_size=max_inline_size)
+    if backend != "local":
+        raise ValueError(f"Unknown BLOB_BACKEND: {backend}")
+    return LocalBlobStore(db, media_root, max_inline_size=max_inline_size)
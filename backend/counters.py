@@ -0,0 +1,184 @@
+"""
+Materialized entity counters.
+
+The public /stats endpoint used to count properties, sims, lands, news and
+tickets on every call. The `counters` collection now holds one document per
+entity: the total plus a count per value of each tracked field, e.g.
+
+    {"id": "properties", "total": 120,
+     "status": {"for_sale": 80, "for_rent": 30, ...},
+     "city": {"Hà Nội": 70, ...}}
+
+Create, update, delete and approval handlers adjust them with $inc. Updates
+and deletes read the previous values atomically (find_one_and_update /
+find_one_and_delete with ReturnDocument.BEFORE), so a write moves exactly one
+document between buckets. A periodic job recounts every entity to correct
+drift from writes made outside the API (scripts, the shell, a crash between
+the write and the $inc). Every $inc also bumps the document's `version`; the
+recount applies its correction as a $inc of the difference, conditional on
+the version it started from, and starts over if a write landed meanwhile.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Missing, null and empty-string values are counted under this key
+NONE_KEY = "none"
+
+# Recounts of one entity that may be discarded because of concurrent writes before giving up
+RECONCILE_ATTEMPTS = 3
+
+# '.' and a leading '$' are not allowed in $inc paths; stored as their fullwidth forms
+_ESCAPES = {".": "\uff0e", "$": "\uff04"}
+
+
+def counter_key(value) -> str:
+    """Field name under which a tracked value is counted"""
+    if isinstance(value, Enum):
+        value = value.value
+    if value is None or value == "":
+        return NONE_KEY  # "" would make the path "field.", which $inc rejects
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    key = str(value).replace(".", _ESCAPES["."])
+    if key.startswith("$"):
+        key = _ESCAPES["$"] + key[1:]
+    return key
+
+
+def counter_value(key: str) -> Optional[str]:
+    """Inverse of counter_key for string values"""
+    if key == NONE_KEY:
+        return None
+    if key.startswith(_ESCAPES["$"]):
+        key = "$" + key[1:]
+    return key.replace(_ESCAPES["."], ".")
+
+
+class Counters:
+    """Totals and per-field counts for a fixed set of collections"""
+
+    def __init__(self, db, tracked: Dict[str, Tuple[str, ...]], reconcile_interval: float = 3600.0):
+        self.db = db
+        self.tracked = tracked  # collection name -> fields counted by value
+        self.reconcile_interval = reconcile_interval
+        self.stats = {"increments": 0, "reconciled": 0, "drift_corrected": 0, "reconcile_conflicts": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def projection(self, entity: str) -> dict:
+        """Fields needed to move a document between counters"""
+        return {"_id": 0, **{field: 1 for field in self.tracked[entity]}}
+
+    async def _inc(self, entity: str, inc: dict):
+        inc = {path: delta for path, delta in inc.items() if delta}
+        if not inc:
+            return
+        await self.db.counters.update_one({"id": entity}, {"$inc": {**inc, "version": 1}}, upsert=True)
+        self.stats["increments"] += 1
+
+    def _paths(self, entity: str, doc: dict, delta: int) -> dict:
+        return {f"{field}.{counter_key(doc.get(field))}": delta for field in self.tracked[entity]}
+
+    async def created(self, entity: str, doc: dict):
+        await self._inc(entity, {"total": 1, **self._paths(entity, doc, 1)})
+
+    async def deleted(self, entity: str, doc: dict):
+        await self._inc(entity, {"total": -1, **self._paths(entity, doc, -1)})
+
+    async def updated(self, entity: str, before: dict, changes: dict):
+        """Move counts for tracked fields that `changes` sets to a different value"""
+        inc: Dict[str, int] = {}
+        for field in self.tracked[entity]:
+            if field not in changes:
+                continue
+            old, new = counter_key(before.get(field)), counter_key(changes[field])
+            if old != new:
+                inc[f"{field}.{old}"] = inc.get(f"{field}.{old}", 0) - 1
+                inc[f"{field}.{new}"] = inc.get(f"{field}.{new}", 0) + 1
+        await self._inc(entity, inc)
+
+    async def read(self) -> Dict[str, dict]:
+        """All counter documents keyed by entity, in one query"""
+        counters = {entity: {"total": 0} for entity in self.tracked}
+        async for doc in self.db.counters.find({"id": {"$in": list(self.tracked)}}, {"_id": 0}):
+            counters[doc["id"]] = doc
+        return counters
+
+    async def _recount(self, entity: str) -> dict:
+        collection = self.db[entity]
+        counts = {"total": await collection.count_documents({})}
+        for field in self.tracked[entity]:
+            counts[field] = {}
+            async for row in collection.aggregate([{"$group": {"_id": f"${field}", "n": {"$sum": 1}}}]):
+                key = counter_key(row["_id"])
+                counts[field][key] = counts[field].get(key, 0) + row["n"]
+        return counts
+
+    async def _reconcile_entity(self, entity: str) -> bool:
+        """Recount one entity and correct its counters; False if a write raced the recount"""
+        previous = await self.db.counters.find_one({"id": entity}, {"_id": 0}) or {}
+        counts = await self._recount(entity)
+
+        inc = {"total": counts["total"] - previous.get("total", 0)}
+        for field in self.tracked[entity]:
+            stored = previous.get(field) or {}
+            for key in counts[field].keys() | stored.keys():
+                inc[f"{field}.{key}"] = counts[field].get(key, 0) - stored.get(key, 0)
+        inc = {path: delta for path, delta in inc.items() if delta}
+        if "version" in previous:
+            version = previous["version"]
+        else:
+            version = {"$exists": False}
+        try:
+            result = await self.db.counters.update_one(
+                {"id": entity, "version": version},
+                {"$inc": {**inc, "version": 1}, "$set": {"reconciled_at": datetime.utcnow()}},
+                upsert=not previous
+            )
+        except DuplicateKeyError:
+            return False  # the document was created concurrently
+        if not previous or result.matched_count:
+            if previous and inc.get("total"):
+                self.stats["drift_corrected"] += 1
+                logger.warning(f"Counter drift for {entity}: {previous.get('total', 0)} -> {counts['total']}")
+            return True
+        return False
+
+    async def reconcile(self):
+        """Recount every entity and correct its counter document by the difference"""
+        for entity in self.tracked:
+            for _ in range(RECONCILE_ATTEMPTS):
+                if await self._reconcile_entity(entity):
+                    break
+            else:
+                self.stats["reconcile_conflicts"] += 1
+                logger.warning(f"Counters for {entity} kept changing during recount; retrying next run")
+        self.stats["reconciled"] += 1
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Counter reconciliation failed")
+            await asyncio.sleep(self.reconcile_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
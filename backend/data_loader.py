@@ -0,0 +1,84 @@
+"""
+Request-scoped batching loader for documents referenced by ID.
+
+Handlers call `await loader.load("users", user_id)` instead of find_one. Loads
+requested in the same event-loop tick (for example from asyncio.gather, or a
+load_many over a page of rows) are coalesced into one `{"id": {"$in": ...}}`
+query per collection, and every result is memoized for the rest of the
+request, so the same user or listing is never fetched twice. A loader lives
+for one request only; use clear() after writing a document that will be read
+again in the same request.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PROJECTION = {"_id": 0}
+
+
+class DataLoader:
+    """Coalesces and memoizes `load(collection, id)` calls"""
+
+    def __init__(self, db, projections: Optional[Dict[str, dict]] = None):
+        self.db = db
+        self.projections = projections or {}
+        self._cache: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._queue: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._scheduled = False
+        self._tasks = set()
+        self.queries = 0
+
+    def load(self, collection: str, doc_id: str) -> "asyncio.Future[Optional[dict]]":
+        """Awaitable resolving to the document with this ID, or None"""
+        key = (collection, doc_id)
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[key] = loop.create_future()
+            self._queue.setdefault(collection, []).append((doc_id, future))
+            if not self._scheduled:
+                self._scheduled = True
+                loop.call_soon(self._dispatch)
+        return future
+
+    async def load_many(self, collection: str, doc_ids: Iterable[str]) -> Dict[str, dict]:
+        """Documents for the given IDs keyed by ID; missing IDs are left out"""
+        doc_ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+        docs = await asyncio.gather(*(self.load(collection, doc_id) for doc_id in doc_ids))
+        return {doc_id: doc for doc_id, doc in zip(doc_ids, docs) if doc is not None}
+
+    def prime(self, collection: str, doc: dict):
+        """Seed the cache with a document the handler already has"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(doc)
+        self._cache[(collection, doc["id"])] = future
+
+    def clear(self, collection: str, doc_id: str):
+        """Forget a memoized document, e.g. after updating it"""
+        self._cache.pop((collection, doc_id), None)
+
+    def _dispatch(self):
+        self._scheduled = False
+        queue, self._queue = self._queue, {}
+        for collection, pending in queue.items():
+            task = asyncio.ensure_future(self._fetch(collection, pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, collection: str, pending: List[Tuple[str, asyncio.Future]]):
+        doc_ids = list({doc_id for doc_id, _ in pending})
+        projection = self.projections.get(collection, DEFAULT_PROJECTION)
+        self.queries += 1
+        try:
+            docs = await self.db[collection].find({"id": {"$in": doc_ids}}, projection).to_list(len(doc_ids))
+        except Exception as e:
+            for doc_id, future in pending:
+                if self._cache.get((collection, doc_id)) is future:
+                    del self._cache[(collection, doc_id)]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        found = {doc["id"]: doc for doc in docs}
+        for doc_id, future in pending:
+            if not future.done():
+                future.set_result(found.get(doc_id))
@@ -0,0 +1,149 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+A sketch of precision p keeps 2**p one-byte registers, holding the longest run
+of leading zero bits seen among the 64-bit hashes routed to each register.
+Sketches of the same precision merge by taking the register-wise maximum, so
+per-bucket sketches can be stored once and combined for any time range.
+
+Small sketches are kept sparse (register index -> rank) until they fill up, so
+the many page/hour buckets with a handful of visitors stay cheap in memory and
+in Mongo.
+
+Error bound: the relative standard error is 1.04 / sqrt(2**p). At the default
+precision of 12 a sketch is at most 4 KiB and a count is within 1.6% of the
+true value about 68% of the time and within 3.3% about 95% of the time, no
+matter how many distinct values were added. Merging adds no further error: the
+union of sketches is exactly the sketch of the union.
+"""
+
+import hashlib
+import math
+from typing import Dict, Iterable, Optional
+
+DEFAULT_PRECISION = 12
+
+_DENSE = 0
+_SPARSE = 1
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+def hash_value(value: str) -> int:
+    """64-bit hash of a value, shared by every sketch so they stay mergeable"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+def standard_error(precision: int = DEFAULT_PRECISION) -> float:
+    """Relative standard error of a count: 1.04 / sqrt(2**precision)"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"Precision must be between 4 and 16, got {precision}")
+        self.precision = precision
+        self.m = 1 << precision
+        self._shift = 64 - precision
+        self._mask = (1 << self._shift) - 1
+        self._sparse: Optional[Dict[int, int]] = {}
+        self._dense: Optional[bytearray] = None
+
+    def _densify(self):
+        dense = bytearray(self.m)
+        for index, rank in self._sparse.items():
+            dense[index] = rank
+        self._dense, self._sparse = dense, None
+
+    def add_hash(self, hashed: int):
+        index = hashed >> self._shift
+        rank = self._shift - (hashed & self._mask).bit_length() + 1
+        if self._dense is not None:
+            if rank > self._dense[index]:
+                self._dense[index] = rank
+        elif rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+            if len(self._sparse) > self.m // 64:
+                self._densify()
+
+    def add(self, value: str):
+        self.add_hash(hash_value(value))
+
+    def merge(self, other: "HyperLogLog"):
+        """Fold another sketch into this one (union of the counted sets)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        if other._dense is not None:
+            if self._dense is None:
+                self._densify()
+            self._dense = bytearray(map(max, self._dense, other._dense))
+        else:
+            for index, rank in other._sparse.items():
+                if self._dense is not None:
+                    if rank > self._dense[index]:
+                        self._dense[index] = rank
+                elif rank > self._sparse.get(index, 0):
+                    self._sparse[index] = rank
+            if self._sparse is not None and len(self._sparse) > self.m // 64:
+                self._densify()
+
+    def count(self) -> int:
+        """Estimated number of distinct values added"""
+        m = self.m
+        if self._dense is not None:
+            registers = self._dense
+            zeros = registers.count(0)
+            harmonic = sum(_INVERSE_POWERS[rank] for rank in registers)
+        else:
+            zeros = m - len(self._sparse)
+            harmonic = zeros + sum(_INVERSE_POWERS[rank] for rank in self._sparse.values())
+
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / harmonic
+        # Linear counting is more accurate while many registers are still empty
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def to_bytes(self) -> bytes:
+        """Serialize as [precision, encoding] + dense registers or sparse (index, rank) triples"""
+        if self._dense is not None:
+            nonzero = {index: rank for index, rank in enumerate(self._dense) if rank}
+        else:
+            nonzero = self._sparse
+        if len(nonzero) * 3 < self.m:
+            body = b"".join(index.to_bytes(2, "big") + bytes((rank,)) for index, rank in sorted(nonzero.items()))
+            return bytes((self.precision, _SPARSE)) + body
+        dense = self._dense if self._dense is not None else bytearray(self.m)
+        if self._dense is None:
+            for index, rank in nonzero.items():
+                dense[index] = rank
+        return bytes((self.precision, _DENSE)) + bytes(dense)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        body = data[2:]
+        if data[1] == _DENSE:
+            if len(body) != sketch.m:
+                raise ValueError("Dense sketch has the wrong number of registers")
+            sketch._dense, sketch._sparse = bytearray(body), None
+        elif data[1] == _SPARSE:
+            for offset in range(0, len(body), 3):
+                sketch._sparse[int.from_bytes(body[offset:offset + 2], "big")] = body[offset + 2]
+            if len(sketch._sparse) > sketch.m // 64:
+                sketch._densify()
+        else:
+            raise ValueError(f"Unknown sketch encoding: {data[1]}")
+        return sketch
+
+    @classmethod
+    def union(cls, sketches: Iterable["HyperLogLog"], precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        merged = cls(precision)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
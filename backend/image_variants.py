@@ -0,0 +1,148 @@
+"""
+Responsive image variants for stored blobs.
+
+Every listing image gets a thumbnail, a card-size and a detail-size rendition in
+WebP and JPEG, with EXIF metadata stripped. Rendering is CPU-bound, so it runs
+in a ProcessPoolExecutor instead of on the event loop; results are cached on
+disk next to the original and served from /api/media/<sha256>/<variant>.<ext>.
+"""
+
+import asyncio
+import io
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from PIL import Image, ImageOps
+
+from blob_store import IMAGE_CONTENT_TYPES, MEDIA_URL_PREFIX, BLOB_ID_RE, BlobStore
+
+# Longest edge in pixels for each variant
+VARIANT_SIZES = {"thumb": 320, "card": 640, "detail": 1280}
+VARIANT_FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+VARIANT_QUALITY = 80
+VARIANT_FILE_RE = re.compile(r"^(?P<variant>thumb|card|detail)\.(?P<ext>webp|jpg)$")
+
+
+def variant_file_path(root: Path, blob_id: str, variant: str, ext: str) -> Path:
+    return root / blob_id[:2] / blob_id[2:4] / f"{blob_id}.{variant}.{ext}"
+
+def render_variants(source: Union[str, bytes], root: str, blob_id: str):
+    """Render every variant of one image. Runs in a worker process."""
+    image = Image.open(source if isinstance(source, str) else io.BytesIO(source))
+    # Apply the EXIF orientation, then drop all metadata by re-encoding pixels only
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    for variant, max_edge in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        for ext, (pil_format, _) in VARIANT_FORMATS.items():
+            frame = resized.convert("RGB") if pil_format == "JPEG" else resized
+            path = variant_file_path(Path(root), blob_id, variant, ext)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    frame.save(f, pil_format, quality=VARIANT_QUALITY, optimize=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+
+class VariantGenerator:
+    """Schedules variant rendering on a process pool and de-duplicates work per blob"""
+
+    def __init__(self, store: BlobStore, cache_root: Path, max_workers: Optional[int] = None):
+        self.store = store
+        self.cache_root = Path(cache_root)
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def path(self, blob_id: str, variant: str, ext: str) -> Path:
+        return variant_file_path(self.cache_root, blob_id, variant, ext)
+
+    def is_rendered(self, blob_id: str) -> bool:
+        return all(
+            self.path(blob_id, variant, ext).exists()
+            for variant in VARIANT_SIZES for ext in VARIANT_FORMATS
+        )
+
+    async def ensure(self, blob_id: str) -> bool:
+        """Render the variants of a blob unless they are cached; False if it is not an image"""
+        if await asyncio.to_thread(self.is_rendered, blob_id):
+            return True
+        if blob_id in self._pending:
+            return await asyncio.shield(self._pending[blob_id])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[blob_id] = future
+        try:
+            result = await self._render(blob_id)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._pending[blob_id]
+
+    async def _render(self, blob_id: str) -> bool:
+        metadata = await self.store.get_metadata(blob_id)
+        if not metadata or metadata["content_type"] not in IMAGE_CONTENT_TYPES:
+            return False
+        local_path = self.store.local_path(blob_id)
+        if local_path is not None:
+            source = str(local_path)
+        else:
+            source = b"".join([chunk async for chunk in self.store.stream(blob_id)])
+        self.start()
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, render_variants, source, str(self.cache_root), blob_id
+        )
+        return True
+
+    def schedule(self, blob_id: str):
+        """Render variants in the background, e.g. right after an image is stored"""
+        task = asyncio.create_task(self.ensure(blob_id))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def blob_id_from_url(url: Optional[str]) -> Optional[str]:
+    if not url or not url.startswith(MEDIA_URL_PREFIX):
+        return None
+    blob_id = url[len(MEDIA_URL_PREFIX):]
+    return blob_id if BLOB_ID_RE.match(blob_id) else None
+
+def variant_urls(url: str) -> Dict[str, Optional[str]]:
+    """Variant URLs (WebP) for an image URL; swap .webp for .jpg to get JPEG.
+
+    Images that are not in the blob store (external URLs, legacy inline data)
+    have no variants.
+    """
+    blob_id = blob_id_from_url(url)
+    urls = {"original": url}
+    for variant in VARIANT_SIZES:
+        urls[variant] = f"{url}/{variant}.webp" if blob_id else None
+    return urls
@@ -0,0 +1,175 @@
+"""
+Retention tiers for analytics pageviews.
+
+  raw pageviews     kept `retention_days`, then removed by a TTL index on timestamp
+  hourly rollups    kept `hourly_retention_days` (TTL on expires_at)
+  daily rollups     kept indefinitely - the per-page daily aggregates
+  archive           optional gzipped NDJSON file per day of raw pageviews
+
+Raw pageviews must be compacted into the rollups before the TTL monitor can
+delete them. The rollup job normally trails by a couple of minutes; this job
+also brings it up to date and writes each complete day to the archive well
+before it expires. Another worker may hold the rollup lease, so catching up is
+not guaranteed: each run checks that every pageview the TTL index could
+delete before the next run is already rolled up (and archived), and drops the
+TTL index when it is not, recreating it once the rollups have caught up.
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from pymongo import ASCENDING
+
+from traffic_rollups import TrafficRollups, bucket_start
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_STATE_ID = "pageview_archive"
+ARCHIVE_BATCH = 1000
+# Name of the TTL index on pageviews.timestamp
+TTL_INDEX_NAME = "timestamp_1"
+
+
+def archive_path(archive_dir: Path, day: datetime) -> Path:
+    return archive_dir / f"pageviews-{day:%Y-%m-%d}.ndjson.gz"
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    return str(value)
+
+
+class PageviewRetention:
+    """Compacts pageviews into rollups ahead of TTL expiry and archives raw days to disk"""
+
+    def __init__(self, db, rollups: TrafficRollups, retention_days: int = 30,
+                 archive_dir: Optional[Path] = None, interval: float = 3600.0):
+        self.db = db
+        self.rollups = rollups
+        self.retention_days = retention_days
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self.retention_days * 86400
+
+    async def archived_through(self) -> Optional[datetime]:
+        """Start of the first day not yet archived"""
+        state = await self.db.rollup_state.find_one({"id": ARCHIVE_STATE_ID}, {"_id": 0, "archived_through": 1})
+        return state.get("archived_through") if state else None
+
+    async def run_once(self) -> bool:
+        """Compact everything the rollups have not seen yet, then archive finished days.
+
+        Returns whether pageviews may expire, i.e. the TTL index may exist.
+        """
+        await self.rollups.run_once()
+        if self.archive_dir is not None:
+            await self._archive_pending_days()
+        return await self.expiry_safe()
+
+    async def expiry_safe(self) -> bool:
+        """Whether every pageview the TTL index could delete before the next run is rolled up (and archived)"""
+        horizon = datetime.utcnow() - timedelta(seconds=self.ttl_seconds - self.interval)
+        marks = [await self.rollups.watermark()]
+        if self.archive_dir is not None:
+            marks.append(await self.archived_through())
+        covered = None if None in marks else min(marks)
+        if covered is not None and covered >= horizon:
+            return True
+        # Behind, but nothing is at risk unless an uncovered pageview is old enough to expire
+        at_risk = {"$lt": horizon} if covered is None else {"$gte": covered, "$lt": horizon}
+        return await self.db.pageviews.find_one({"timestamp": at_risk}, {"_id": 1}) is None
+
+    async def apply_expiry(self, safe: bool):
+        """Drop the TTL index while expiry is unsafe and recreate it once it is safe again"""
+        indexes = await self.db.pageviews.index_information()
+        if not safe and TTL_INDEX_NAME in indexes:
+            logger.warning("Pageview rollups are behind the retention window; suspending pageview expiry")
+            await self.db.pageviews.drop_index(TTL_INDEX_NAME)
+        elif safe and TTL_INDEX_NAME not in indexes:
+            logger.info("Pageview rollups caught up; resuming pageview expiry")
+            await self.db.pageviews.create_index(
+                [("timestamp", ASCENDING)], name=TTL_INDEX_NAME, expireAfterSeconds=self.ttl_seconds
+            )
+
+    async def _archive_pending_days(self):
+        day = await self.archived_through()
+        if day is None:
+            oldest = await self.db.pageviews.find({}, {"timestamp": 1}).sort("timestamp", 1).limit(1).to_list(1)
+            if not oldest:
+                return
+            day = bucket_start(oldest[0]["timestamp"], "day")
+
+        # Only whole days that are already in the rollups, so late writes are not missed
+        watermark = await self.rollups.watermark()
+        if watermark is None:
+            return
+        while day + timedelta(days=1) <= watermark:
+            count = await self._archive_day(day)
+            day += timedelta(days=1)
+            await self.db.rollup_state.update_one(
+                {"id": ARCHIVE_STATE_ID}, {"$set": {"archived_through": day}}, upsert=True
+            )
+            if count:
+                logger.info(f"Archived {count} pageviews for {day - timedelta(days=1):%Y-%m-%d}")
+
+    async def _archive_day(self, day: datetime) -> int:
+        """Stream one day of raw pageviews into a gzipped NDJSON file"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = archive_path(self.archive_dir, day)
+        fd, tmp_path = tempfile.mkstemp(dir=self.archive_dir, prefix=".tmp-")
+        count = 0
+        try:
+            with gzip.open(os.fdopen(fd, "wb"), "wt", encoding="utf-8") as f:
+                lines = []
+                async for pageview in self.db.pageviews.find(
+                    {"timestamp": {"$gte": day, "$lt": day + timedelta(days=1)}}, {"_id": 0}
+                ).sort("timestamp", 1).batch_size(ARCHIVE_BATCH):
+                    lines.append(json.dumps(pageview, default=_json_default, ensure_ascii=False) + "\n")
+                    if len(lines) >= ARCHIVE_BATCH:
+                        await asyncio.to_thread(f.writelines, lines)
+                        count += len(lines)
+                        lines = []
+                if lines:
+                    await asyncio.to_thread(f.writelines, lines)
+                    count += len(lines)
+            if count:
+                os.replace(tmp_path, path)
+            else:
+                os.unlink(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return count
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.apply_expiry(await self.run_once())
+            except Exception:
+                logger.exception("Pageview retention run failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
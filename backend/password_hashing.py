@@ -0,0 +1,90 @@
+"""
+bcrypt hashing off the event loop.
+
+bcrypt is deliberately slow (100-300 ms per call) and would stall every other
+request on the worker if run inline. Calls run on a small dedicated thread
+pool instead; bcrypt releases the GIL while hashing, so the event loop keeps
+serving. Concurrency is capped at `max_workers` and, when `max_queue` is set,
+callers beyond that many waiting are refused so a login storm degrades into
+fast 503s rather than an ever-growing backlog.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """Raised when too many password operations are already waiting"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool and keeps queueing metrics"""
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._running = 0
+        self.stats = {"completed": 0, "rejected": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            self._slots = asyncio.Semaphore(self.max_workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        executor = self._pool()
+        if self.max_queue and self._waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise HasherBusy(f"{self._waiting} password operations already queued")
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        wait_ms = (time.perf_counter() - queued_at) * 1000
+        self.stats["total_wait_ms"] += wait_ms
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], wait_ms)
+
+        self._running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self.stats["completed"] += 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+        return hashed.decode('utf-8')
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def metrics(self) -> dict:
+        completed = self.stats["completed"]
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "queued": self._waiting,
+            "completed": completed,
+            "rejected": self.stats["rejected"],
+            "avg_wait_ms": round(self.stats["total_wait_ms"] / completed, 2) if completed else 0.0,
+            "max_wait_ms": round(self.stats["max_wait_ms"], 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._slots = None
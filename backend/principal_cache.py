@@ -0,0 +1,77 @@
+"""
+Per-process cache of authenticated principals.
+
+get_current_user used to load the user document on every authenticated
+request. Principals (only the fields the User model needs) are now cached by
+username for a short TTL with LRU eviction. Every handler that changes a
+user's status, role, profile or balance calls invalidate() with the user ID,
+so changes are visible on this worker immediately; other workers see them
+within the TTL.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+class PrincipalCache:
+    """LRU + TTL cache of user documents keyed by username, invalidated by user ID"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._usernames: Dict[str, str] = {}  # user ID -> username
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, username: str) -> Optional[dict]:
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._remove(username)
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(username)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def generation(self) -> int:
+        """Take before loading a principal and pass to put(), so a load that
+        raced with an invalidation is not cached"""
+        return self._generation
+
+    def put(self, username: str, principal: dict, generation: int):
+        if generation != self._generation or self.max_size <= 0:
+            return
+        self._entries[username] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(username)
+        if principal.get("id"):
+            self._usernames[principal["id"]] = username
+        while len(self._entries) > self.max_size:
+            oldest, (_, evicted) = self._entries.popitem(last=False)
+            self._forget_username(oldest, evicted)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, user_id: str):
+        self._generation += 1
+        self.stats["invalidations"] += 1
+        username = self._usernames.pop(user_id, None)
+        if username is not None:
+            self._entries.pop(username, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._usernames.clear()
+
+    def _remove(self, username: str):
+        _, principal = self._entries.pop(username)
+        self._forget_username(username, principal)
+
+    def _forget_username(self, username: str, principal: dict):
+        if principal.get("id") and self._usernames.get(principal["id"]) == username:
+            del self._usernames[principal["id"]]
+
+    def metrics(self) -> dict:
+        return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl, **self.stats}
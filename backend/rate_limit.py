@@ -0,0 +1,163 @@
+"""
+Token-bucket rate limiting as ASGI middleware.
+
+Each rule names the routes it covers, how callers are identified (client IP,
+or the authenticated user with IP as fallback) and a limit written as
+"<requests>/<seconds>": a bucket of that many tokens refilled evenly over the
+period. Buckets are two floats per active (rule, caller) pair, kept in an LRU
+so memory stays bounded however many clients show up. Throttled requests get
+a 429 with Retry-After.
+
+Behind a reverse proxy every connection comes from the proxy, so the client
+IP is taken from X-Forwarded-For, but only when the peer is a trusted proxy:
+the header is read right to left, skipping trusted hops, and the first
+untrusted address is the client. Anything a client prepends itself is ignored.
+"""
+
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+# Loopback and private networks, where an ingress or load balancer usually runs
+DEFAULT_TRUSTED_PROXIES = (
+    "127.0.0.0/8", "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "::1/128", "fc00::/7",
+)
+
+
+def parse_networks(spec: str) -> List[str]:
+    """Comma-separated addresses or CIDR networks, validated"""
+    networks = [item.strip() for item in spec.split(",") if item.strip()]
+    for network in networks:
+        ipaddress.ip_network(network, strict=False)
+    return networks
+
+
+@dataclass
+class RateLimitRule:
+    name: str
+    method: str
+    paths: Tuple[str, ...]
+    capacity: float
+    rate: float  # tokens per second
+    key: str = "ip"  # "ip" or "user"
+
+    @classmethod
+    def parse(cls, name: str, method: str, paths: Tuple[str, ...], spec: str, key: str = "ip") -> "RateLimitRule":
+        """Build a rule from a "<requests>/<seconds>" spec, e.g. "10/60" """
+        count, seconds = spec.split("/")
+        count, seconds = float(count), float(seconds)
+        if count <= 0 or seconds <= 0:
+            raise ValueError(f"Invalid rate limit for {name}: {spec}")
+        return cls(name, method.upper(), tuple(paths), count, count / seconds, key)
+
+
+class RateLimiter:
+    """Token buckets for a set of rules, with LRU eviction of idle callers"""
+
+    def __init__(self, rules: List[RateLimitRule], max_keys: int = 100000,
+                 user_key: Optional[Callable[[str], Optional[str]]] = None,
+                 trusted_proxies: Iterable[str] = DEFAULT_TRUSTED_PROXIES):
+        self.max_keys = max_keys
+        self.user_key = user_key
+        self.trusted_proxies = [ipaddress.ip_network(network, strict=False) for network in trusted_proxies]
+        self._routes: Dict[Tuple[str, str], RateLimitRule] = {}
+        for rule in rules:
+            for path in rule.paths:
+                self._routes[(rule.method, path)] = rule
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self.stats = {rule.name: {"allowed": 0, "throttled": 0} for rule in rules}
+        self.evictions = 0
+
+    def rule_for(self, method: str, path: str) -> Optional[RateLimitRule]:
+        return self._routes.get((method, path))
+
+    def is_trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.trusted_proxies)
+
+    def client_ip(self, scope, headers: Headers) -> str:
+        """The peer address, or the client it forwarded for if the peer is a trusted proxy"""
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        if not self.is_trusted(address):
+            return address
+        for hop in reversed(",".join(headers.getlist("x-forwarded-for")).split(",")):
+            hop = hop.strip()
+            if hop:
+                address = hop
+                if not self.is_trusted(hop):
+                    break
+        return address
+
+    def client_key(self, rule: RateLimitRule, scope, headers: Headers) -> str:
+        if rule.key == "user" and self.user_key is not None:
+            authorization = headers.get("authorization", "")
+            if authorization.lower().startswith("bearer "):
+                user_id = self.user_key(authorization[7:])
+                if user_id:
+                    return f"user:{user_id}"
+        return "ip:" + self.client_ip(scope, headers)
+
+    def take(self, rule: RateLimitRule, client: str) -> float:
+        """Spend one token; returns 0 if allowed, otherwise seconds until a token is available"""
+        now = time.monotonic()
+        key = (rule.name, client)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [rule.capacity, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(rule.capacity, bucket[0] + (now - bucket[1]) * rule.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.stats[rule.name]["allowed"] += 1
+            return 0.0
+        self.stats[rule.name]["throttled"] += 1
+        return (1 - bucket[0]) / rule.rate
+
+    def metrics(self) -> dict:
+        return {"active_keys": len(self._buckets), "max_keys": self.max_keys,
+                "evictions": self.evictions, "rules": self.stats}
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a RateLimiter to matching HTTP requests"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        rule = self.limiter.rule_for(scope["method"], scope["path"])
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = self.limiter.client_key(rule, scope, Headers(scope=scope))
+        retry_after = self.limiter.take(rule, client)
+        if retry_after:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests, please slow down"},
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
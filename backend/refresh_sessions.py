@@ -0,0 +1,97 @@
+"""
+Refresh-token sessions.
+
+Login hands out a short-lived access token plus an opaque refresh token. Only
+the SHA-256 of the refresh token is stored, in the `sessions` collection,
+which a TTL index on expires_at keeps clean. Every refresh rotates the token:
+the old hash moves to previous_hash and a new token is issued, so a stolen
+token that is used after its owner refreshed is detected and the whole
+session is dropped.
+"""
+
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# A rotated token used again this soon is treated as a race (two tabs
+# refreshing at once), not theft: the request fails but the session survives
+REUSE_GRACE = timedelta(seconds=30)
+
+
+class InvalidRefreshToken(Exception):
+    """Unknown, expired or just-rotated refresh token"""
+
+
+class RefreshTokenReuse(InvalidRefreshToken):
+    """An old refresh token was replayed; the session has been revoked"""
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class SessionStore:
+    """Issues, rotates and revokes refresh tokens stored hashed in `sessions`"""
+
+    def __init__(self, db, lifetime_days: int = 30):
+        self.sessions = db.sessions
+        self.lifetime = timedelta(days=lifetime_days)
+        self.stats = {"created": 0, "rotated": 0, "rejected": 0, "reuse_detected": 0}
+
+    async def create(self, user: dict, user_agent: Optional[str] = None) -> str:
+        """Start a session for a freshly authenticated user; returns its refresh token"""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        await self.sessions.insert_one({
+            "id": str(uuid.uuid4()),
+            "user_id": user["id"],
+            "token_hash": hash_token(token),
+            "token_version": user.get("token_version", 0),
+            "user_agent": user_agent,
+            "created_at": now,
+            "last_used_at": now,
+            "expires_at": now + self.lifetime,
+        })
+        self.stats["created"] += 1
+        return token
+
+    async def rotate(self, token: str) -> Tuple[dict, str]:
+        """Exchange a refresh token for a new one; returns (session, new token)"""
+        token_hash = hash_token(token)
+        new_token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        session = await self.sessions.find_one_and_update(
+            {"token_hash": token_hash, "expires_at": {"$gt": now}},
+            {"$set": {
+                "token_hash": hash_token(new_token),
+                "previous_hash": token_hash,
+                "last_used_at": now,
+                "expires_at": now + self.lifetime,
+            }},
+            projection={"_id": 0, "token_hash": 0, "previous_hash": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if session is not None:
+            self.stats["rotated"] += 1
+            return session, new_token
+
+        self.stats["rejected"] += 1
+        rotated = await self.sessions.find_one({"previous_hash": token_hash}, {"_id": 0, "id": 1, "last_used_at": 1})
+        if rotated is not None and now - rotated["last_used_at"] > REUSE_GRACE:
+            await self.sessions.delete_one({"id": rotated["id"]})
+            self.stats["reuse_detected"] += 1
+            raise RefreshTokenReuse("Refresh token reuse detected")
+        raise InvalidRefreshToken("Invalid or expired refresh token")
+
+    async def revoke(self, token: str):
+        await self.sessions.delete_one({"token_hash": hash_token(token)})
+
+    async def revoke_session(self, session_id: str):
+        await self.sessions.delete_one({"id": session_id})
+
+    async def metrics(self) -> dict:
+        return {"active_sessions": await self.sessions.estimated_document_count(), **self.stats}
@@ -0,0 +1,91 @@
+"""
+In-process response cache for hot, rarely-changing public endpoints.
+
+Endpoints decorated with ResponseCache.cached() keep their return value per
+set of query parameters for a TTL, in a size-bounded LRU. Each entry carries
+tags; write handlers call invalidate(tag) so this worker serves fresh data
+immediately, while other workers catch up within the TTL.
+"""
+
+import functools
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Returned by get() on a miss, so that an endpoint returning None can be cached
+MISS = object()
+
+
+class ResponseCache:
+    """LRU + TTL cache of endpoint results with tag-based invalidation"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, Tuple[float, Tuple[str, ...], object]]" = OrderedDict()
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.stats["misses"] += 1
+            return MISS
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[2]
+
+    def put(self, key: tuple, value, ttl: float, tags: Tuple[str, ...], generation: int):
+        # A value computed while an invalidation happened may already be stale
+        if generation != self._generation or self.max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, tags, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, *tags: str):
+        """Drop every entry carrying any of the tags"""
+        self._generation += 1
+        self.stats["invalidations"] += 1
+        stale = [key for key, (_, entry_tags, _) in self._entries.items() if set(tags) & set(entry_tags)]
+        for key in stale:
+            del self._entries[key]
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def cached(self, ttl: float, tags: Iterable[str]):
+        """Decorator for async endpoints; the cache key is the endpoint plus its parameters"""
+        tags = tuple(tags)
+
+        def decorator(endpoint):
+            @functools.wraps(endpoint)
+            async def wrapper(**kwargs):
+                key = (endpoint.__name__,) + tuple(sorted(
+                    (name, value) for name, value in kwargs.items()
+                    if not isinstance(value, (Request, Response))
+                ))
+                value = self.get(key)
+                if value is MISS:
+                    generation = self._generation
+                    value = await endpoint(**kwargs)
+                    self.put(key, value, ttl, tags, generation)
+                return value
+            return wrapper
+        return decorator
+
+    def metrics(self) -> Dict[str, object]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            **self.stats,
+        }
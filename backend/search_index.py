@@ -0,0 +1,327 @@
+"""
+In-process BM25 search over listings and news.
+
+Each searchable collection gets an inverted index over the folded tokens of
+its text fields (see search_text.py). Posting lists are pairs of compact
+arrays: document numbers and boost-weighted term frequencies, so a field
+boost simply counts a title occurrence as several occurrences (BM25F-style).
+Queries are scored with BM25, vectorized over numpy views of those arrays.
+Query terms of four or more letters also match indexed terms one edit away
+(insertion, deletion, substitution or transposition) at a reduced weight,
+using a symmetric-delete table.
+
+The write handlers update the index of their own worker immediately. A
+background job picks up documents changed by other workers (by updated_at)
+and periodically rebuilds from Mongo, which also drops documents deleted
+elsewhere; until then, callers hydrating results from Mongo skip IDs that no
+longer exist. Documents outside a collection's filter (unpublished news) are
+kept out of the index, so pages are cut from searchable documents only.
+"""
+
+import array
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from search_text import tokenize
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+FUZZY_MIN_LENGTH = 4
+FUZZY_WEIGHT = 0.5
+# Overlap between incremental refreshes, to tolerate clock skew between workers
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+def _deletions(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Damerau-Levenshtein distance <= 1"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (
+        i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    )
+
+
+def _fuzzy_eligible(term: str) -> bool:
+    return len(term) >= FUZZY_MIN_LENGTH and term.isalpha()
+
+
+class SearchIndex:
+    """BM25 inverted index for one collection"""
+
+    def __init__(self, boosts: Dict[str, float]):
+        self.boosts = boosts
+        self._doc_ids: List[Optional[str]] = []  # document number -> ID, None once removed
+        self._numbers: Dict[str, int] = {}
+        self._lengths = array.array("f")
+        self._alive = bytearray()  # document number -> 1 while indexed
+        self._postings: Dict[str, Tuple[array.array, array.array]] = {}
+        self._variants: Dict[str, Set[str]] = {}  # one-deletion variant -> indexed terms
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def _add_term(self, term: str):
+        self._postings[term] = (array.array("I"), array.array("f"))
+        if _fuzzy_eligible(term):
+            for variant in _deletions(term):
+                self._variants.setdefault(variant, set()).add(term)
+
+    def add(self, doc_id: str, doc: dict):
+        """Index a document, replacing any previous version"""
+        self.remove(doc_id)
+        weights: Dict[str, float] = {}
+        length = 0.0
+        for field, boost in self.boosts.items():
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            for token in tokenize(value):
+                weights[token] = weights.get(token, 0.0) + boost
+                length += boost
+
+        number = len(self._doc_ids)
+        self._doc_ids.append(doc_id)
+        self._numbers[doc_id] = number
+        self._lengths.append(length)
+        self._alive.append(1)
+        self._total_length += length
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._add_term(term)
+            numbers, tfs = self._postings[term]
+            numbers.append(number)
+            tfs.append(weight)
+
+    def remove(self, doc_id: str) -> bool:
+        number = self._numbers.pop(doc_id, None)
+        if number is None:
+            return False
+        self._doc_ids[number] = None
+        self._alive[number] = 0
+        self._total_length -= self._lengths[number]
+        # Removed documents stay in the posting lists until there are as many as live ones
+        if len(self._doc_ids) - len(self._numbers) > max(1000, len(self._numbers)):
+            self.compact()
+        return True
+
+    def compact(self):
+        """Renumber live documents and drop removed ones from the posting lists"""
+        renumber = array.array("i", [-1]) * len(self._doc_ids)
+        doc_ids, lengths = [], array.array("f")
+        for number, doc_id in enumerate(self._doc_ids):
+            if doc_id is not None:
+                renumber[number] = len(doc_ids)
+                self._numbers[doc_id] = len(doc_ids)
+                doc_ids.append(doc_id)
+                lengths.append(self._lengths[number])
+        postings = {}
+        for term, (numbers, tfs) in self._postings.items():
+            kept_numbers, kept_tfs = array.array("I"), array.array("f")
+            for number, tf in zip(numbers, tfs):
+                if renumber[number] >= 0:
+                    kept_numbers.append(renumber[number])
+                    kept_tfs.append(tf)
+            if kept_numbers:
+                postings[term] = (kept_numbers, kept_tfs)
+        self._doc_ids, self._lengths, self._postings = doc_ids, lengths, postings
+        self._alive = bytearray(b"\x01") * len(doc_ids)
+        self._variants = {}
+        for term in postings:
+            if _fuzzy_eligible(term):
+                for variant in _deletions(term):
+                    self._variants.setdefault(variant, set()).add(term)
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """Indexed terms matching a query term, with their weight"""
+        matches = [(term, 1.0)] if term in self._postings else []
+        if not _fuzzy_eligible(term):
+            return matches
+        candidates = set(self._variants.get(term, ()))
+        for variant in _deletions(term):
+            if variant in self._postings:
+                candidates.add(variant)
+            candidates.update(self._variants.get(variant, ()))
+        candidates.discard(term)
+        matches.extend((candidate, FUZZY_WEIGHT) for candidate in candidates if _within_one_edit(term, candidate))
+        return matches
+
+    def search(self, query: str, limit: int, offset: int = 0) -> List[Tuple[str, float]]:
+        """(document ID, score) pairs, best first"""
+        live = len(self._numbers)
+        if not live:
+            return []
+        # Zero-copy views; they must not outlive this call, as the arrays cannot grow while viewed
+        lengths = np.frombuffer(self._lengths, dtype=np.float32)
+        norms = K1 * (1 - B + B * lengths / (self._total_length / live or 1.0))
+        scores = np.zeros(len(self._doc_ids), dtype=np.float32)
+        for term in dict.fromkeys(tokenize(query)):
+            # A document matching a term several ways (exactly and by typo) counts its best match
+            term_scores = np.zeros_like(scores)
+            for indexed, weight in self._expand(term):
+                numbers, tfs = self._postings[indexed]
+                numbers = np.frombuffer(numbers, dtype=np.uint32)
+                tfs = np.frombuffer(tfs, dtype=np.float32)
+                df = min(len(numbers), live)  # posting lists may still hold removed documents
+                idf = weight * math.log(1 + (live - df + 0.5) / (df + 0.5))
+                term_scores[numbers] = np.maximum(term_scores[numbers], idf * tfs * (K1 + 1) / (tfs + norms[numbers]))
+            scores += term_scores
+        scores *= np.frombuffer(self._alive, dtype=np.uint8)
+
+        matched = np.flatnonzero(scores)
+        wanted = offset + limit
+        if len(matched) > wanted:
+            matched = matched[np.argpartition(-scores[matched], wanted - 1)[:wanted]]
+        ranked = matched[np.argsort(-scores[matched], kind="stable")][offset:]
+        return [(self._doc_ids[number], float(scores[number])) for number in ranked]
+
+    def metrics(self) -> dict:
+        return {
+            "documents": len(self._numbers),
+            "removed_pending_compaction": len(self._doc_ids) - len(self._numbers),
+            "terms": len(self._postings),
+            "postings": sum(len(numbers) for numbers, _ in self._postings.values()),
+        }
+
+
+class SearchEngine:
+    """Search indexes for several collections, loaded from and kept in sync with Mongo"""
+
+    def __init__(self, db, boosts: Dict[str, Dict[str, float]], filters: Optional[Dict[str, dict]] = None,
+                 refresh_interval: float = 30.0, rebuild_interval: float = 3600.0):
+        self.db = db
+        self.boosts = boosts
+        # Per-collection field equalities a document must match to be searchable, e.g. published news
+        self.filters = filters or {}
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.indexes: Dict[str, SearchIndex] = {}
+        self.ready = False
+        self.built_at: Optional[datetime] = None
+        self._synced_at: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"queries": 0, "fallbacks": 0, "indexed": 0, "removed": 0, "refreshed": 0}
+
+    def projection(self, collection: str) -> dict:
+        fields = [*self.boosts[collection], *self.filters.get(collection, {})]
+        return {"_id": 0, "id": 1, "updated_at": 1, **{field: 1 for field in fields}}
+
+    def _searchable(self, collection: str, doc: dict) -> bool:
+        return all(doc.get(field) == value for field, value in self.filters.get(collection, {}).items())
+
+    async def _load(self, collection: str, index: SearchIndex, query: dict) -> int:
+        count = 0
+        async for doc in self.db[collection].find(query, self.projection(collection)):
+            if "id" not in doc:
+                continue
+            # Documents that stopped matching the filter (e.g. unpublished) leave the index
+            if self._searchable(collection, doc):
+                index.add(doc["id"], doc)
+            else:
+                index.remove(doc["id"])
+            count += 1
+            if count % 500 == 0:
+                await asyncio.sleep(0)  # tokenizing is CPU-bound; let requests through
+        return count
+
+    async def build(self):
+        """Load every collection into fresh indexes and swap them in"""
+        for collection, boosts in self.boosts.items():
+            started = datetime.utcnow()
+            index = SearchIndex(boosts)
+            count = await self._load(collection, index, dict(self.filters.get(collection, {})))
+            self.indexes[collection] = index
+            self._synced_at[collection] = started
+            logger.info(f"Search index for {collection} built with {count} documents")
+        self.ready = True
+        self.built_at = datetime.utcnow()
+        # Changes made while building are picked up by the next refresh
+        for collection in self.boosts:
+            await self.refresh(collection)
+
+    async def refresh(self, collection: str):
+        """Re-index documents changed since the last sync, e.g. by other workers"""
+        index = self.indexes.get(collection)
+        if index is None:
+            return
+        started = datetime.utcnow()
+        since = self._synced_at[collection] - REFRESH_OVERLAP
+        self.stats["refreshed"] += await self._load(collection, index, {"updated_at": {"$gte": since}})
+        self._synced_at[collection] = started
+
+    def index(self, collection: str, doc: dict):
+        index = self.indexes.get(collection)
+        if index is None:
+            return
+        if not self._searchable(collection, doc):
+            self.remove(collection, doc["id"])
+            return
+        index.add(doc["id"], doc)
+        self.stats["indexed"] += 1
+
+    def remove(self, collection: str, doc_id: str):
+        index = self.indexes.get(collection)
+        if index is not None and index.remove(doc_id):
+            self.stats["removed"] += 1
+
+    def search(self, collection: str, query: str, limit: int, offset: int = 0) -> Optional[List[Tuple[str, float]]]:
+        """Ranked (ID, score) pairs, or None while the index is still loading"""
+        if not self.ready or collection not in self.indexes:
+            self.stats["fallbacks"] += 1
+            return None
+        self.stats["queries"] += 1
+        return self.indexes[collection].search(query, limit, offset)
+
+    async def _run(self):
+        while True:
+            try:
+                if not self.ready or datetime.utcnow() - self.built_at > timedelta(seconds=self.rebuild_interval):
+                    await self.build()
+                else:
+                    for collection in self.boosts:
+                        await self.refresh(collection)
+            except Exception:
+                # Keep syncing: a dead task would leave search on a stale index until restart
+                logger.exception("Search index sync failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> dict:
+        return {
+            "ready": self.ready,
+            "built_at": self.built_at,
+            **self.stats,
+            "collections": {name: index.metrics() for name, index in self.indexes.items()},
+        }
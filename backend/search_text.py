@@ -0,0 +1,78 @@
+"""
+Diacritic-folded search text for listings.
+
+Search used to run a case-insensitive $regex over five fields, which no index
+can serve and which never matched "quan 1" against "Quận 1". Each property
+and land now stores `search_text`: its searchable fields folded to
+lowercase ASCII and tokenized. A Mongo text index over that field (with no
+language, so Vietnamese words are not stemmed as English) answers queries
+folded the same way, ranked by textScore.
+
+Every query token is sent as a quoted phrase, so a listing must contain all
+of them: "quan 1" no longer matches every listing in any "Quận". This is
+still less precise than the old substring match on one field: the tokens
+need not be adjacent or in order, so "quan 1" also matches "Quận 10, 1 phòng
+ngủ". $text also matches whole tokens only, so the prefix matching the regex
+gave ("nguy" finding "Nguyễn") is lost.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+from pymongo import UpdateOne
+
+# Fields indexed for search, in order
+SEARCH_FIELDS = ("title", "description", "address", "district", "city")
+SEARCH_PROJECTION = {field: 1 for field in SEARCH_FIELDS}
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics: "Quận Đống Đa" -> "quan dong da" """
+    text = text.replace("đ", "d").replace("Đ", "D")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _NON_WORD.split(fold(text)) if token]
+
+
+def search_text(doc: dict) -> str:
+    """The search_text value for a listing document"""
+    tokens = []
+    for field in SEARCH_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, str):
+            tokens.extend(tokenize(value))
+    return " ".join(tokens)
+
+
+def text_query(q: str) -> str:
+    """A user query folded for $text, every token required; empty if it has no searchable tokens"""
+    return " ".join(f'"{token}"' for token in tokenize(q))
+
+
+async def backfill(collection, batch_size: int = 500, only_missing: bool = True, on_batch=None) -> int:
+    """Compute search_text for existing documents in _id order; returns the number updated"""
+    query = {"search_text": {"$exists": False}} if only_missing else {}
+    projection = {"_id": 1, **SEARCH_PROJECTION}
+    last_id = None
+    updated = 0
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        batch = await collection.find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        last_id = batch[-1]["_id"]
+        await collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": {"search_text": search_text(doc)}}) for doc in batch],
+            ordered=False
+        )
+        updated += len(batch)
+        if on_batch is not None:
+            on_batch(updated)
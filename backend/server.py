@@ -1,19 +1,43 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Query, UploadFile, File, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+import asyncio
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing import List, Optional, Dict, Any, Union
 import uuid
 from datetime import datetime, timedelta
 import base64
+import json
+import re
 from enum import Enum
-import bcrypt
 from jose import JWTError, jwt
+from blob_store import BLOB_ID_RE, IMAGE_CONTENT_TYPES, InvalidBlobData, blob_url, create_blob_store
+from uploads import UploadError, UploadLimits, stream_upload
+from write_behind import InsertQueue, ViewCounterBuffer
+from traffic_rollups import TrafficRollups
+from pageview_retention import PageviewRetention
+from password_hashing import HasherBusy, PasswordHasher
+from principal_cache import PrincipalCache
+from token_revocations import TokenRevocations
+from refresh_sessions import InvalidRefreshToken, RefreshTokenReuse, SessionStore
+from rate_limit import DEFAULT_TRUSTED_PROXIES, RateLimiter, RateLimitMiddleware, RateLimitRule, parse_networks
+from dashboard_stats import DashboardStats, server_timing
+from counters import Counters, counter_value
+from response_cache import ResponseCache
+from data_loader import DataLoader
+from search_text import SEARCH_FIELDS, SEARCH_PROJECTION, search_text, text_query
+from search_index import SearchEngine
+from admin_units import city_code, district_code, location_codes
+from hyperloglog import standard_error
+from image_variants import VARIANT_FILE_RE, VARIANT_FORMATS, VariantGenerator, blob_id_from_url, variant_urls
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -23,6 +47,238 @@ mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
+# Analytics retention: raw pageviews and hourly rollups expire through TTL indexes,
+# daily rollups are kept (see pageview_retention.py)
+PAGEVIEW_RETENTION_DAYS = int(os.environ.get('PAGEVIEW_RETENTION_DAYS', 30))
+ROLLUP_HOURLY_RETENTION_DAYS = int(os.environ.get('ROLLUP_HOURLY_RETENTION_DAYS', 30))
+
+# Database indexes
+# Every lookup by "id" and every filtered/sorted listing below relies on these.
+# Creation is idempotent: Mongo skips indexes that already exist with the same spec.
+INDEX_SPECS: Dict[str, List[IndexModel]] = {
+    "properties": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("featured", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("property_type", ASCENDING), ("status", ASCENDING), ("price", ASCENDING)]),
+        IndexModel([("search_text", TEXT)], default_language="none"),
+        IndexModel([("updated_at", ASCENDING)]),  # search index refresh
+        IndexModel([("city_code", ASCENDING), ("district_code", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("district_code", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "lands": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("featured", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("land_type", ASCENDING), ("status", ASCENDING), ("price", ASCENDING)]),
+        IndexModel([("search_text", TEXT)], default_language="none"),
+        IndexModel([("updated_at", ASCENDING)]),  # search index refresh
+        IndexModel([("city_code", ASCENDING), ("district_code", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("district_code", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "sims": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("phone_number", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+        # Partial, so any number of accounts may have no email
+        IndexModel([("email", ASCENDING)], unique=True, partialFilterExpression={"email": {"$type": "string"}}),
+        IndexModel([("role", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "transactions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("transaction_type", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "member_posts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING), ("post_type", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "news_articles": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("published", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("published", ASCENDING), ("category", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),  # search index refresh
+    ],
+    "tickets": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "messages": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("to_user_id", ASCENDING), ("read", ASCENDING)]),
+        IndexModel([("from_user_id", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("to_user_id", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "blobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "pageviews": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=PAGEVIEW_RETENTION_DAYS * 86400),
+        IndexModel([("page_path", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "pageview_rollups": [
+        IndexModel([("granularity", ASCENDING), ("bucket", ASCENDING), ("page_path", ASCENDING)], unique=True),
+        IndexModel([("granularity", ASCENDING), ("page_path", ASCENDING), ("bucket", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "rollup_state": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "sessions": [
+        IndexModel([("token_hash", ASCENDING)], unique=True),
+        IndexModel([("previous_hash", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "token_revocations": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "counters": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+}
+
+# Build state per "collection.index_name": pending, building, ready, deferred or failed
+index_build_status: Dict[str, str] = {}
+
+# Unique keys that background jobs rely on for their leases and upserts; built at startup,
+# before the jobs start, instead of in the background with the rest
+STARTUP_INDEX_COLLECTIONS = ("rollup_state", "pageview_rollups", "counters", "token_revocations", "sessions")
+
+# Work that must finish before a collection's TTL index may start deleting documents;
+# each returns whether it is safe to create the index
+TTL_PREREQUISITES = {
+    # Pageviews are compacted into the rollups (and archived) before they can expire.
+    # The retention job keeps checking and drops the index while they are behind.
+    "pageviews": lambda: pageview_retention.run_once(),
+}
+
+async def find_duplicate_keys(collection_name: str, model: IndexModel, limit: int = 10) -> List[dict]:
+    """Key values a unique index would reject, with the IDs of the documents holding them"""
+    pipeline = []
+    if "partialFilterExpression" in model.document:
+        pipeline.append({"$match": model.document["partialFilterExpression"]})
+    pipeline += [
+        {"$group": {
+            "_id": {field: f"${field}" for field in model.document["key"]},
+            "ids": {"$push": {"$ifNull": ["$id", "$_id"]}},
+            "count": {"$sum": 1},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return await db[collection_name].aggregate(pipeline).to_list(limit)
+
+async def create_index(collection_name: str, model: IndexModel):
+    """Create one index, recording the outcome for the readiness check"""
+    name = f"{collection_name}.{model.document['name']}"
+    collection = db[collection_name]
+    index_build_status[name] = "building"
+    try:
+        try:
+            await collection.create_indexes([model])
+        except OperationFailure as e:
+            # 85/86: an index on the same keys or with the same name exists with other options
+            if e.code not in (85, 86):
+                raise
+            if "expireAfterSeconds" in model.document:
+                # A changed (or new) expiry is applied in place
+                await db.command("collMod", collection_name, index={
+                    "name": model.document["name"],
+                    "expireAfterSeconds": model.document["expireAfterSeconds"]
+                })
+            else:
+                # e.g. a unique index that became partial; it has to be rebuilt
+                logger.warning(f"Rebuilding index {name} with changed options")
+                await collection.drop_index(model.document["name"])
+            await collection.create_indexes([model])
+    except PyMongoError as e:
+        index_build_status[name] = "failed"
+        if isinstance(e, OperationFailure) and e.code == 11000:
+            try:
+                duplicates = await find_duplicate_keys(collection_name, model)
+            except PyMongoError:
+                duplicates = []
+            for duplicate in duplicates:
+                logger.error(f"Index {name} not built: {duplicate['_id']} is held by {duplicate['ids']}")
+        logger.error(f"Index build failed for {name}: {e}")
+        return
+    index_build_status[name] = "ready"
+    logger.info(f"Index ready: {name}")
+
+async def create_indexes(collection_name: str, models: List[IndexModel]):
+    """Create indexes one at a time, so one failure leaves the others to be built"""
+    for model in models:
+        index_build_status[f"{collection_name}.{model.document['name']}"] = "building"
+    for model in models:
+        await create_index(collection_name, model)
+
+async def ensure_startup_indexes():
+    """Build the indexes of STARTUP_INDEX_COLLECTIONS, except TTL indexes"""
+    for collection_name in STARTUP_INDEX_COLLECTIONS:
+        await create_indexes(collection_name, [
+            model for model in INDEX_SPECS[collection_name] if "expireAfterSeconds" not in model.document
+        ])
+
+async def ensure_indexes():
+    """Create all declared indexes not already built; TTL indexes last, once their prerequisites have run"""
+    ttl_indexes = []
+    for collection_name, models in INDEX_SPECS.items():
+        models = [
+            model for model in models
+            if index_build_status.get(f"{collection_name}.{model.document['name']}") != "ready"
+        ]
+        regular = [model for model in models if "expireAfterSeconds" not in model.document]
+        for model in models:
+            if model not in regular:
+                ttl_indexes.append((collection_name, model))
+                index_build_status[f"{collection_name}.{model.document['name']}"] = "building"
+        if regular:
+            await create_indexes(collection_name, regular)
+
+    for collection_name, model in ttl_indexes:
+        prerequisite = TTL_PREREQUISITES.get(collection_name)
+        if prerequisite is not None:
+            try:
+                ready = await prerequisite()
+            except (PyMongoError, OSError) as e:
+                logger.error(f"Not creating TTL index on {collection_name}: {e}")
+                index_build_status[f"{collection_name}.{model.document['name']}"] = "failed"
+                continue
+            if not ready:
+                logger.warning(f"Not creating TTL index on {collection_name} yet: prerequisite not caught up")
+                index_build_status[f"{collection_name}.{model.document['name']}"] = "deferred"
+                continue
+        await create_index(collection_name, model)
+
+async def check_indexes() -> Dict[str, str]:
+    """Compare declared indexes against the database, returning the state of each"""
+    report = {}
+    for collection_name, models in INDEX_SPECS.items():
+        existing = await db[collection_name].index_information()
+        for model in models:
+            name = f"{collection_name}.{model.document['name']}"
+            if model.document["name"] in existing:
+                report[name] = "ready"
+            else:
+                state = index_build_status.get(name, "pending")
+                report[name] = "missing" if state in ("ready", "pending") else state
+                if report[name] == "missing" and collection_name in TTL_PREREQUISITES \
+                        and "expireAfterSeconds" in model.document:
+                    # Dropped by the prerequisite's job while it is behind
+                    report[name] = "deferred"
+    return report
+
 # Create the main app without a prefix
 app = FastAPI(title="BDS Vietnam API", description="Professional Real Estate Platform with Member Management")
 
@@ -33,20 +289,201 @@ api_router = APIRouter(prefix="/api")
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'your-secret-key-here-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', 30))
 
 # Security
 security = HTTPBearer()
 
+# Detail-page view counts are buffered and written in bulk rather than once per hit
+view_counter = ViewCounterBuffer(
+    db,
+    flush_interval=float(os.environ.get('VIEW_FLUSH_INTERVAL', 5)),
+    max_pending=int(os.environ.get('VIEW_FLUSH_MAX_PENDING', 1000)),
+)
+
+# Analytics pageviews are queued and inserted in batches off the request path
+pageview_queue = InsertQueue(
+    db,
+    "pageviews",
+    max_size=int(os.environ.get('PAGEVIEW_QUEUE_MAX', 10000)),
+    batch_size=int(os.environ.get('PAGEVIEW_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('PAGEVIEW_FLUSH_INTERVAL', 2)),
+    overflow=os.environ.get('PAGEVIEW_QUEUE_OVERFLOW', 'drop'),  # drop or reject
+)
+PAGEVIEW_BATCH_MAX = int(os.environ.get('PAGEVIEW_BATCH_MAX', 500))
+PAGEVIEW_BATCH_MAX_BYTES = int(os.environ.get('PAGEVIEW_BATCH_MAX_BYTES', 512 * 1024))
+
+# Traffic analytics read hourly/daily rollups maintained by a background job. Pageviews
+# inserted more than ROLLUP_LAG seconds after their timestamp miss the rollups, so keep it
+# above the longest insert delay the pageview queue can see (see traffic_rollups.py)
+traffic_rollups = TrafficRollups(
+    db,
+    interval=float(os.environ.get('ROLLUP_INTERVAL', 60)),
+    lag=float(os.environ.get('ROLLUP_LAG', 120)),
+    hourly_retention_days=ROLLUP_HOURLY_RETENTION_DAYS,
+)
+pageview_retention = PageviewRetention(
+    db,
+    traffic_rollups,
+    retention_days=PAGEVIEW_RETENTION_DAYS,
+    # Set to keep raw pageviews as gzipped NDJSON files after they expire
+    archive_dir=os.environ.get('PAGEVIEW_ARCHIVE_DIR') or None,
+)
+
+# Entity counts for /stats, kept current by the write handlers and recounted periodically
+counters = Counters(
+    db,
+    {
+        "properties": ("status", "city"),
+        "news_articles": ("published",),
+        "sims": ("status",),
+        "lands": ("status",),
+        "tickets": ("status",),
+    },
+    reconcile_interval=float(os.environ.get('COUNTERS_RECONCILE_INTERVAL', 3600)),
+)
+
+# Search is answered by in-memory BM25 indexes (see search_index.py); Mongo only hydrates
+# the page of IDs. Until the indexes are loaded, listings fall back to the text index.
+LISTING_SEARCH_BOOSTS = {"title": 3.0, "district": 2.0, "city": 1.5, "address": 1.2, "description": 1.0}
+search_engine = SearchEngine(
+    db,
+    {
+        "properties": LISTING_SEARCH_BOOSTS,
+        "lands": LISTING_SEARCH_BOOSTS,
+        "news_articles": {"title": 3.0, "category": 2.0, "excerpt": 1.5, "content": 1.0},
+    },
+    filters={"news_articles": {"published": True}},
+    refresh_interval=float(os.environ.get('SEARCH_REFRESH_INTERVAL', 30)),
+    rebuild_interval=float(os.environ.get('SEARCH_REBUILD_INTERVAL', 3600)),
+)
+SEARCH_ENGINE_ENABLED = os.environ.get('SEARCH_ENGINE_ENABLED', 'true').lower() == 'true'
+
+async def search_documents(collection: str, q: str, skip: int, limit: int, query: Optional[dict] = None) -> List[dict]:
+    """One page of search results, best match first"""
+    query = query or {}
+    hits = search_engine.search(collection, q, limit, skip) if SEARCH_ENGINE_ENABLED else None
+    if hits is not None:
+        ids = [doc_id for doc_id, _ in hits]
+        docs = await db[collection].find({"id": {"$in": ids}, **query}, {"_id": 0, "search_text": 0}).to_list(len(ids))
+        by_id = {doc["id"]: doc for doc in docs}
+        # IDs deleted by another worker since the last index refresh are skipped
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    terms = text_query(q)
+    if not terms:
+        return []
+    if collection not in ("properties", "lands"):
+        # News has no text index: substring match on the title
+        return await db[collection].find(
+            {"title": {"$regex": re.escape(q), "$options": "i"}, **query}, {"_id": 0}
+        ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    # Matches listings containing every folded term ("quan 1" finds "Quận 1"), best textScore first
+    return await db[collection].find(
+        {"$text": {"$search": terms}, **query},
+        {"_id": 0, "search_text": 0, "score": {"$meta": "textScore"}}
+    ).sort([("score", {"$meta": "textScore"})]).skip(skip).limit(limit).to_list(limit)
+
+# Listings keep a diacritic-folded search_text for the text index (see search_text.py)
+def write_projection(collection: str) -> dict:
+    """Fields an update needs from the previous version: counted fields and searchable text"""
+    projection = {**counters.projection(collection), **search_engine.projection(collection)}
+    if collection in ("properties", "lands"):
+        projection.update(SEARCH_PROJECTION)
+    return projection
+
+async def update_search_text(collection: str, doc_id: str, previous: dict, changes: dict):
+    """Recompute search_text after an update that touched a searchable field"""
+    if any(field in changes for field in SEARCH_FIELDS):
+        await db[collection].update_one(
+            {"id": doc_id}, {"$set": {"search_text": search_text({**previous, **changes})}}
+        )
+
+# Public endpoints read on every page load (settings, stats, featured lists) are cached
+# briefly; write handlers invalidate by tag
+response_cache = ResponseCache(max_size=int(os.environ.get('RESPONSE_CACHE_SIZE', 1000)))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+STATS_CACHE_TTL = float(os.environ.get('STATS_CACHE_TTL', 60))
+
+# Admin dashboard figures: one aggregation per collection, queried concurrently
+dashboard_stats = DashboardStats(db, traffic_rollups)
+
+# Media storage
+# Images are stored once, keyed by SHA-256, and documents keep /api/media/<hash> URLs
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', ROOT_DIR / 'media'))
+BLOB_BACKEND = os.environ.get('BLOB_BACKEND', 'local')
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Media is served from the API origin, so browsers must never render it as anything but an image
+MEDIA_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "Content-Disposition": "inline",
+    "Content-Security-Policy": "default-src 'none'; sandbox",
+}
+UPLOAD_LIMITS = UploadLimits(
+    max_file_size=int(os.environ.get('UPLOAD_MAX_FILE_SIZE', 10 * 1024 * 1024)),
+    max_request_size=int(os.environ.get('UPLOAD_MAX_REQUEST_SIZE', 50 * 1024 * 1024)),
+    max_files=int(os.environ.get('UPLOAD_MAX_FILES', 20)),
+)
+# Inline base64 images get the same size cap as uploaded files
+blob_store = create_blob_store(db, BLOB_BACKEND, MEDIA_ROOT, max_inline_size=UPLOAD_LIMITS.max_file_size)
+image_variants = VariantGenerator(
+    blob_store, MEDIA_ROOT, max_workers=int(os.environ.get('IMAGE_VARIANT_WORKERS', 2))
+)
+
+async def store_inline_image(value: Optional[str], variants: bool = True) -> Optional[str]:
+    """Resolve an uploaded blob ID or move a base64 image into the blob store, returning its media URL"""
+    try:
+        url = await blob_store.store_image(value)
+    except InvalidBlobData as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Only listing and news images are shown as cards; avatars and transfer bills get no variants
+    if variants:
+        schedule_image_variants([url])
+    return url
+
+async def store_inline_images(values: Optional[List[str]]) -> Optional[List[str]]:
+    """Resolve blob IDs / move base64 images into the blob store, returning media URLs"""
+    try:
+        urls = await blob_store.store_images(values)
+    except InvalidBlobData as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    schedule_image_variants(urls or [])
+    return urls
+
+def schedule_image_variants(urls: List[Optional[str]]):
+    """Start rendering thumbnails/card/detail variants for newly stored images"""
+    for url in urls:
+        blob_id = blob_id_from_url(url)
+        if blob_id:
+            image_variants.schedule(blob_id)
+
+def add_image_variants(document: dict) -> dict:
+    """Attach variant URLs for each of a listing's images that is in the blob store"""
+    document["image_variants"] = [
+        variant_urls(url) for url in document.get("images") or [] if blob_id_from_url(url)
+    ]
+    return document
+
 # Password hashing
-def hash_password(password: str) -> str:
+# bcrypt runs on a bounded thread pool so logins don't block the event loop
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_queue=int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 0)),  # 0 = unbounded
+)
+
+async def hash_password(password: str) -> str:
     """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    try:
+        return await password_hasher.hash(password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
@@ -59,8 +496,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+# Authenticated users are cached briefly instead of loaded on every request
+principal_cache = PrincipalCache(
+    max_size=int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000)),
+    ttl=float(os.environ.get('PRINCIPAL_CACHE_TTL', 30)),
+)
+
+# Refresh tokens renew access tokens without another bcrypt login
+session_store = SessionStore(db, lifetime_days=REFRESH_TOKEN_EXPIRE_DAYS)
+
+# Token versions and suspensions, kept in memory so tokens can be checked without a users lookup
+token_revocations = TokenRevocations(
+    db, refresh_interval=float(os.environ.get('TOKEN_REVOCATION_REFRESH', 15))
+)
+
+def token_claims(user: dict) -> dict:
+    """Access token claims - enough to authorize most requests without loading the user"""
+    return {
+        "sub": user["username"],
+        "uid": user["id"],
+        "role": user.get("role", "member"),
+        "status": user.get("status", "active"),
+        "ver": user.get("token_version", 0),
+    }
+
+def decode_access_token(credentials: HTTPAuthorizationCredentials) -> dict:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -68,18 +528,63 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = await db.users.find_one({"username": username})
-    if user is None:
+    if payload.get("sub") is None:
         raise credentials_exception
+
+    # Tokens issued before claims were added carry only "sub" and are checked against the user
+    if "uid" in payload:
+        reason = token_revocations.check(payload["uid"], payload.get("ver", 0))
+        if reason == "revoked":
+            raise HTTPException(
+                status_code=401,
+                detail="Token has been revoked",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if reason == "suspended" or payload.get("status") == "suspended":
+            raise HTTPException(status_code=403, detail="Account is suspended. Please contact administrator.")
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current authenticated user"""
+    username = decode_access_token(credentials)["sub"]
+    user = principal_cache.get(username)
+    if user is None:
+        generation = principal_cache.generation()
+        user = await db.users.find_one({"username": username}, USER_PRINCIPAL_PROJECTION)
+        if user is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Could not validate credentials",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal_cache.put(username, user, generation)
+    if user.get("status") == "suspended":
+        raise HTTPException(status_code=403, detail="Account is suspended. Please contact administrator.")
     return User(**user)
 
-async def get_current_admin(current_user: "User" = Depends(get_current_user)):
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> "Principal":
+    """Get the caller's identity and role from the token alone, without a database read"""
+    payload = decode_access_token(credentials)
+    if "uid" in payload and token_revocations.loaded:
+        return Principal(id=payload["uid"], username=payload["sub"], role=payload["role"], status=payload["status"])
+    user = await get_current_user(credentials)
+    return Principal(id=user.id, username=user.username, role=user.role, status=user.status)
+
+async def load_wallet_balance(user_id: str) -> float:
+    """Current balance read from the database, for checks the cached principal could get wrong"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "wallet_balance": 1})
+    return user.get("wallet_balance", 0.0) if user else 0.0
+
+# Request-scoped loader: coalesces lookups by ID into one $in query per collection.
+# Users are loaded as summaries for joining onto queue rows; read balances from the database.
+LOADER_PROJECTIONS = {"users": {"_id": 0, "id": 1, "username": 1, "full_name": 1, "email": 1}}
+
+def get_data_loader() -> DataLoader:
+    return DataLoader(db, LOADER_PROJECTIONS)
+
+async def get_current_admin(current_user: "Principal" = Depends(get_current_principal)):
     """Get current admin user only"""
     if current_user.role != "admin":
         raise HTTPException(
@@ -88,6 +593,103 @@ async def get_current_admin(current_user: "User" = Depends(get_current_user)):
         )
     return current_user
 
+# Rate limiting
+# Limits are "<requests>/<seconds>" per client IP, or per user for signed-in callers
+def rate_limit_user_key(token: str) -> Optional[str]:
+    """User ID for per-user buckets; invalid tokens fall back to the client IP"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("uid") or payload.get("sub")
+
+RATE_LIMIT_RULES = [
+    RateLimitRule.parse("login", "POST", ("/api/auth/login",),
+                        os.environ.get('RATE_LIMIT_LOGIN', '10/60')),
+    RateLimitRule.parse("register", "POST", ("/api/auth/register",),
+                        os.environ.get('RATE_LIMIT_REGISTER', '5/600')),
+    RateLimitRule.parse("refresh", "POST", ("/api/auth/refresh",),
+                        os.environ.get('RATE_LIMIT_REFRESH', '30/60')),
+    RateLimitRule.parse("tickets", "POST", ("/api/tickets",),
+                        os.environ.get('RATE_LIMIT_TICKETS', '5/300'), key="user"),
+    RateLimitRule.parse("pageview", "POST", ("/api/analytics/pageview", "/api/analytics/pageviews:batch"),
+                        os.environ.get('RATE_LIMIT_PAGEVIEW', '120/60')),
+    RateLimitRule.parse("search", "GET", ("/api/properties/search", "/api/sims/search", "/api/lands/search",
+                                          "/api/news/search"),
+                        os.environ.get('RATE_LIMIT_SEARCH', '60/60'), key="user"),
+]
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# IMPORTANT when deploying behind an ingress/load balancer: list its addresses
+# (comma-separated IPs or CIDRs). X-Forwarded-For is only honoured from these
+# peers; if the proxy is not covered, every client shares the proxy's bucket.
+# Defaults to loopback and private networks; a warning is logged at startup
+# while it is unset.
+RATE_LIMIT_TRUSTED_PROXIES = parse_networks(
+    os.environ.get('RATE_LIMIT_TRUSTED_PROXIES') or ",".join(DEFAULT_TRUSTED_PROXIES)
+)
+
+rate_limiter = RateLimiter(
+    RATE_LIMIT_RULES,
+    max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)),
+    user_key=rate_limit_user_key,
+    trusted_proxies=RATE_LIMIT_TRUSTED_PROXIES,
+)
+
+# Keyset pagination
+# A cursor is the opaque, URL-safe encoding of the (sort value, id) of the last
+# document on a page. The next page is a range predicate on that pair, so deep
+# pages cost the same as the first one instead of scanning `skip` documents.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(document: dict, sort_key: str) -> str:
+    """Encode the position of a document in a (sort_key, id) ordering"""
+    value = document.get(sort_key)
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = json.dumps([value, document["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Decode a cursor into its (sort value, id) pair
+    
+    Only scalar sort values and the {"$date": ...} form encode_cursor writes
+    are accepted: anything else would be spliced into the query as an operator
+    expression.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if isinstance(value, dict) and set(value) == {"$date"}:
+            value = datetime.fromisoformat(value["$date"])
+        elif value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError("cursor value must be a scalar or a date")
+        if not isinstance(last_id, str):
+            raise ValueError("cursor id must be a string")
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+def apply_cursor(filter_query: dict, cursor: Optional[str], sort_key: str, sort_order: int) -> dict:
+    """Combine a listing filter with the range predicate for the page after `cursor`"""
+    if not cursor:
+        return filter_query
+    value, last_id = decode_cursor(cursor)
+    op = "$lt" if sort_order == -1 else "$gt"
+    range_query = {
+        "$or": [
+            {sort_key: {op: value}},
+            {sort_key: value, "id": {op: last_id}}
+        ]
+    }
+    if not filter_query:
+        return range_query
+    return {"$and": [filter_query, range_query]}
+
+def set_next_cursor(response: Response, documents: List[dict], limit: int, sort_key: str):
+    """Advertise the cursor of the following page when this page is full"""
+    if documents and len(documents) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(documents[-1], sort_key)
+
 # Enums
 class PropertyType(str, Enum):
     apartment = "apartment"
@@ -209,6 +811,13 @@ class SiteSettingsUpdate(BaseModel):
     holidays: Optional[str] = None
 
 # Pydantic Models
+class ImageVariants(BaseModel):
+    """URLs of the resized renditions of one image (WebP; use .jpg for JPEG)"""
+    original: str
+    thumb: Optional[str] = None
+    card: Optional[str] = None
+    detail: Optional[str] = None
+
 class Property(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     title: str
@@ -225,7 +834,8 @@ class Property(BaseModel):
     city: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    images: List[str] = []  # base64 images
+    images: List[str] = []  # media URLs (/api/media/<sha256>)
+    image_variants: List[ImageVariants] = []  # derived per response, not stored
     featured: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -248,12 +858,39 @@ class PropertyCreate(BaseModel):
     city: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    images: List[str] = []
+    images: List[str] = []  # blob IDs from /uploads, media URLs or base64
     featured: bool = False
     contact_phone: str
     contact_email: Optional[str] = None
     agent_name: Optional[str] = None
 
+class PropertyCard(BaseModel):
+    """Listing-card subset of Property, returned by list endpoints with view=card"""
+    id: str
+    title: str
+    property_type: PropertyType
+    status: PropertyStatus
+    price: float
+    price_per_sqm: Optional[float] = None
+    area: float
+    bedrooms: int
+    bathrooms: int
+    address: str
+    district: str
+    city: str
+    images: List[str] = []  # first image only
+    image_variants: List[ImageVariants] = []
+    featured: bool = False
+    created_at: Optional[datetime] = None
+    views: int = 0
+
+PROPERTY_CARD_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "property_type": 1, "status": 1, "price": 1,
+    "price_per_sqm": 1, "area": 1, "bedrooms": 1, "bathrooms": 1, "address": 1,
+    "district": 1, "city": 1, "featured": 1, "created_at": 1, "views": 1,
+    "images": {"$slice": 1}
+}
+
 class PropertyUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -280,7 +917,7 @@ class NewsArticle(BaseModel):
     slug: str
     content: str
     excerpt: str
-    featured_image: Optional[str] = None  # base64
+    featured_image: Optional[str] = None  # media URL
     category: str
     tags: List[str] = []
     published: bool = True
@@ -383,7 +1020,8 @@ class Land(BaseModel):
     city: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
-    images: List[str] = []  # base64 images
+    images: List[str] = []  # media URLs (/api/media/<sha256>)
+    image_variants: List[ImageVariants] = []  # derived per response, not stored
     featured: bool = False
     legal_status: str  # Tình trạng pháp lý: "Sổ đỏ", "Sổ hồng", etc
     orientation: Optional[str] = None  # Hướng: "Đông", "Tây", etc
@@ -418,6 +1056,43 @@ class LandCreate(BaseModel):
     contact_email: Optional[str] = None
     agent_name: Optional[str] = None
 
+class LandCard(BaseModel):
+    """Listing-card subset of Land, returned by list endpoints with view=card"""
+    id: str
+    title: str
+    land_type: LandType
+    status: PropertyStatus
+    price: float
+    price_per_sqm: Optional[float] = None
+    area: float
+    width: Optional[float] = None
+    length: Optional[float] = None
+    address: str
+    district: str
+    city: str
+    images: List[str] = []  # first image only
+    image_variants: List[ImageVariants] = []
+    featured: bool = False
+    legal_status: Optional[str] = None
+    orientation: Optional[str] = None
+    road_width: Optional[float] = None
+    created_at: Optional[datetime] = None
+    views: int = 0
+
+LAND_CARD_PROJECTION = {
+    "_id": 0, "id": 1, "title": 1, "land_type": 1, "status": 1, "price": 1,
+    "price_per_sqm": 1, "area": 1, "width": 1, "length": 1, "address": 1,
+    "district": 1, "city": 1, "featured": 1, "legal_status": 1, "orientation": 1,
+    "road_width": 1, "created_at": 1, "views": 1,
+    "images": {"$slice": 1}
+}
+
+def card_projection(base: dict, sort_key: str) -> dict:
+    """Card projection that also keeps the sort key, which the page cursor is built from"""
+    if sort_key in base:
+        return base
+    return {**base, sort_key: 1}
+
 class LandUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -498,7 +1173,7 @@ class User(BaseModel):
     wallet_balance: float = 0.0
     full_name: Optional[str] = None
     phone: Optional[str] = None
-    avatar: Optional[str] = None  # base64
+    avatar: Optional[str] = None  # media URL
     address: Optional[str] = None
     is_active: bool = True
     email_verified: bool = False
@@ -506,6 +1181,16 @@ class User(BaseModel):
     last_login: Optional[datetime] = None
     profile_completed: bool = False
 
+# Only the fields User needs, for loading authenticated principals
+USER_PRINCIPAL_PROJECTION = {"_id": 0, **{field: 1 for field in User.model_fields}}
+
+class Principal(BaseModel):
+    """Authenticated caller as described by the access token claims"""
+    id: str
+    username: str
+    role: UserRole
+    status: UserStatus
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -523,6 +1208,9 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class UserProfile(BaseModel):
     id: str
     username: str
@@ -567,7 +1255,7 @@ class TransactionCreate(BaseModel):
 class DepositRequest(BaseModel):
     amount: float
     description: Optional[str] = "Nạp tiền vào tài khoản"
-    transfer_bill: Optional[str] = None  # Base64 encoded image of transfer receipt
+    transfer_bill: Optional[str] = None  # Transfer receipt: blob ID from /uploads or base64 image
 
 # Enhanced Post Models (for approval workflow)
 class PostBase(BaseModel):
@@ -624,6 +1312,7 @@ class MemberPost(BaseModel):
     author_id: str
     price: float
     images: List[str] = []
+    image_variants: List[ImageVariants] = []  # derived per response, not stored
     contact_phone: str
     contact_email: Optional[str] = None
     
@@ -670,7 +1359,7 @@ class MemberPostCreate(BaseModel):
     description: str
     post_type: PostType
     price: float
-    images: List[str] = []
+    images: List[str] = []  # blob IDs from /uploads, media URLs or base64
     contact_phone: str
     contact_email: Optional[str] = None
     
@@ -707,10 +1396,10 @@ class PostApproval(BaseModel):
 
 # Wallet & Transaction Routes
 @api_router.get("/wallet/balance")
-async def get_wallet_balance(current_user: User = Depends(get_current_user)):
+async def get_wallet_balance(current_user: Principal = Depends(get_current_principal)):
     """Get user wallet balance"""
     return {
-        "balance": current_user.wallet_balance,
+        "balance": await load_wallet_balance(current_user.id),
         "user_id": current_user.id
     }
 
@@ -720,6 +1409,8 @@ async def deposit_money(deposit_request: DepositRequest, current_user: User = De
     if deposit_request.amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be greater than 0")
     
+    transfer_bill = await store_inline_image(deposit_request.transfer_bill, variants=False)
+    
     # Create transaction record
     transaction_dict = {
         "id": str(uuid.uuid4()),
@@ -728,7 +1419,7 @@ async def deposit_money(deposit_request: DepositRequest, current_user: User = De
         "transaction_type": "deposit",
         "status": "pending",
         "description": deposit_request.description,
-        "transfer_bill": deposit_request.transfer_bill,
+        "transfer_bill": transfer_bill,
         "method": "Bank Transfer",
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
@@ -744,7 +1435,7 @@ async def deposit_money(deposit_request: DepositRequest, current_user: User = De
 
 @api_router.get("/wallet/transactions", response_model=List[Transaction])
 async def get_user_transactions(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     transaction_type: Optional[TransactionType] = None
@@ -760,7 +1451,7 @@ async def get_user_transactions(
 # Admin Transaction Management Routes
 @api_router.get("/admin/transactions", response_model=List[Transaction])
 async def get_all_transactions(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     status: Optional[TransactionStatus] = None,
@@ -779,7 +1470,7 @@ async def get_all_transactions(
 @api_router.put("/admin/transactions/{transaction_id}/approve")
 async def approve_transaction(
     transaction_id: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Approve transaction and update user balance - Admin only"""
     transaction = await db.transactions.find_one({"id": transaction_id})
@@ -808,6 +1499,7 @@ async def approve_transaction(
             {"id": transaction["user_id"]},
             {"$inc": {"wallet_balance": transaction["amount"]}}
         )
+        principal_cache.invalidate(transaction["user_id"])
     
     return {"message": "Transaction approved successfully"}
 
@@ -815,7 +1507,7 @@ async def approve_transaction(
 async def reject_transaction(
     transaction_id: str,
     admin_notes: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Reject transaction - Admin only"""
     transaction = await db.transactions.find_one({"id": transaction_id})
@@ -842,11 +1534,98 @@ async def reject_transaction(
 async def root():
     return {"message": "BDS Vietnam API - Professional Real Estate Platform"}
 
+@api_router.get("/health/ready")
+async def readiness_check():
+    """Readiness probe - reports indexes that are missing or still building"""
+    try:
+        indexes = await check_indexes()
+    except PyMongoError as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "detail": str(e)})
+    
+    # A deferred TTL index only postpones expiry; it does not affect serving
+    not_ready = {name: state for name, state in indexes.items() if state not in ("ready", "deferred")}
+    return JSONResponse(
+        status_code=503 if not_ready else 200,
+        content={
+            "status": "not_ready" if not_ready else "ready",
+            "indexes_total": len(indexes),
+            "indexes_not_ready": not_ready
+        }
+    )
+
+@api_router.get("/media/{blob_id}")
+async def get_media(blob_id: str):
+    """Serve a stored image; content-addressed, so it can be cached forever"""
+    if not BLOB_ID_RE.match(blob_id):
+        raise HTTPException(status_code=404, detail="Media not found")
+    metadata = await blob_store.get_metadata(blob_id)
+    if not metadata:
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    headers = {"Cache-Control": MEDIA_CACHE_CONTROL, "ETag": f'"{blob_id}"', **MEDIA_SECURITY_HEADERS}
+    # Blobs stored before types were sniffed may carry a client-declared type
+    media_type = metadata["content_type"]
+    if media_type not in IMAGE_CONTENT_TYPES:
+        media_type = "application/octet-stream"
+    path = blob_store.local_path(blob_id)
+    if path is not None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    return StreamingResponse(blob_store.stream(blob_id), media_type=media_type, headers=headers)
+
+@api_router.get("/media/{blob_id}/{variant_file}")
+async def get_media_variant(blob_id: str, variant_file: str):
+    """Serve a resized variant (thumb/card/detail as .webp or .jpg), rendering it on first request"""
+    match = VARIANT_FILE_RE.match(variant_file)
+    if not BLOB_ID_RE.match(blob_id) or not match:
+        raise HTTPException(status_code=404, detail="Media not found")
+    try:
+        rendered = await image_variants.ensure(blob_id)
+    except Exception as e:
+        # Undecodable or corrupt image data: there is nothing to resize
+        logger.warning(f"Could not render variants of {blob_id}: {e}")
+        rendered = False
+    if not rendered:
+        raise HTTPException(status_code=404, detail="Media not found")
+    
+    _, media_type = VARIANT_FORMATS[match.group("ext")]
+    return FileResponse(
+        image_variants.path(blob_id, match.group("variant"), match.group("ext")),
+        media_type=media_type,
+        headers={"Cache-Control": MEDIA_CACHE_CONTROL, **MEDIA_SECURITY_HEADERS}
+    )
+
+@api_router.post("/uploads")
+async def upload_images(request: Request, current_user: User = Depends(get_current_user)):
+    """Upload images as multipart/form-data, streamed to the blob store.
+    
+    Returns one blob ID per file; pass those IDs in `images`, `featured_image`,
+    `avatar` or `bank_transfer_image` instead of base64 data.
+    """
+    try:
+        uploaded = await stream_upload(request, blob_store, UPLOAD_LIMITS)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    for blob in uploaded:
+        image_variants.schedule(blob.id)
+    
+    return {
+        "files": [
+            {
+                "id": blob.id,
+                "url": blob_url(blob.id),
+                "filename": blob.filename,
+                "content_type": blob.content_type,
+                "size": blob.size
+            }
+            for blob in uploaded
+        ]
+    }
+
 # Authentication Routes
 
 # Enhanced Authentication Routes
 @api_router.post("/auth/register")
-async def register(user_data: UserCreate):
+async def register(user_data: UserCreate, request: Request):
     """Register new user"""
     # Check if username already exists
     existing_user = await db.users.find_one({"username": user_data.username})
@@ -859,7 +1638,7 @@ async def register(user_data: UserCreate):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     user_dict = {
         "id": str(uuid.uuid4()),
         "username": user_data.username,
@@ -881,21 +1660,23 @@ async def register(user_data: UserCreate):
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user_data.username}, expires_delta=access_token_expires
+        data=token_claims(user_dict), expires_delta=access_token_expires
     )
+    refresh_token = await session_store.create(user_dict, request.headers.get("user-agent"))
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": UserProfile(**user_dict),
         "message": "User registered successfully"
     }
 
 @api_router.post("/auth/login")
-async def login(user_credentials: UserLogin):
+async def login(user_credentials: UserLogin, request: Request):
     """Login user and return access token"""
     user = await db.users.find_one({"username": user_credentials.username})
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+    if not user or not await verify_password(user_credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
@@ -913,18 +1694,62 @@ async def login(user_credentials: UserLogin):
         {"id": user["id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    principal_cache.invalidate(user["id"])
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["username"]}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
+    refresh_token = await session_store.create(user, request.headers.get("user-agent"))
     
     return {
         "access_token": access_token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "user": UserProfile(**user)
     }
 
+@api_router.post("/auth/refresh")
+async def refresh_access_token(refresh_request: RefreshRequest):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    try:
+        session, refresh_token = await session_store.rotate(refresh_request.refresh_token)
+    except RefreshTokenReuse:
+        raise HTTPException(status_code=401, detail="Session has been revoked, please log in again")
+    except InvalidRefreshToken:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    
+    user = await db.users.find_one(
+        {"id": session["user_id"]},
+        {"_id": 0, "id": 1, "username": 1, "role": 1, "status": 1, "token_version": 1}
+    )
+    # Status or role changes since login bump the token version and end the session
+    if not user or user.get("token_version", 0) > session["token_version"]:
+        await session_store.revoke_session(session["id"])
+        raise HTTPException(status_code=401, detail="Session has been revoked, please log in again")
+    if user["status"] == "suspended":
+        await session_store.revoke_session(session["id"])
+        raise HTTPException(
+            status_code=403,
+            detail="Account is suspended. Please contact administrator."
+        )
+    
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=token_claims(user), expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer"
+    }
+
+@api_router.post("/auth/logout")
+async def logout(refresh_request: RefreshRequest):
+    """End the session belonging to a refresh token"""
+    await session_store.revoke(refresh_request.refresh_token)
+    return {"message": "Logged out"}
+
 @api_router.get("/auth/me", response_model=UserProfile)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
@@ -935,12 +1760,15 @@ async def update_profile(user_update: UserUpdate, current_user: User = Depends(g
     """Update user profile"""
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
+    if "avatar" in update_data:
+        update_data["avatar"] = await store_inline_image(update_data["avatar"], variants=False)
     
     # Check if profile is completed
     if update_data.get("full_name") and update_data.get("phone"):
         update_data["profile_completed"] = True
     
     await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+    principal_cache.invalidate(current_user.id)
     updated_user = await db.users.find_one({"id": current_user.id})
     return UserProfile(**updated_user)
 
@@ -954,14 +1782,16 @@ async def create_member_post(
     # Check if user has sufficient balance (post fee = 50,000 VND)
     POST_FEE = 50000.0
     
-    if current_user.wallet_balance < POST_FEE:
+    wallet_balance = await load_wallet_balance(current_user.id)
+    if wallet_balance < POST_FEE:
         raise HTTPException(
             status_code=400,
-            detail=f"Insufficient balance. Required: {POST_FEE:,.0f} VNĐ, Available: {current_user.wallet_balance:,.0f} VNĐ"
+            detail=f"Insufficient balance. Required: {POST_FEE:,.0f} VNĐ, Available: {wallet_balance:,.0f} VNĐ"
         )
     
     # Create post
     post_dict = post_data.dict()
+    post_dict["images"] = await store_inline_images(post_dict["images"])
     post_dict["id"] = str(uuid.uuid4())
     post_dict["author_id"] = current_user.id
     post_dict["status"] = "pending"
@@ -972,13 +1802,14 @@ async def create_member_post(
     post_dict["expires_at"] = datetime.utcnow() + timedelta(days=30)
     
     post_obj = MemberPost(**post_dict)
-    await db.member_posts.insert_one(post_obj.dict())
+    await db.member_posts.insert_one(post_obj.dict(exclude={"image_variants"}))
     
     # Deduct post fee and create transaction
     await db.users.update_one(
         {"id": current_user.id},
         {"$inc": {"wallet_balance": -POST_FEE}}
     )
+    principal_cache.invalidate(current_user.id)
     
     # Create transaction record
     transaction_dict = {
@@ -1000,7 +1831,7 @@ async def create_member_post(
 
 @api_router.get("/member/posts", response_model=List[MemberPost])
 async def get_member_posts(
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     status: Optional[PostStatus] = None
@@ -1016,7 +1847,7 @@ async def get_member_posts(
 @api_router.get("/member/posts/{post_id}", response_model=MemberPost)
 async def get_member_post(
     post_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get specific member post"""
     post = await db.member_posts.find_one({"id": post_id, "author_id": current_user.id})
@@ -1040,6 +1871,7 @@ async def update_member_post(
     
     # Update post
     update_data = post_update.dict()
+    update_data["images"] = await store_inline_images(update_data["images"])
     update_data["status"] = "pending"  # Reset to pending after edit
     update_data["updated_at"] = datetime.utcnow()
     update_data["rejection_reason"] = None  # Clear rejection reason
@@ -1068,7 +1900,8 @@ async def delete_member_post(
 # Admin Post Approval Routes
 @api_router.get("/admin/posts/pending", response_model=List[MemberPost])
 async def get_pending_posts(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     post_type: Optional[PostType] = None
@@ -1081,17 +1914,20 @@ async def get_pending_posts(
     posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Add author information
+    authors = await loader.load_many("users", (post["author_id"] for post in posts))
     for post in posts:
-        author = await db.users.find_one({"id": post["author_id"]})
+        author = authors.get(post["author_id"])
         if author:
             post["author_name"] = author.get("full_name", author["username"])
             post["author_email"] = author["email"]
     
-    return [MemberPost(**post) for post in posts]
+    # Moderation lists show thumbnails
+    return [MemberPost(**add_image_variants(post)) for post in posts]
 
 @api_router.get("/admin/posts", response_model=List[MemberPost])
 async def get_all_posts(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     status: Optional[PostStatus] = None,
@@ -1107,22 +1943,25 @@ async def get_all_posts(
     posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Add author information
+    authors = await loader.load_many("users", (post["author_id"] for post in posts))
     for post in posts:
-        author = await db.users.find_one({"id": post["author_id"]})
+        author = authors.get(post["author_id"])
         if author:
             post["author_name"] = author.get("full_name", author["username"])
             post["author_email"] = author["email"]
     
-    return [MemberPost(**post) for post in posts]
+    # Moderation lists show thumbnails
+    return [MemberPost(**add_image_variants(post)) for post in posts]
 
 @api_router.put("/admin/posts/{post_id}/approve")
 async def approve_post(
     post_id: str,
     approval_data: PostApproval,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Approve or reject member post - Admin only"""
-    post = await db.member_posts.find_one({"id": post_id})
+    post = await loader.load("member_posts", post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -1161,7 +2000,12 @@ async def approve_post(
                 "updated_at": datetime.utcnow(),
                 "views": 0
             }
+            property_dict["search_text"] = search_text(property_dict)
+            property_dict.update(location_codes(property_dict))
             await db.properties.insert_one(property_dict)
+            await counters.created("properties", property_dict)
+            response_cache.invalidate("properties")
+            search_engine.index("properties", property_dict)
         
         elif post["post_type"] == "land":
             land_dict = {
@@ -1189,7 +2033,12 @@ async def approve_post(
                 "updated_at": datetime.utcnow(),
                 "views": 0
             }
+            land_dict["search_text"] = search_text(land_dict)
+            land_dict.update(location_codes(land_dict))
             await db.lands.insert_one(land_dict)
+            await counters.created("lands", land_dict)
+            response_cache.invalidate("lands")
+            search_engine.index("lands", land_dict)
         
         elif post["post_type"] == "sim":
             sim_dict = {
@@ -1207,6 +2056,8 @@ async def approve_post(
                 "views": 0
             }
             await db.sims.insert_one(sim_dict)
+            await counters.created("sims", sim_dict)
+            response_cache.invalidate("stats")
     
     elif approval_data.status == "rejected":
         update_data["rejection_reason"] = approval_data.rejection_reason
@@ -1218,7 +2069,7 @@ async def approve_post(
 # Admin User Management Routes
 @api_router.get("/admin/users", response_model=List[UserProfile])
 async def get_all_users(
-    current_admin: User = Depends(get_current_admin),
+    current_admin: Principal = Depends(get_current_admin),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=200),
     role: Optional[UserRole] = None,
@@ -1244,7 +2095,7 @@ async def get_all_users(
 @api_router.get("/admin/users/{user_id}", response_model=UserProfile)
 async def get_user_by_id(
     user_id: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Get user by ID - Admin only"""
     user = await db.users.find_one({"id": user_id})
@@ -1257,7 +2108,7 @@ async def update_user_status(
     user_id: str,
     status: UserStatus,
     admin_notes: Optional[str] = None,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Update user status - Admin only"""
     user = await db.users.find_one({"id": user_id})
@@ -1276,6 +2127,9 @@ async def update_user_status(
             }
         }
     )
+    principal_cache.invalidate(user_id)
+    # Existing tokens carry the old status; make holders log in again
+    await token_revocations.revoke(user_id, UserStatus(status).value)
     
     return {"message": f"User status updated to {status}"}
 
@@ -1284,7 +2138,7 @@ async def adjust_user_balance(
     user_id: str,
     amount: float,
     description: str,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Adjust user wallet balance - Admin only"""
     user = await db.users.find_one({"id": user_id})
@@ -1296,6 +2150,7 @@ async def adjust_user_balance(
         {"id": user_id},
         {"$inc": {"wallet_balance": amount}}
     )
+    principal_cache.invalidate(user_id)
     
     # Create transaction record
     transaction_dict = {
@@ -1328,7 +2183,7 @@ class AdminUserUpdate(BaseModel):
 async def update_user_profile(
     user_id: str,
     user_update: AdminUserUpdate,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Update user profile information - Admin only"""
     print(f"=== ADMIN USER UPDATE DEBUG START ===")
@@ -1403,6 +2258,9 @@ async def update_user_profile(
             {"id": user_id},
             {"$set": update_data}
         )
+        principal_cache.invalidate(user_id)
+        if "status" in update_data and update_data["status"] != user.get("status"):
+            await token_revocations.revoke(user_id, UserStatus(update_data["status"]).value)
         print(f"✅ Database update result: matched={result.matched_count}, modified={result.modified_count}")
         
         if result.modified_count == 0:
@@ -1417,106 +2275,15 @@ async def update_user_profile(
         raise HTTPException(status_code=500, detail=f"Database update failed: {str(e)}")
 
 @api_router.get("/admin/dashboard/stats")
-async def get_admin_dashboard_stats(current_admin: User = Depends(get_current_admin)):
+async def get_admin_dashboard_stats(response: Response, current_admin: Principal = Depends(get_current_admin)):
     """Get admin dashboard statistics"""
-    # User statistics
-    total_users = await db.users.count_documents({"role": "member"})
-    active_users = await db.users.count_documents({"role": "member", "status": "active"})
-    suspended_users = await db.users.count_documents({"role": "member", "status": "suspended"})
-    
-    # Content statistics
-    total_properties = await db.properties.count_documents({})
-    total_for_sale = await db.properties.count_documents({"status": "for_sale"})
-    total_for_rent = await db.properties.count_documents({"status": "for_rent"})
-    total_news = await db.news_articles.count_documents({"published": True})
-    total_sims = await db.sims.count_documents({})
-    total_lands = await db.lands.count_documents({})
-    total_tickets = await db.tickets.count_documents({})
-    
-    # Pending approvals
-    pending_posts = await db.member_posts.count_documents({"status": "pending"})
-    pending_properties = await db.member_posts.count_documents({"status": "pending", "post_type": "property"})
-    pending_lands = await db.member_posts.count_documents({"status": "pending", "post_type": "land"})
-    pending_sims = await db.member_posts.count_documents({"status": "pending", "post_type": "sim"})
-    
-    # Transaction statistics
-    pending_transactions = await db.transactions.count_documents({"status": "pending"})
-    total_transactions = await db.transactions.count_documents({})
-    
-    # Revenue statistics (completed post fees)
-    revenue_pipeline = [
-        {"$match": {"transaction_type": "post_fee", "status": "completed"}},
-        {"$group": {"_id": None, "total_revenue": {"$sum": "$amount"}}}
-    ]
-    revenue_result = await db.transactions.aggregate(revenue_pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total_revenue"] if revenue_result else 0
-    
-    # Today's statistics
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_users = await db.users.count_documents({"created_at": {"$gte": today}})
-    today_posts = await db.member_posts.count_documents({"created_at": {"$gte": today}})
-    today_transactions = await db.transactions.count_documents({"created_at": {"$gte": today}})
-    
-    # Traffic analytics
-    total_pageviews = await db.pageviews.count_documents({})
-    today_pageviews = await db.pageviews.count_documents({"timestamp": {"$gte": today}})
-    
-    # Get unique sessions today
-    today_sessions_pipeline = [
-        {"$match": {"timestamp": {"$gte": today}}},
-        {"$group": {"_id": "$session_id"}},
-        {"$count": "unique_sessions"}
-    ]
-    today_sessions_result = await db.pageviews.aggregate(today_sessions_pipeline).to_list(1)
-    today_unique_visitors = today_sessions_result[0]["unique_sessions"] if today_sessions_result else 0
-    
-    # Get properties by city
-    cities_pipeline = [
-        {"$group": {"_id": "$city", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    top_cities = await db.properties.aggregate(cities_pipeline).to_list(10)
-    
-    return {
-        # User statistics
-        "total_users": total_users,
-        "active_users": active_users,
-        "suspended_users": suspended_users,
-        "today_users": today_users,
-        
-        # Content statistics
-        "total_properties": total_properties,
-        "properties_for_sale": total_for_sale,
-        "properties_for_rent": total_for_rent,
-        "total_news_articles": total_news,
-        "total_sims": total_sims,
-        "total_lands": total_lands,
-        "total_tickets": total_tickets,
-        
-        # Pending approvals
-        "pending_posts": pending_posts,
-        "pending_properties": pending_properties,
-        "pending_lands": pending_lands,
-        "pending_sims": pending_sims,
-        
-        # Transaction statistics
-        "pending_transactions": pending_transactions,
-        "total_transactions": total_transactions,
-        "total_revenue": total_revenue,
-        "today_transactions": today_transactions,
-        
-        # Traffic analytics
-        "total_pageviews": total_pageviews,
-        "today_pageviews": today_pageviews,
-        "today_unique_visitors": today_unique_visitors,
-        
-        # Other
-        "top_cities": top_cities
-    }
+    stats, timings = await dashboard_stats.collect()
+    response.headers["Server-Timing"] = server_timing(timings)
+    return stats
 
 # Public Settings API (không cần authentication)
 @api_router.get("/settings", response_model=dict)
+@response_cache.cached(ttl=RESPONSE_CACHE_TTL, tags=["settings"])
 async def get_public_site_settings():
     """Get site settings for public use"""
     settings = await db.site_settings.find_one()
@@ -1531,7 +2298,7 @@ async def get_public_site_settings():
 
 # Admin Settings Routes
 @api_router.get("/admin/settings")
-async def get_site_settings(current_admin: User = Depends(get_current_admin)):
+async def get_site_settings(current_admin: Principal = Depends(get_current_admin)):
     """Get site settings (admin only)"""
     settings = await db.site_settings.find_one({})
     if not settings:
@@ -1556,7 +2323,7 @@ async def get_site_settings(current_admin: User = Depends(get_current_admin)):
 @api_router.put("/admin/settings")
 async def update_site_settings(
     settings_update: SiteSettingsUpdate,
-    current_admin: User = Depends(get_current_admin)
+    current_admin: Principal = Depends(get_current_admin)
 ):
     """Update site settings (admin only)"""
     update_data = {k: v for k, v in settings_update.dict().items() if v is not None}
@@ -1580,11 +2347,13 @@ async def update_site_settings(
         settings_dict.pop('id', None)  # Remove the id field for MongoDB
         await db.site_settings.insert_one(settings_dict)
     
+    response_cache.invalidate("settings")
     return {"message": "Cập nhật cài đặt thành công"}
 
 # Property Routes
-@api_router.get("/properties", response_model=List[Property])
+@api_router.get("/properties", response_model=List[Union[Property, PropertyCard]])
 async def get_properties(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     property_type: Optional[PropertyType] = None,
@@ -1599,19 +2368,28 @@ async def get_properties(
     bathrooms: Optional[int] = None,
     featured: Optional[bool] = None,
     sort_by: str = "created_at",
-    order: str = "desc"
+    order: str = "desc",
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    view: str = Query("card", regex="^(card|full)$")
 ):
-    """Get properties with filtering and pagination"""
+    """Get properties with filtering and pagination
+    
+    Pass the X-Next-Cursor value of a page as `cursor` to fetch the next one;
+    `skip` is still honoured when no cursor is given. The default card view
+    returns only the fields a listing card shows and the first image; use
+    view=full (or /properties/{id}) for complete documents.
+    """
     filter_query = {}
     
     if property_type:
         filter_query["property_type"] = property_type
     if status:
         filter_query["status"] = status
+    # Exact matches on the codes resolved at write time (see admin_units.py)
     if city:
-        filter_query["city"] = {"$regex": city, "$options": "i"}
+        filter_query["city_code"] = city_code(city)
     if district:
-        filter_query["district"] = {"$regex": district, "$options": "i"}
+        filter_query["district_code"] = district_code(district)
     if min_price is not None:
         filter_query["price"] = {"$gte": min_price}
     if max_price is not None:
@@ -1635,14 +2413,29 @@ async def get_properties(
     
     sort_order = -1 if order == "desc" else 1
     
-    properties = await db.properties.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
-
-@api_router.get("/properties/featured", response_model=List[Property])
-async def get_featured_properties(limit: int = Query(6, le=20)):
-    """Get featured properties"""
-    properties = await db.properties.find({"featured": True}).sort("created_at", -1).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
+    projection = card_projection(PROPERTY_CARD_PROJECTION, sort_by) if view == "card" else None
+    cursor_query = db.properties.find(apply_cursor(filter_query, cursor, sort_by, sort_order), projection)
+    cursor_query = cursor_query.sort([(sort_by, sort_order), ("id", sort_order)])
+    if not cursor:
+        cursor_query = cursor_query.skip(skip)
+    properties = await cursor_query.limit(limit).to_list(limit)
+    set_next_cursor(response, properties, limit, sort_by)
+    if view == "card":
+        return [PropertyCard(**add_image_variants(prop)) for prop in properties]
+    return [Property(**add_image_variants(prop)) for prop in properties]
+
+@api_router.get("/properties/featured", response_model=List[Union[Property, PropertyCard]])
+@response_cache.cached(ttl=RESPONSE_CACHE_TTL, tags=["properties"])
+async def get_featured_properties(
+    limit: int = Query(6, le=20),
+    view: str = Query("card", regex="^(card|full)$")
+):
+    """Get featured properties (card view by default)"""
+    projection = PROPERTY_CARD_PROJECTION if view == "card" else None
+    properties = await db.properties.find({"featured": True}, projection).sort("created_at", -1).limit(limit).to_list(limit)
+    if view == "card":
+        return [PropertyCard(**add_image_variants(prop)) for prop in properties]
+    return [Property(**add_image_variants(prop)) for prop in properties]
 
 @api_router.get("/properties/search", response_model=List[Property])
 async def search_properties(
@@ -1651,18 +2444,8 @@ async def search_properties(
     limit: int = Query(20, le=100)
 ):
     """Search properties by title, description, address"""
-    search_query = {
-        "$or": [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"address": {"$regex": q, "$options": "i"}},
-            {"district": {"$regex": q, "$options": "i"}},
-            {"city": {"$regex": q, "$options": "i"}}
-        ]
-    }
-    
-    properties = await db.properties.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Property(**prop) for prop in properties]
+    properties = await search_documents("properties", q, skip, limit)
+    return [Property(**add_image_variants(prop)) for prop in properties]
 
 @api_router.get("/properties/{property_id}", response_model=Property)
 async def get_property(property_id: str):
@@ -1671,30 +2454,38 @@ async def get_property(property_id: str):
     if not property_data:
         raise HTTPException(status_code=404, detail="Property not found")
     
-    # Increment views
-    await db.properties.update_one({"id": property_id}, {"$inc": {"views": 1}})
-    property_data["views"] += 1
+    # Count the view; it is flushed in bulk, so add the still-buffered views
+    property_data["views"] = property_data.get("views", 0) + view_counter.increment("properties", property_id)
     
-    return Property(**property_data)
+    return Property(**add_image_variants(property_data))
 
 @api_router.post("/properties", response_model=Property)
-async def create_property(property_data: PropertyCreate, current_user: User = Depends(get_current_admin)):
+async def create_property(property_data: PropertyCreate, current_user: Principal = Depends(get_current_admin)):
     """Create new property - Admin only"""
     """Create new property"""
     property_dict = property_data.dict()
+    property_dict["images"] = await store_inline_images(property_dict["images"])
     if property_dict.get("area") and property_dict.get("price"):
         property_dict["price_per_sqm"] = property_dict["price"] / property_dict["area"]
     
     property_obj = Property(**property_dict)
-    await db.properties.insert_one(property_obj.dict())
-    return property_obj
+    property_doc = property_obj.dict(exclude={"image_variants"})
+    property_doc["search_text"] = search_text(property_doc)
+    property_doc.update(location_codes(property_doc))
+    await db.properties.insert_one(property_doc)
+    await counters.created("properties", property_doc)
+    response_cache.invalidate("properties")
+    search_engine.index("properties", property_doc)
+    return Property(**add_image_variants(property_doc))
 
 @api_router.put("/properties/{property_id}", response_model=Property)
-async def update_property(property_id: str, property_update: PropertyUpdate, current_user: User = Depends(get_current_admin)):
+async def update_property(property_id: str, property_update: PropertyUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update property - Admin only"""
     """Update property"""
     update_data = {k: v for k, v in property_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
+    if "images" in update_data:
+        update_data["images"] = await store_inline_images(update_data["images"])
     
     if "area" in update_data or "price" in update_data:
         property_data = await db.properties.find_one({"id": property_id})
@@ -1704,36 +2495,53 @@ async def update_property(property_id: str, property_update: PropertyUpdate, cur
             if area and price:
                 update_data["price_per_sqm"] = price / area
     
-    result = await db.properties.update_one({"id": property_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    update_data.update(location_codes(update_data))
+    previous = await db.properties.find_one_and_update(
+        {"id": property_id}, {"$set": update_data}, projection=write_projection("properties")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Property not found")
+    await counters.updated("properties", previous, update_data)
+    await update_search_text("properties", property_id, previous, update_data)
+    response_cache.invalidate("properties")
+    search_engine.index("properties", {**previous, **update_data})
     
     updated_property = await db.properties.find_one({"id": property_id})
-    return Property(**updated_property)
+    return Property(**add_image_variants(updated_property))
 
 @api_router.delete("/properties/{property_id}")
-async def delete_property(property_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_property(property_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete property - Admin only"""
     """Delete property"""
-    result = await db.properties.delete_one({"id": property_id})
-    if result.deleted_count == 0:
+    deleted = await db.properties.find_one_and_delete({"id": property_id}, projection=counters.projection("properties"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Property not found")
+    await counters.deleted("properties", deleted)
+    response_cache.invalidate("properties")
+    search_engine.remove("properties", property_id)
     return {"message": "Property deleted successfully"}
 
 # News Routes
 @api_router.get("/news", response_model=List[NewsArticle])
 async def get_news_articles(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, le=50),
     category: Optional[str] = None,
-    published: bool = True
+    published: bool = True,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
 ):
-    """Get news articles"""
+    """Get news articles, newest first (keyset-paginated via `cursor`)"""
     filter_query = {"published": published}
     if category:
         filter_query["category"] = category
     
-    articles = await db.news_articles.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    cursor_query = db.news_articles.find(apply_cursor(filter_query, cursor, "created_at", -1))
+    cursor_query = cursor_query.sort([("created_at", -1), ("id", -1)])
+    if not cursor:
+        cursor_query = cursor_query.skip(skip)
+    articles = await cursor_query.limit(limit).to_list(limit)
+    set_next_cursor(response, articles, limit, "created_at")
     
     # Process articles and handle missing fields
     processed_articles = []
@@ -1757,6 +2565,16 @@ async def get_news_articles(
     
     return processed_articles
 
+@api_router.get("/news/search", response_model=List[NewsArticle])
+async def search_news_articles(
+    q: str = Query(..., description="Search query"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, le=50)
+):
+    """Search published news by title, category, excerpt and content"""
+    articles = await search_documents("news_articles", q, skip, limit, {"published": True})
+    return [NewsArticle(**article) for article in articles]
+
 @api_router.get("/news/{article_id}", response_model=NewsArticle)
 async def get_news_article(article_id: str):
     """Get single news article"""
@@ -1764,9 +2582,8 @@ async def get_news_article(article_id: str):
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     
-    # Increment views
-    await db.news_articles.update_one({"id": article_id}, {"$inc": {"views": 1}})
-    article["views"] += 1
+    # Count the view; it is flushed in bulk, so add the still-buffered views
+    article["views"] = article.get("views", 0) + view_counter.increment("news_articles", article_id)
     
     # Ensure required fields exist
     if "slug" not in article or not article["slug"]:
@@ -1782,15 +2599,21 @@ async def get_news_article(article_id: str):
     return NewsArticle(**article)
 
 @api_router.post("/news", response_model=NewsArticle)
-async def create_news_article(article_data: NewsArticleCreate, current_user: User = Depends(get_current_admin)):
+async def create_news_article(article_data: NewsArticleCreate, current_user: Principal = Depends(get_current_admin)):
     """Create news article - Admin only"""
     """Create news article"""
-    article_obj = NewsArticle(**article_data.dict())
-    await db.news_articles.insert_one(article_obj.dict())
+    article_dict = article_data.dict()
+    article_dict["featured_image"] = await store_inline_image(article_dict["featured_image"])
+    article_obj = NewsArticle(**article_dict)
+    article_doc = article_obj.dict()
+    await db.news_articles.insert_one(article_doc)
+    await counters.created("news_articles", article_doc)
+    response_cache.invalidate("stats")
+    search_engine.index("news_articles", article_doc)
     return article_obj
 
 @api_router.put("/news/{article_id}", response_model=NewsArticle)
-async def update_news_article(article_id: str, article_data: dict, current_user: User = Depends(get_current_admin)):
+async def update_news_article(article_id: str, article_data: dict, current_user: Principal = Depends(get_current_admin)):
     """Update news article - Admin only"""
     # Remove None values from update data
     update_data = {k: v for k, v in article_data.items() if v is not None}
@@ -1798,18 +2621,24 @@ async def update_news_article(article_id: str, article_data: dict, current_user:
     # Ensure required fields exist if updating
     if 'slug' not in update_data and 'title' in update_data:
         update_data['slug'] = update_data['title'].lower().replace(" ", "-").replace("--", "-")
+    if 'featured_image' in update_data:
+        update_data['featured_image'] = await store_inline_image(update_data['featured_image'])
     
     # Add updated timestamp
     update_data['updated_at'] = datetime.utcnow()
     
     # Update the article
-    result = await db.news_articles.update_one(
-        {"id": article_id}, 
-        {"$set": update_data}
+    previous = await db.news_articles.find_one_and_update(
+        {"id": article_id},
+        {"$set": update_data},
+        projection=write_projection("news_articles")
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Article not found")
+    await counters.updated("news_articles", previous, update_data)
+    response_cache.invalidate("stats")
+    search_engine.index("news_articles", {**previous, **update_data})
     
     # Get updated article
     updated_article = await db.news_articles.find_one({"id": article_id})
@@ -1827,70 +2656,60 @@ async def update_news_article(article_id: str, article_data: dict, current_user:
     return NewsArticle(**updated_article)
 
 @api_router.delete("/news/{article_id}")
-async def delete_news_article(article_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_news_article(article_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete news article - Admin only"""
-    result = await db.news_articles.delete_one({"id": article_id})
-    if result.deleted_count == 0:
+    deleted = await db.news_articles.find_one_and_delete({"id": article_id}, projection=counters.projection("news_articles"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Article not found")
+    await counters.deleted("news_articles", deleted)
+    response_cache.invalidate("stats")
+    search_engine.remove("news_articles", article_id)
     return {"message": "Article deleted successfully"}
 
 # Statistics Routes
 @api_router.get("/stats")
+@response_cache.cached(ttl=STATS_CACHE_TTL, tags=["stats", "properties", "lands"])
 async def get_statistics():
     """Get website statistics (public)"""
-    total_properties = await db.properties.count_documents({})
-    total_for_sale = await db.properties.count_documents({"status": "for_sale"})
-    total_for_rent = await db.properties.count_documents({"status": "for_rent"})
-    total_news = await db.news_articles.count_documents({"published": True})
-    total_sims = await db.sims.count_documents({})
-    total_lands = await db.lands.count_documents({})
-    
-    # Ticket statistics
-    total_tickets = await db.tickets.count_documents({})
-    open_tickets = await db.tickets.count_documents({"status": "open"})
-    resolved_tickets = await db.tickets.count_documents({"status": "resolved"})
-    
-    # Get today's traffic
+    # Entity counts are one read of the counters collection; traffic comes from the rollups,
+    # unique visitors being HyperLogLog estimates
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_pageviews = await db.pageviews.count_documents({"timestamp": {"$gte": today}})
-    total_pageviews = await db.pageviews.count_documents({})
-    
-    # Get unique sessions today
-    today_sessions_pipeline = [
-        {"$match": {"timestamp": {"$gte": today}}},
-        {"$group": {"_id": "$session_id"}},
-        {"$count": "unique_sessions"}
-    ]
-    today_sessions_result = await db.pageviews.aggregate(today_sessions_pipeline).to_list(1)
-    today_unique_visitors = today_sessions_result[0]["unique_sessions"] if today_sessions_result else 0
+    counts, total_pageviews, today_traffic = await asyncio.gather(
+        counters.read(),
+        traffic_rollups.total_views(),
+        traffic_rollups.site_totals(today),
+    )
+    properties = counts["properties"]
+    tickets = counts["tickets"]
     
     # Get properties by city
-    pipeline = [
-        {"$group": {"_id": "$city", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    cities = await db.properties.aggregate(pipeline).to_list(10)
+    cities = sorted(
+        ({"_id": counter_value(city), "count": count}
+         for city, count in properties.get("city", {}).items() if count > 0),
+        key=lambda city: city["count"],
+        reverse=True
+    )[:10]
     
     return {
-        "total_properties": total_properties,
-        "properties_for_sale": total_for_sale,
-        "properties_for_rent": total_for_rent,
-        "total_news_articles": total_news,
-        "total_sims": total_sims,
-        "total_lands": total_lands,
-        "total_tickets": total_tickets,
-        "open_tickets": open_tickets,
-        "resolved_tickets": resolved_tickets,
+        "total_properties": properties["total"],
+        "properties_for_sale": properties.get("status", {}).get("for_sale", 0),
+        "properties_for_rent": properties.get("status", {}).get("for_rent", 0),
+        "total_news_articles": counts["news_articles"].get("published", {}).get("true", 0),
+        "total_sims": counts["sims"]["total"],
+        "total_lands": counts["lands"]["total"],
+        "total_tickets": tickets["total"],
+        "open_tickets": tickets.get("status", {}).get("open", 0),
+        "resolved_tickets": tickets.get("status", {}).get("resolved", 0),
         "total_pageviews": total_pageviews,
-        "today_pageviews": today_pageviews,
-        "today_unique_visitors": today_unique_visitors,
+        "today_pageviews": today_traffic["views"],
+        "today_unique_visitors": today_traffic["unique_visitors"],
         "top_cities": cities
     }
 
 # Sim Routes
 @api_router.get("/sims", response_model=List[Sim])
 async def get_sims(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     network: Optional[SimNetwork] = None,
@@ -1900,9 +2719,14 @@ async def get_sims(
     is_vip: Optional[bool] = None,
     status: str = "available",
     sort_by: str = "created_at",
-    order: str = "desc"
+    order: str = "desc",
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
 ):
-    """Get sims with filtering and pagination"""
+    """Get sims with filtering and pagination
+    
+    Pass the X-Next-Cursor value of a page as `cursor` to fetch the next one;
+    `skip` is still honoured when no cursor is given.
+    """
     filter_query = {"status": status}
     
     if network:
@@ -1921,7 +2745,31 @@ async def get_sims(
     
     sort_order = -1 if order == "desc" else 1
     
-    sims = await db.sims.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
+    cursor_query = db.sims.find(apply_cursor(filter_query, cursor, sort_by, sort_order))
+    cursor_query = cursor_query.sort([(sort_by, sort_order), ("id", sort_order)])
+    if not cursor:
+        cursor_query = cursor_query.skip(skip)
+    sims = await cursor_query.limit(limit).to_list(limit)
+    set_next_cursor(response, sims, limit, sort_by)
+    return [Sim(**sim) for sim in sims]
+
+@api_router.get("/sims/search", response_model=List[Sim])
+async def search_sims(
+    q: str = Query(..., description="Search query"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, le=100)
+):
+    """Search sims by phone number, features"""
+    search_query = {
+        "$or": [
+            {"phone_number": {"$regex": q, "$options": "i"}},
+            {"features": {"$regex": q, "$options": "i"}},
+            {"description": {"$regex": q, "$options": "i"}}
+        ],
+        "status": "available"
+    }
+    
+    sims = await db.sims.find(search_query).skip(skip).limit(limit).to_list(limit)
     return [Sim(**sim) for sim in sims]
 
 @api_router.get("/sims/{sim_id}", response_model=Sim)
@@ -1931,62 +2779,52 @@ async def get_sim(sim_id: str):
     if not sim_data:
         raise HTTPException(status_code=404, detail="Sim not found")
     
-    # Increment views
-    await db.sims.update_one({"id": sim_id}, {"$inc": {"views": 1}})
-    sim_data["views"] += 1
+    # Count the view; it is flushed in bulk, so add the still-buffered views
+    sim_data["views"] = sim_data.get("views", 0) + view_counter.increment("sims", sim_id)
     
     return Sim(**sim_data)
 
 @api_router.post("/sims", response_model=Sim)
-async def create_sim(sim_data: SimCreate, current_user: User = Depends(get_current_admin)):
+async def create_sim(sim_data: SimCreate, current_user: Principal = Depends(get_current_admin)):
     """Create new sim - Admin only"""
     sim_obj = Sim(**sim_data.dict())
-    await db.sims.insert_one(sim_obj.dict())
+    sim_doc = sim_obj.dict()
+    await db.sims.insert_one(sim_doc)
+    await counters.created("sims", sim_doc)
+    response_cache.invalidate("stats")
     return sim_obj
 
 @api_router.put("/sims/{sim_id}", response_model=Sim)
-async def update_sim(sim_id: str, sim_update: SimUpdate, current_user: User = Depends(get_current_admin)):
+async def update_sim(sim_id: str, sim_update: SimUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update sim - Admin only"""
     update_data = {k: v for k, v in sim_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.sims.update_one({"id": sim_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    previous = await db.sims.find_one_and_update(
+        {"id": sim_id}, {"$set": update_data}, projection=counters.projection("sims")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Sim not found")
+    await counters.updated("sims", previous, update_data)
+    response_cache.invalidate("stats")
     
     updated_sim = await db.sims.find_one({"id": sim_id})
     return Sim(**updated_sim)
 
 @api_router.delete("/sims/{sim_id}")
-async def delete_sim(sim_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_sim(sim_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete sim - Admin only"""
-    result = await db.sims.delete_one({"id": sim_id})
-    if result.deleted_count == 0:
+    deleted = await db.sims.find_one_and_delete({"id": sim_id}, projection=counters.projection("sims"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Sim not found")
+    await counters.deleted("sims", deleted)
+    response_cache.invalidate("stats")
     return {"message": "Sim deleted successfully"}
 
-@api_router.get("/sims/search", response_model=List[Sim])
-async def search_sims(
-    q: str = Query(..., description="Search query"),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100)
-):
-    """Search sims by phone number, features"""
-    search_query = {
-        "$or": [
-            {"phone_number": {"$regex": q, "$options": "i"}},
-            {"features": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}}
-        ],
-        "status": "available"
-    }
-    
-    sims = await db.sims.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Sim(**sim) for sim in sims]
-
 # Land Routes
-@api_router.get("/lands", response_model=List[Land])
+@api_router.get("/lands", response_model=List[Union[Land, LandCard]])
 async def get_lands(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     land_type: Optional[LandType] = None,
@@ -1999,19 +2837,28 @@ async def get_lands(
     max_area: Optional[float] = None,
     featured: Optional[bool] = None,
     sort_by: str = "created_at",
-    order: str = "desc"
+    order: str = "desc",
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    view: str = Query("card", regex="^(card|full)$")
 ):
-    """Get lands with filtering and pagination"""
+    """Get lands with filtering and pagination
+    
+    Pass the X-Next-Cursor value of a page as `cursor` to fetch the next one;
+    `skip` is still honoured when no cursor is given. The default card view
+    returns only the fields a listing card shows and the first image; use
+    view=full (or /lands/{id}) for complete documents.
+    """
     filter_query = {}
     
     if land_type:
         filter_query["land_type"] = land_type
     if status:
         filter_query["status"] = status
+    # Exact matches on the codes resolved at write time (see admin_units.py)
     if city:
-        filter_query["city"] = {"$regex": city, "$options": "i"}
+        filter_query["city_code"] = city_code(city)
     if district:
-        filter_query["district"] = {"$regex": district, "$options": "i"}
+        filter_query["district_code"] = district_code(district)
     if min_price is not None:
         filter_query["price"] = {"$gte": min_price}
     if max_price is not None:
@@ -2031,8 +2878,39 @@ async def get_lands(
     
     sort_order = -1 if order == "desc" else 1
     
-    lands = await db.lands.find(filter_query).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
+    projection = card_projection(LAND_CARD_PROJECTION, sort_by) if view == "card" else None
+    cursor_query = db.lands.find(apply_cursor(filter_query, cursor, sort_by, sort_order), projection)
+    cursor_query = cursor_query.sort([(sort_by, sort_order), ("id", sort_order)])
+    if not cursor:
+        cursor_query = cursor_query.skip(skip)
+    lands = await cursor_query.limit(limit).to_list(limit)
+    set_next_cursor(response, lands, limit, sort_by)
+    if view == "card":
+        return [LandCard(**add_image_variants(land)) for land in lands]
+    return [Land(**add_image_variants(land)) for land in lands]
+
+@api_router.get("/lands/featured", response_model=List[Union[Land, LandCard]])
+@response_cache.cached(ttl=RESPONSE_CACHE_TTL, tags=["lands"])
+async def get_featured_lands(
+    limit: int = Query(6, le=20),
+    view: str = Query("card", regex="^(card|full)$")
+):
+    """Get featured lands (card view by default)"""
+    projection = LAND_CARD_PROJECTION if view == "card" else None
+    lands = await db.lands.find({"featured": True}, projection).sort("created_at", -1).limit(limit).to_list(limit)
+    if view == "card":
+        return [LandCard(**add_image_variants(land)) for land in lands]
+    return [Land(**add_image_variants(land)) for land in lands]
+
+@api_router.get("/lands/search", response_model=List[Land])
+async def search_lands(
+    q: str = Query(..., description="Search query"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, le=100)
+):
+    """Search lands by title, description, address"""
+    lands = await search_documents("lands", q, skip, limit)
+    return [Land(**add_image_variants(land)) for land in lands]
 
 @api_router.get("/lands/{land_id}", response_model=Land)
 async def get_land(land_id: str):
@@ -2041,28 +2919,36 @@ async def get_land(land_id: str):
     if not land_data:
         raise HTTPException(status_code=404, detail="Land not found")
     
-    # Increment views
-    await db.lands.update_one({"id": land_id}, {"$inc": {"views": 1}})
-    land_data["views"] += 1
+    # Count the view; it is flushed in bulk, so add the still-buffered views
+    land_data["views"] = land_data.get("views", 0) + view_counter.increment("lands", land_id)
     
-    return Land(**land_data)
+    return Land(**add_image_variants(land_data))
 
 @api_router.post("/lands", response_model=Land)
-async def create_land(land_data: LandCreate, current_user: User = Depends(get_current_admin)):
+async def create_land(land_data: LandCreate, current_user: Principal = Depends(get_current_admin)):
     """Create new land - Admin only"""
     land_dict = land_data.dict()
+    land_dict["images"] = await store_inline_images(land_dict["images"])
     if land_dict.get("area") and land_dict.get("price"):
         land_dict["price_per_sqm"] = land_dict["price"] / land_dict["area"]
     
     land_obj = Land(**land_dict)
-    await db.lands.insert_one(land_obj.dict())
-    return land_obj
+    land_doc = land_obj.dict(exclude={"image_variants"})
+    land_doc["search_text"] = search_text(land_doc)
+    land_doc.update(location_codes(land_doc))
+    await db.lands.insert_one(land_doc)
+    await counters.created("lands", land_doc)
+    response_cache.invalidate("lands")
+    search_engine.index("lands", land_doc)
+    return Land(**add_image_variants(land_doc))
 
 @api_router.put("/lands/{land_id}", response_model=Land)
-async def update_land(land_id: str, land_update: LandUpdate, current_user: User = Depends(get_current_admin)):
+async def update_land(land_id: str, land_update: LandUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update land - Admin only"""
     update_data = {k: v for k, v in land_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
+    if "images" in update_data:
+        update_data["images"] = await store_inline_images(update_data["images"])
     
     if "area" in update_data or "price" in update_data:
         land_data = await db.lands.find_one({"id": land_id})
@@ -2072,47 +2958,31 @@ async def update_land(land_id: str, land_update: LandUpdate, current_user: User
             if area and price:
                 update_data["price_per_sqm"] = price / area
     
-    result = await db.lands.update_one({"id": land_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    update_data.update(location_codes(update_data))
+    previous = await db.lands.find_one_and_update(
+        {"id": land_id}, {"$set": update_data}, projection=write_projection("lands")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Land not found")
+    await counters.updated("lands", previous, update_data)
+    await update_search_text("lands", land_id, previous, update_data)
+    response_cache.invalidate("lands")
+    search_engine.index("lands", {**previous, **update_data})
     
     updated_land = await db.lands.find_one({"id": land_id})
-    return Land(**updated_land)
+    return Land(**add_image_variants(updated_land))
 
 @api_router.delete("/lands/{land_id}")
-async def delete_land(land_id: str, current_user: User = Depends(get_current_admin)):
+async def delete_land(land_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete land - Admin only"""
-    result = await db.lands.delete_one({"id": land_id})
-    if result.deleted_count == 0:
+    deleted = await db.lands.find_one_and_delete({"id": land_id}, projection=counters.projection("lands"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Land not found")
+    await counters.deleted("lands", deleted)
+    response_cache.invalidate("lands")
+    search_engine.remove("lands", land_id)
     return {"message": "Land deleted successfully"}
 
-@api_router.get("/lands/featured", response_model=List[Land])
-async def get_featured_lands(limit: int = Query(6, le=20)):
-    """Get featured lands"""
-    lands = await db.lands.find({"featured": True}).sort("created_at", -1).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
-
-@api_router.get("/lands/search", response_model=List[Land])
-async def search_lands(
-    q: str = Query(..., description="Search query"),
-    skip: int = Query(0, ge=0),
-    limit: int = Query(20, le=100)
-):
-    """Search lands by title, description, address"""
-    search_query = {
-        "$or": [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"address": {"$regex": q, "$options": "i"}},
-            {"district": {"$regex": q, "$options": "i"}},
-            {"city": {"$regex": q, "$options": "i"}}
-        ]
-    }
-    
-    lands = await db.lands.find(search_query).skip(skip).limit(limit).to_list(limit)
-    return [Land(**land) for land in lands]
-
 # Ticket Routes
 @api_router.get("/tickets", response_model=List[Ticket])
 async def get_tickets(
@@ -2120,7 +2990,7 @@ async def get_tickets(
     limit: int = Query(20, le=100),
     status: Optional[str] = None,
     priority: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get tickets - Admin only"""
     filter_query = {}
@@ -2133,7 +3003,7 @@ async def get_tickets(
     return [Ticket(**ticket) for ticket in tickets]
 
 @api_router.get("/tickets/{ticket_id}", response_model=Ticket)
-async def get_ticket(ticket_id: str, current_user: User = Depends(get_current_user)):
+async def get_ticket(ticket_id: str, current_user: Principal = Depends(get_current_principal)):
     """Get single ticket - Admin only"""
     ticket_data = await db.tickets.find_one({"id": ticket_id})
     if not ticket_data:
@@ -2144,7 +3014,10 @@ async def get_ticket(ticket_id: str, current_user: User = Depends(get_current_us
 async def create_ticket(ticket_data: TicketCreate):
     """Create new ticket (public endpoint)"""
     ticket_obj = Ticket(**ticket_data.dict())
-    await db.tickets.insert_one(ticket_obj.dict())
+    ticket_doc = ticket_obj.dict()
+    await db.tickets.insert_one(ticket_doc)
+    await counters.created("tickets", ticket_doc)
+    response_cache.invalidate("stats")
     return ticket_obj
 
 @api_router.put("/tickets/{ticket_id}", response_model=Ticket)
@@ -2153,9 +3026,13 @@ async def update_ticket(ticket_id: str, ticket_update: TicketUpdate, current_use
     update_data = {k: v for k, v in ticket_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    result = await db.tickets.update_one({"id": ticket_id}, {"$set": update_data})
-    if result.matched_count == 0:
+    previous = await db.tickets.find_one_and_update(
+        {"id": ticket_id}, {"$set": update_data}, projection=counters.projection("tickets")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
+    await counters.updated("tickets", previous, update_data)
+    response_cache.invalidate("stats")
     
     updated_ticket = await db.tickets.find_one({"id": ticket_id})
     return Ticket(**updated_ticket)
@@ -2163,9 +3040,11 @@ async def update_ticket(ticket_id: str, ticket_update: TicketUpdate, current_use
 @api_router.delete("/tickets/{ticket_id}")
 async def delete_ticket(ticket_id: str, current_user: User = Depends(get_current_user)):
     """Delete ticket - Admin only"""
-    result = await db.tickets.delete_one({"id": ticket_id})
-    if result.deleted_count == 0:
+    deleted = await db.tickets.find_one_and_delete({"id": ticket_id}, projection=counters.projection("tickets"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
+    await counters.deleted("tickets", deleted)
+    response_cache.invalidate("stats")
     return {"message": "Ticket deleted successfully"}
 
 # Messaging endpoints
@@ -2185,7 +3064,7 @@ async def get_messages(
     ticket_id: Optional[str] = None,
     deposit_id: Optional[str] = None,
     limit: int = 50,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     query = {"$or": [
         {"from_user_id": current_user.id},
@@ -2217,31 +3096,152 @@ async def mark_message_read(message_id: str, current_user: User = Depends(get_cu
     return {"message": "Đã đánh dấu đã đọc"}
 
 @api_router.get("/admin/messages/unread", response_model=dict)
-async def get_unread_messages_count(current_admin: User = Depends(get_current_admin)):
+async def get_unread_messages_count(current_admin: Principal = Depends(get_current_admin)):
     count = await db.messages.count_documents({
         "to_user_id": current_admin.id,
         "read": False
     })
     
     return {"unread_count": count}
-@api_router.post("/analytics/pageview")
+
+
+def build_pageview(analytics_data: AnalyticsCreate) -> dict:
+    """PageView document for an analytics event, built without a second model pass"""
+    pageview = analytics_data.dict()
+    pageview["id"] = str(uuid.uuid4())
+    pageview["timestamp"] = datetime.utcnow()
+    pageview["duration"] = None
+    return pageview
+
+@api_router.post("/analytics/pageview", status_code=202)
 async def track_page_view(analytics_data: AnalyticsCreate):
-    """Track page view (public endpoint)"""
-    pageview_obj = PageView(**analytics_data.dict())
-    await db.pageviews.insert_one(pageview_obj.dict())
+    """Track page view (public endpoint)
+    
+    The view is queued and written in a batch shortly after; when the queue is
+    full it is dropped, or refused with 503 if PAGEVIEW_QUEUE_OVERFLOW=reject.
+    """
+    if not pageview_queue.offer(build_pageview(analytics_data)) and pageview_queue.overflow == "reject":
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics queue is full",
+            headers={"Retry-After": "1"}
+        )
     return {"message": "Page view tracked successfully"}
 
+analytics_batch_adapter = TypeAdapter(List[AnalyticsCreate])
+
+async def read_body_capped(request: Request, max_bytes: int) -> bytes:
+    """Read a request body, refusing it with 413 as soon as it exceeds max_bytes"""
+    too_large = HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise too_large
+    return bytes(body)
+
+@api_router.post("/analytics/pageviews:batch", status_code=202)
+async def track_page_views_batch(request: Request):
+    """Track a batch of page views in one request (public endpoint)
+    
+    Body is a JSON array of pageview events. Any content type is accepted so
+    the frontend can flush with navigator.sendBeacon, which sends text/plain.
+    Events go through the same queue as single page views: with
+    PAGEVIEW_QUEUE_OVERFLOW=reject a batch that does not fit is refused with
+    503 as a whole, otherwise events that do not fit are dropped.
+    """
+    body = await read_body_capped(request, PAGEVIEW_BATCH_MAX_BYTES)
+    try:
+        events = analytics_batch_adapter.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json(include_url=False)))
+    
+    if len(events) > PAGEVIEW_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {PAGEVIEW_BATCH_MAX} events per batch")
+    if pageview_queue.overflow == "reject" and not pageview_queue.has_room(len(events)):
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics queue is full",
+            headers={"Retry-After": "1"}
+        )
+    for event in events:
+        pageview_queue.offer(build_pageview(event))
+    
+    return {"message": "Page views tracked successfully", "count": len(events)}
+
+@api_router.get("/admin/analytics/ingestion")
+async def get_pageview_ingestion_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Pageview ingestion queue and retention metrics - Admin only"""
+    return {
+        "queue_depth": pageview_queue.depth(),
+        "overflow_policy": pageview_queue.overflow,
+        **pageview_queue.stats,
+        "retention_days": pageview_retention.retention_days,
+        "rollup_watermark": await traffic_rollups.watermark(),
+        "archived_through": await pageview_retention.archived_through()
+    }
+
+@api_router.get("/admin/auth/principals")
+async def get_principal_cache_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Authenticated principal cache metrics - Admin only"""
+    return principal_cache.metrics()
+
+@api_router.get("/admin/auth/sessions")
+async def get_session_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Refresh-token session metrics - Admin only"""
+    return await session_store.metrics()
+
+@api_router.get("/admin/auth/hashing")
+async def get_password_hashing_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Password hashing pool metrics - Admin only"""
+    return password_hasher.metrics()
+
+@api_router.get("/admin/counters")
+async def get_counter_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Materialized counter metrics - Admin only"""
+    return {**counters.stats, "reconcile_interval": counters.reconcile_interval}
+
+@api_router.post("/admin/counters/reconcile")
+async def reconcile_counters(current_admin: Principal = Depends(get_current_admin)):
+    """Recount all entities now instead of waiting for the periodic job - Admin only"""
+    await counters.reconcile()
+    return {"message": "Counters reconciled", **await counters.read()}
+
+@api_router.get("/admin/search")
+async def get_search_engine_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Search index metrics: documents, terms, postings and query counts - Admin only"""
+    return {"enabled": SEARCH_ENGINE_ENABLED, **search_engine.metrics()}
+
+@api_router.get("/admin/cache")
+async def get_response_cache_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Response cache metrics: hits, misses and evictions - Admin only"""
+    return response_cache.metrics()
+
+@api_router.get("/admin/rate-limits")
+async def get_rate_limit_stats(current_admin: Principal = Depends(get_current_admin)):
+    """Rate limiter metrics: allowed and throttled requests per rule - Admin only"""
+    return {"enabled": RATE_LIMIT_ENABLED, **rate_limiter.metrics()}
+
 @api_router.get("/analytics/traffic")
 async def get_traffic_analytics(
-    period: str = Query("week", regex="^(day|week|month|year)$"),
+    period: str = Query("week", regex="^(hour|day|week|month|year)$"),
     limit: int = Query(30, le=365),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get traffic analytics - Admin only"""
     now = datetime.utcnow()
+    granularity = "day"
     
     # Calculate date range based on period
-    if period == "day":
+    if period == "hour":
+        # Hourly rollups are kept for ROLLUP_HOURLY_RETENTION_DAYS
+        start_date = now - timedelta(hours=min(limit, ROLLUP_HOURLY_RETENTION_DAYS * 24))
+        group_format = "%Y-%m-%d %H:00"
+        granularity = "hour"
+    elif period == "day":
         start_date = now - timedelta(days=limit)
         group_format = "%Y-%m-%d"
     elif period == "week":
@@ -2254,105 +3254,93 @@ async def get_traffic_analytics(
         start_date = now - timedelta(days=limit*365)
         group_format = "%Y"
     
-    # Aggregate page views by time period
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": group_format,
-                        "date": "$timestamp"
-                    }
-                },
-                "views": {"$sum": 1},
-                "unique_sessions": {"$addToSet": "$session_id"}
-            }
-        },
-        {
-            "$addFields": {
-                "unique_visitors": {"$size": "$unique_sessions"}
-            }
-        },
-        {"$sort": {"_id": 1}},
-        {"$limit": limit}
-    ]
-    
-    traffic_data = await db.pageviews.aggregate(pipeline).to_list(limit)
+    # Rollups grouped by period; unique visitors come from merged sketches
+    traffic_data = await traffic_rollups.site_series(
+        start_date, lambda bucket: bucket.strftime(group_format), granularity
+    )
+    traffic_data = traffic_data[:limit]
     
     return {
         "period": period,
-        "data": traffic_data
+        "data": traffic_data,
+        # Relative standard error of every unique_visitors figure
+        "unique_visitors_error": round(standard_error(), 4)
     }
 
 @api_router.get("/analytics/popular-pages")
 async def get_popular_pages(
     limit: int = Query(10, le=50),
     days: int = Query(7, le=365),
-    current_user: User = Depends(get_current_user)
+    hours: Optional[int] = Query(None, ge=1, le=ROLLUP_HOURLY_RETENTION_DAYS * 24),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get most popular pages - Admin only"""
+    # `hours` asks for a trailing window answered from the hourly rollups
+    if hours:
+        start_date = datetime.utcnow() - timedelta(hours=hours)
+        return await traffic_rollups.popular_pages(start_date, limit, "hour")
     start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"timestamp": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": "$page_path",
-                "views": {"$sum": 1},
-                "unique_visitors": {"$addToSet": "$session_id"}
-            }
-        },
-        {
-            "$addFields": {
-                "unique_visitors_count": {"$size": "$unique_visitors"}
-            }
-        },
-        {"$sort": {"views": -1}},
-        {"$limit": limit}
-    ]
-    
-    popular_pages = await db.pageviews.aggregate(pipeline).to_list(limit)
+    popular_pages = await traffic_rollups.popular_pages(start_date, limit)
     return popular_pages
 
 # Admin CRUD APIs for Properties, News, SIMs, Lands
 @api_router.post("/admin/properties", response_model=dict)
-async def admin_create_property(property_data: PropertyCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_property(property_data: PropertyCreate, current_user: Principal = Depends(get_current_admin)):
     """Create property - Admin only"""
     property_dict = property_data.dict()
+    property_dict["images"] = await store_inline_images(property_dict["images"])
     property_dict["id"] = str(uuid.uuid4())
     property_dict["created_at"] = datetime.utcnow()
     property_dict["updated_at"] = datetime.utcnow()
     property_dict["views"] = 0
     
+    property_dict["search_text"] = search_text(property_dict)
+    property_dict.update(location_codes(property_dict))
     await db.properties.insert_one(property_dict)
+    
+    await counters.created("properties", property_dict)
+    response_cache.invalidate("properties")
+    search_engine.index("properties", property_dict)
     return {"message": "Property created successfully", "id": property_dict["id"]}
 
 @api_router.put("/admin/properties/{property_id}", response_model=dict)
-async def admin_update_property(property_id: str, property_data: PropertyUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_property(property_id: str, property_data: PropertyUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update property - Admin only"""
     update_dict = property_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
+    if update_dict.get("images") is not None:
+        update_dict["images"] = await store_inline_images(update_dict["images"])
     
-    result = await db.properties.update_one({"id": property_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    update_dict.update(location_codes(update_dict))
+    previous = await db.properties.find_one_and_update(
+        {"id": property_id}, {"$set": update_dict}, projection=write_projection("properties")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Property not found")
+    await counters.updated("properties", previous, update_dict)
+    await update_search_text("properties", property_id, previous, update_dict)
+    response_cache.invalidate("properties")
+    search_engine.index("properties", {**previous, **update_dict})
     
     return {"message": "Property updated successfully"}
 
 @api_router.delete("/admin/properties/{property_id}")
-async def admin_delete_property(property_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_property(property_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete property - Admin only"""
-    result = await db.properties.delete_one({"id": property_id})
-    if result.deleted_count == 0:
+    deleted = await db.properties.find_one_and_delete({"id": property_id}, projection=counters.projection("properties"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Property not found")
+    await counters.deleted("properties", deleted)
+    response_cache.invalidate("properties")
+    search_engine.remove("properties", property_id)
     
     return {"message": "Property deleted successfully"}
 
 @api_router.post("/admin/news", response_model=dict)
-async def admin_create_news(news_data: NewsCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_news(news_data: NewsCreate, current_user: Principal = Depends(get_current_admin)):
     """Create news - Admin only"""
     news_dict = news_data.dict()
+    news_dict["featured_image"] = await store_inline_image(news_dict["featured_image"])
     news_dict["id"] = str(uuid.uuid4())
     news_dict["slug"] = news_dict["title"].lower().replace(" ", "-")
     news_dict["created_at"] = datetime.utcnow()
@@ -2360,31 +3348,45 @@ async def admin_create_news(news_data: NewsCreate, current_user: User = Depends(
     news_dict["views"] = 0
     
     await db.news_articles.insert_one(news_dict)
+    
+    await counters.created("news_articles", news_dict)
+    response_cache.invalidate("stats")
+    search_engine.index("news_articles", news_dict)
     return {"message": "News created successfully", "id": news_dict["id"]}
 
 @api_router.put("/admin/news/{news_id}", response_model=dict)
-async def admin_update_news(news_id: str, news_data: NewsUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_news(news_id: str, news_data: NewsUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update news - Admin only"""
     update_dict = news_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
+    if update_dict.get("featured_image"):
+        update_dict["featured_image"] = await store_inline_image(update_dict["featured_image"])
     
-    result = await db.news_articles.update_one({"id": news_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    previous = await db.news_articles.find_one_and_update(
+        {"id": news_id}, {"$set": update_dict}, projection=write_projection("news_articles")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="News not found")
+    await counters.updated("news_articles", previous, update_dict)
+    response_cache.invalidate("stats")
+    search_engine.index("news_articles", {**previous, **update_dict})
     
     return {"message": "News updated successfully"}
 
 @api_router.delete("/admin/news/{news_id}")
-async def admin_delete_news(news_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_news(news_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete news - Admin only"""
-    result = await db.news_articles.delete_one({"id": news_id})
-    if result.deleted_count == 0:
+    deleted = await db.news_articles.find_one_and_delete({"id": news_id}, projection=counters.projection("news_articles"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="News not found")
+    await counters.deleted("news_articles", deleted)
+    response_cache.invalidate("stats")
+    search_engine.remove("news_articles", news_id)
     
     return {"message": "News deleted successfully"}
 
 @api_router.post("/admin/sims", response_model=dict)
-async def admin_create_sim(sim_data: SimCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_sim(sim_data: SimCreate, current_user: Principal = Depends(get_current_admin)):
     """Create SIM - Admin only"""
     sim_dict = sim_data.dict()
     sim_dict["id"] = str(uuid.uuid4())
@@ -2394,60 +3396,88 @@ async def admin_create_sim(sim_data: SimCreate, current_user: User = Depends(get
     sim_dict["status"] = "available"
     
     await db.sims.insert_one(sim_dict)
+    
+    await counters.created("sims", sim_dict)
+    response_cache.invalidate("stats")
     return {"message": "SIM created successfully", "id": sim_dict["id"]}
 
 @api_router.put("/admin/sims/{sim_id}", response_model=dict)
-async def admin_update_sim(sim_id: str, sim_data: SimUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_sim(sim_id: str, sim_data: SimUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update SIM - Admin only"""
     update_dict = sim_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
     
-    result = await db.sims.update_one({"id": sim_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    previous = await db.sims.find_one_and_update(
+        {"id": sim_id}, {"$set": update_dict}, projection=counters.projection("sims")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="SIM not found")
+    await counters.updated("sims", previous, update_dict)
+    response_cache.invalidate("stats")
     
     return {"message": "SIM updated successfully"}
 
 @api_router.delete("/admin/sims/{sim_id}")
-async def admin_delete_sim(sim_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_sim(sim_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete SIM - Admin only"""
-    result = await db.sims.delete_one({"id": sim_id})
-    if result.deleted_count == 0:
+    deleted = await db.sims.find_one_and_delete({"id": sim_id}, projection=counters.projection("sims"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="SIM not found")
+    await counters.deleted("sims", deleted)
+    response_cache.invalidate("stats")
     
     return {"message": "SIM deleted successfully"}
 
 @api_router.post("/admin/lands", response_model=dict)
-async def admin_create_land(land_data: LandCreate, current_user: User = Depends(get_current_admin)):
+async def admin_create_land(land_data: LandCreate, current_user: Principal = Depends(get_current_admin)):
     """Create land - Admin only"""
     land_dict = land_data.dict()
+    land_dict["images"] = await store_inline_images(land_dict["images"])
     land_dict["id"] = str(uuid.uuid4())
     land_dict["created_at"] = datetime.utcnow()
     land_dict["updated_at"] = datetime.utcnow()
     land_dict["views"] = 0
     land_dict["status"] = "for_sale"
     
+    land_dict["search_text"] = search_text(land_dict)
+    land_dict.update(location_codes(land_dict))
     await db.lands.insert_one(land_dict)
+    
+    await counters.created("lands", land_dict)
+    response_cache.invalidate("lands")
+    search_engine.index("lands", land_dict)
     return {"message": "Land created successfully", "id": land_dict["id"]}
 
 @api_router.put("/admin/lands/{land_id}", response_model=dict)
-async def admin_update_land(land_id: str, land_data: LandUpdate, current_user: User = Depends(get_current_admin)):
+async def admin_update_land(land_id: str, land_data: LandUpdate, current_user: Principal = Depends(get_current_admin)):
     """Update land - Admin only"""
     update_dict = land_data.dict(exclude_unset=True)
     update_dict["updated_at"] = datetime.utcnow()
+    if update_dict.get("images") is not None:
+        update_dict["images"] = await store_inline_images(update_dict["images"])
     
-    result = await db.lands.update_one({"id": land_id}, {"$set": update_dict})
-    if result.matched_count == 0:
+    update_dict.update(location_codes(update_dict))
+    previous = await db.lands.find_one_and_update(
+        {"id": land_id}, {"$set": update_dict}, projection=write_projection("lands")
+    )
+    if previous is None:
         raise HTTPException(status_code=404, detail="Land not found")
+    await counters.updated("lands", previous, update_dict)
+    await update_search_text("lands", land_id, previous, update_dict)
+    response_cache.invalidate("lands")
+    search_engine.index("lands", {**previous, **update_dict})
     
     return {"message": "Land updated successfully"}
 
 @api_router.delete("/admin/lands/{land_id}")
-async def admin_delete_land(land_id: str, current_user: User = Depends(get_current_admin)):
+async def admin_delete_land(land_id: str, current_user: Principal = Depends(get_current_admin)):
     """Delete land - Admin only"""
-    result = await db.lands.delete_one({"id": land_id})
-    if result.deleted_count == 0:
+    deleted = await db.lands.find_one_and_delete({"id": land_id}, projection=counters.projection("lands"))
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Land not found")
+    await counters.deleted("lands", deleted)
+    response_cache.invalidate("lands")
+    search_engine.remove("lands", land_id)
     
     return {"message": "Land deleted successfully"}
 
@@ -2458,7 +3488,7 @@ async def get_all_members(
     limit: int = Query(20, le=100),
     role: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     """Get all members - Admin only"""
     filter_query = {}
@@ -2471,7 +3501,7 @@ async def get_all_members(
     return [UserProfile(**member) for member in members]
 
 @api_router.get("/admin/members/{user_id}", response_model=UserProfile)
-async def get_member_details(user_id: str, current_user: User = Depends(get_current_admin)):
+async def get_member_details(user_id: str, current_user: Principal = Depends(get_current_admin)):
     """Get member details - Admin only"""
     member = await db.users.find_one({"id": user_id})
     if not member:
@@ -2479,16 +3509,21 @@ async def get_member_details(user_id: str, current_user: User = Depends(get_curr
     return UserProfile(**member)
 
 @api_router.put("/admin/members/{user_id}")
-async def update_member(user_id: str, update_data: dict, current_user: User = Depends(get_current_admin)):
+async def update_member(user_id: str, update_data: dict, current_user: Principal = Depends(get_current_admin)):
     """Update member - Admin only"""
     update_fields = {k: v for k, v in update_data.items() if v is not None}
     update_fields["updated_at"] = datetime.utcnow()
+    if "avatar" in update_fields:
+        update_fields["avatar"] = await store_inline_image(update_fields["avatar"], variants=False)
     
     result = await db.users.update_one({"id": user_id}, {"$set": update_fields})
+    principal_cache.invalidate(user_id)
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Member not found")
     
     updated_member = await db.users.find_one({"id": user_id})
+    if update_fields.keys() & {"role", "status", "hashed_password"}:
+        await token_revocations.revoke(user_id, updated_member.get("status", "active"))
     return UserProfile(**updated_member)
 
 @api_router.post("/admin/members/{user_id}/adjust-balance")
@@ -2496,7 +3531,7 @@ async def adjust_member_balance(
     user_id: str, 
     amount: float, 
     description: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     """Adjust member wallet balance - Admin only"""
     member = await db.users.find_one({"id": user_id})
@@ -2512,6 +3547,7 @@ async def adjust_member_balance(
         {"id": user_id},
         {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
     )
+    principal_cache.invalidate(user_id)
     
     # Create transaction record
     transaction = Transaction(
@@ -2533,7 +3569,8 @@ async def get_pending_deposits(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, le=100),
     status: TransactionStatus = Query(TransactionStatus.pending),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Get deposit requests - Admin only"""
     filter_query = {
@@ -2541,12 +3578,13 @@ async def get_pending_deposits(
         "status": status
     }
     
-    deposits = await db.transactions.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    deposits = await db.transactions.find(filter_query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Get user details for each deposit
     enriched_deposits = []
+    users = await loader.load_many("users", (deposit["user_id"] for deposit in deposits))
     for deposit in deposits:
-        user = await db.users.find_one({"id": deposit["user_id"]})
+        user = users.get(deposit["user_id"])
         deposit["user_name"] = user.get("full_name", "Unknown") if user else "Unknown"
         deposit["user_email"] = user.get("email", "Unknown") if user else "Unknown"
         enriched_deposits.append(deposit)
@@ -2557,10 +3595,11 @@ async def get_pending_deposits(
 async def approve_deposit(
     transaction_id: str,
     admin_notes: str = "",
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Approve deposit request - Admin only"""
-    transaction = await db.transactions.find_one({"id": transaction_id})
+    transaction = await loader.load("transactions", transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
@@ -2581,13 +3620,12 @@ async def approve_deposit(
     )
     
     # Add money to user wallet
-    user = await db.users.find_one({"id": transaction["user_id"]})
-    if user:
-        new_balance = user.get("wallet_balance", 0.0) + transaction["amount"]
-        await db.users.update_one(
-            {"id": transaction["user_id"]},
-            {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
-        )
+    result = await db.users.update_one(
+        {"id": transaction["user_id"]},
+        {"$inc": {"wallet_balance": transaction["amount"]}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if result.matched_count:
+        principal_cache.invalidate(transaction["user_id"])
     
     return {"message": "Deposit approved successfully"}
 
@@ -2595,10 +3633,11 @@ async def approve_deposit(
 async def reject_deposit(
     transaction_id: str,
     admin_notes: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Reject deposit request - Admin only"""
-    transaction = await db.transactions.find_one({"id": transaction_id})
+    transaction = await loader.load("transactions", transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
@@ -2624,7 +3663,7 @@ async def reject_deposit(
 @api_router.post("/member/deposits/create")
 async def create_deposit_request(
     amount: float,
-    bank_transfer_image: str,  # base64 image
+    bank_transfer_image: str,  # blob ID from /uploads (base64 still accepted)
     transfer_content: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -2648,7 +3687,7 @@ async def create_deposit_request(
     
     # Store bank transfer image
     transaction_dict = transaction.dict()
-    transaction_dict["bank_transfer_image"] = bank_transfer_image
+    transaction_dict["bank_transfer_image"] = await store_inline_image(bank_transfer_image, variants=False)
     transaction_dict["transfer_content"] = transfer_content
     
     await db.transactions.insert_one(transaction_dict)
@@ -2660,7 +3699,7 @@ async def create_deposit_request(
     }
 
 @api_router.get("/member/bank-info")
-async def get_bank_info(current_user: User = Depends(get_current_user)):
+async def get_bank_info(current_user: Principal = Depends(get_current_principal)):
     """Get bank information for deposits"""
     return {
         "bank_name": "Ngân hàng Techcombank",
@@ -2680,7 +3719,7 @@ async def get_member_posts(
     limit: int = Query(10, le=50),
     post_type: Optional[str] = Query(None),  # properties, lands, sims
     status: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Get member's posts"""
     filter_query = {"user_id": current_user.id}
@@ -2700,18 +3739,23 @@ async def create_member_post(
     """Create member post (property/land/sim)"""
     # Check wallet balance for posting fee (50k VND)
     POSTING_FEE = 50000
-    if current_user.wallet_balance < POSTING_FEE:
+    wallet_balance = await load_wallet_balance(current_user.id)
+    if wallet_balance < POSTING_FEE:
         raise HTTPException(
             status_code=400, 
-            detail=f"Insufficient balance. Need {POSTING_FEE:,} VND to post. Current balance: {current_user.wallet_balance:,} VND"
+            detail=f"Insufficient balance. Need {POSTING_FEE:,} VND to post. Current balance: {wallet_balance:,} VND"
         )
     
+    if isinstance(post_data.get("images"), list):
+        post_data["images"] = await store_inline_images(post_data["images"])
+    
     # Deduct posting fee
-    new_balance = current_user.wallet_balance - POSTING_FEE
+    new_balance = wallet_balance - POSTING_FEE
     await db.users.update_one(
         {"id": current_user.id},
         {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
     )
+    principal_cache.invalidate(current_user.id)
     
     # Create transaction record
     transaction = Transaction(
@@ -2751,22 +3795,24 @@ async def get_pending_member_posts(
     limit: int = Query(20, le=100),
     post_type: Optional[str] = Query(None),
     status: str = Query("pending"),
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Get member posts for admin approval"""
     filter_query = {"status": status}
     if post_type:
         filter_query["post_type"] = post_type
     
-    posts = await db.member_posts.find(filter_query).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    posts = await db.member_posts.find(filter_query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     
     # Get user details for each post
     enriched_posts = []
+    users = await loader.load_many("users", (post["user_id"] for post in posts))
     for post in posts:
-        user = await db.users.find_one({"id": post["user_id"]})
+        user = users.get(post["user_id"])
         post["user_name"] = user.get("full_name", "Unknown") if user else "Unknown"
         post["user_email"] = user.get("email", "Unknown") if user else "Unknown"
-        enriched_posts.append(post)
+        enriched_posts.append(add_image_variants(post))
     
     return enriched_posts
 
@@ -2774,10 +3820,11 @@ async def get_pending_member_posts(
 async def approve_member_post(
     post_id: str,
     admin_notes: str = "",
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Approve member post and move to main collection"""
-    post = await db.member_posts.find_one({"id": post_id})
+    post = await loader.load("member_posts", post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -2796,11 +3843,23 @@ async def approve_member_post(
     
     # Insert to appropriate collection
     if post_type == "properties":
+        post_data["search_text"] = search_text(post_data)
+        post_data.update(location_codes(post_data))
         await db.properties.insert_one(post_data)
+        await counters.created("properties", post_data)
+        response_cache.invalidate("properties")
+        search_engine.index("properties", post_data)
     elif post_type == "lands":
+        post_data["search_text"] = search_text(post_data)
+        post_data.update(location_codes(post_data))
         await db.lands.insert_one(post_data)
+        await counters.created("lands", post_data)
+        response_cache.invalidate("lands")
+        search_engine.index("lands", post_data)
     elif post_type == "sims":
         await db.sims.insert_one(post_data)
+        await counters.created("sims", post_data)
+        response_cache.invalidate("stats")
     
     # Update member post status
     await db.member_posts.update_one(
@@ -2821,10 +3880,11 @@ async def approve_member_post(
 async def reject_member_post(
     post_id: str,
     admin_notes: str,
-    current_user: User = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin),
+    loader: DataLoader = Depends(get_data_loader)
 ):
     """Reject member post"""
-    post = await db.member_posts.find_one({"id": post_id})
+    post = await loader.load("member_posts", post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -2845,14 +3905,13 @@ async def reject_member_post(
     )
     
     # Refund posting fee
-    user = await db.users.find_one({"id": post["user_id"]})
-    if user:
-        POSTING_FEE = 50000
-        new_balance = user.get("wallet_balance", 0.0) + POSTING_FEE
-        await db.users.update_one(
-            {"id": post["user_id"]},
-            {"$set": {"wallet_balance": new_balance, "updated_at": datetime.utcnow()}}
-        )
+    POSTING_FEE = 50000
+    result = await db.users.update_one(
+        {"id": post["user_id"]},
+        {"$inc": {"wallet_balance": POSTING_FEE}, "$set": {"updated_at": datetime.utcnow()}}
+    )
+    if result.matched_count:
+        principal_cache.invalidate(post["user_id"])
         
         # Create refund transaction
         transaction = Transaction(
@@ -2871,12 +3930,17 @@ async def reject_member_post(
 # Include the router in the main app
 app.include_router(api_router)
 
+# Added before CORS so throttled responses still carry CORS headers
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Configure logging
@@ -2886,6 +3950,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_build_indexes():
+    # Registered first: the unique keys the background jobs depend on are awaited.
+    # The rest run in the background so large collections don't block startup;
+    # /api/health/ready reports the indexes until they are built
+    await ensure_startup_indexes()
+    app.state.index_task = asyncio.create_task(ensure_indexes())
+
+@app.on_event("startup")
+async def startup_rate_limit_check():
+    if RATE_LIMIT_ENABLED and not os.environ.get('RATE_LIMIT_TRUSTED_PROXIES'):
+        logger.warning(
+            "RATE_LIMIT_TRUSTED_PROXIES is not set; trusting X-Forwarded-For from loopback and private "
+            "networks only. Behind a proxy outside those ranges every client shares one rate-limit bucket."
+        )
+
+@app.on_event("startup")
+async def startup_write_behind():
+    view_counter.start()
+    pageview_queue.start()
+
+@app.on_event("startup")
+async def startup_token_revocations():
+    token_revocations.start()
+
+@app.on_event("startup")
+async def startup_counters():
+    counters.start()
+
+@app.on_event("startup")
+async def startup_search_engine():
+    if SEARCH_ENGINE_ENABLED:
+        search_engine.start()
+
+@app.on_event("startup")
+async def startup_traffic_rollups():
+    traffic_rollups.start()
+    pageview_retention.start()
+
+@app.on_event("shutdown")
+async def shutdown_write_behind():
+    await view_counter.stop()
+    await pageview_queue.stop()
+
+@app.on_event("shutdown")
+async def shutdown_token_revocations():
+    await token_revocations.stop()
+
+@app.on_event("shutdown")
+async def shutdown_counters():
+    await counters.stop()
+
+@app.on_event("shutdown")
+async def shutdown_search_engine():
+    await search_engine.stop()
+
+@app.on_event("shutdown")
+async def shutdown_traffic_rollups():
+    await pageview_retention.stop()
+    await traffic_rollups.stop()
+
+@app.on_event("shutdown")
+async def shutdown_image_workers():
+    image_variants.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_password_hasher():
+    password_hasher.shutdown()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
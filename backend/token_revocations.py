@@ -0,0 +1,94 @@
+"""
+Token version / revocation table for stateless authorization.
+
+Access tokens carry the user's ID, role, status and token version, so most
+requests can be authorized from the token alone. When a user's status or role
+changes their token version is bumped and a row is written to the small
+`token_revocations` collection. Every worker keeps the whole table in memory,
+refreshing it every few seconds (and immediately for changes it made itself),
+and rejects tokens whose version is older than the recorded one.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Overlap between incremental refreshes, to tolerate clock skew between workers
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+class TokenRevocations:
+    """In-memory copy of token_revocations: user ID -> (minimum token version, status)"""
+
+    def __init__(self, db, refresh_interval: float = 15.0):
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.loaded = False
+        self._entries: Dict[str, dict] = {}
+        self._last_seen: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _apply(self, entry: dict):
+        self._entries[entry["user_id"]] = {"token_version": entry["token_version"], "status": entry["status"]}
+        if self._last_seen is None or entry["updated_at"] > self._last_seen:
+            self._last_seen = entry["updated_at"]
+
+    async def refresh(self):
+        """Load rows changed since the last refresh (all rows on the first call)"""
+        query = {}
+        if self._last_seen is not None:
+            query["updated_at"] = {"$gte": self._last_seen - REFRESH_OVERLAP}
+        async for entry in self.db.token_revocations.find(query, {"_id": 0}):
+            self._apply(entry)
+        self.loaded = True
+
+    def check(self, user_id: str, token_version: int) -> Optional[str]:
+        """None if a token is still valid, otherwise "revoked" or "suspended" """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if token_version < entry["token_version"]:
+            return "revoked"
+        if entry["status"] == "suspended":
+            return "suspended"
+        return None
+
+    async def revoke(self, user_id: str, status: str) -> int:
+        """Invalidate all of a user's current tokens; returns the new token version"""
+        user = await self.db.users.find_one_and_update(
+            {"id": user_id},
+            {"$inc": {"token_version": 1}},
+            projection={"_id": 0, "token_version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        token_version = user["token_version"] if user else 0
+        entry = {"user_id": user_id, "token_version": token_version, "status": status, "updated_at": datetime.utcnow()}
+        await self.db.token_revocations.update_one({"user_id": user_id}, {"$set": entry}, upsert=True)
+        self._apply(entry)
+        return token_version
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Token revocation refresh failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
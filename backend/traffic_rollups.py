@@ -0,0 +1,271 @@
+"""
+Pre-aggregated traffic rollups.
+
+Raw pageviews are folded into `pageview_rollups`: one document per
+(granularity, bucket, page_path) with the view count and a HyperLogLog sketch
+of the session IDs seen. Rows with page_path None hold the site-wide totals.
+A background job rolls up everything older than `lag` seconds since the last
+watermark, one hour at a time, so the analytics endpoints only read rollups.
+Hourly rows carry an `expires_at` for the TTL index and answer the sub-day
+queries (the last N hours); daily rows are kept.
+
+Applying a window is idempotent. Its end is saved as `pending_end` before any
+row is touched, and each row records the end of the last window added to it
+(`window_end`). A window interrupted by a crash or a lost lease is replayed
+with the same bounds, and rows that already carry it are skipped.
+
+Pageviews are rolled up by their timestamp. One inserted after the watermark
+has passed it (later than `lag`, e.g. a batch the pageview queue retried
+through a long Mongo outage) stays in the raw collection, but the rollups
+never count it. Raise `lag` (ROLLUP_LAG) above the longest expected insert
+delay if that matters.
+"""
+
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bson import Binary
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from hyperloglog import DEFAULT_PRECISION, HyperLogLog, hash_value
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_STATE_ID = "pageviews"
+SITE_PATH = None  # page_path of the site-wide rows
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+class _Row:
+    __slots__ = ("views", "visitors")
+
+    def __init__(self):
+        self.views = 0
+        self.visitors = HyperLogLog(DEFAULT_PRECISION)
+
+
+class TrafficRollups:
+    """Maintains hourly and daily pageview rollups and answers traffic queries from them"""
+
+    def __init__(self, db, interval: float = 60.0, lag: float = 120.0, lease: float = 300.0,
+                 hourly_retention_days: int = 30):
+        self.db = db
+        self.rollups = db.pageview_rollups
+        self.state = db.rollup_state
+        self.interval = interval
+        self.lag = timedelta(seconds=lag)
+        self.lease = timedelta(seconds=lease)
+        self.hourly_retention = timedelta(days=hourly_retention_days)
+        self.owner = str(uuid.uuid4())
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _acquire_lease(self) -> bool:
+        """Only one process rolls up at a time; the lease expires if its holder dies"""
+        now = datetime.utcnow()
+        try:
+            await self.state.update_one(
+                {"id": ROLLUP_STATE_ID, "$or": [
+                    {"lease_owner": self.owner},
+                    {"lease_until": {"$lt": now}},
+                    {"lease_until": {"$exists": False}},
+                ]},
+                {"$set": {"lease_owner": self.owner, "lease_until": now + self.lease}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def _progress(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """(watermark, end of a window an interrupted run was applying)"""
+        state = await self.state.find_one({"id": ROLLUP_STATE_ID})
+        if state and state.get("watermark"):
+            return state["watermark"], state.get("pending_end")
+        # First run: start from the oldest pageview
+        oldest = await self.db.pageviews.find({}, {"timestamp": 1}).sort("timestamp", 1).limit(1).to_list(1)
+        return (bucket_start(oldest[0]["timestamp"], "hour") if oldest else None), None
+
+    async def _save_progress(self, fields: dict) -> bool:
+        """Update the rollup state while still holding the lease; False once it is lost"""
+        result = await self.state.update_one(
+            {"id": ROLLUP_STATE_ID, "lease_owner": self.owner},
+            {"$set": {**fields, "lease_until": datetime.utcnow() + self.lease}}
+        )
+        return result.matched_count > 0
+
+    async def watermark(self) -> Optional[datetime]:
+        """Pageviews before this time are included in the rollups"""
+        state = await self.state.find_one({"id": ROLLUP_STATE_ID}, {"_id": 0, "watermark": 1})
+        return state.get("watermark") if state else None
+
+    async def run_once(self) -> int:
+        """Roll up all pageviews that are old enough; returns how many were processed"""
+        async with self._lock:
+            return await self._run_once()
+
+    async def _run_once(self) -> int:
+        if not await self._acquire_lease():
+            return 0
+        watermark, pending_end = await self._progress()
+        if watermark is None:
+            return 0
+
+        processed = 0
+        cutoff = datetime.utcnow() - self.lag
+        while watermark < cutoff:
+            end = pending_end or min(bucket_start(watermark, "hour") + timedelta(hours=1), cutoff)
+            pending_end = None
+            if not await self._save_progress({"pending_end": end}):
+                break
+            processed += await self._roll_window(watermark, end)
+            if not await self._save_progress({"watermark": end, "pending_end": None}):
+                break
+            watermark = end
+        return processed
+
+    async def _roll_window(self, start: datetime, end: datetime) -> int:
+        """Fold pageviews in [start, end) - all inside one hour - into the rollups"""
+        rows: Dict[Optional[str], _Row] = defaultdict(_Row)
+        cursor = self.db.pageviews.find(
+            {"timestamp": {"$gte": start, "$lt": end}},
+            {"_id": 0, "page_path": 1, "session_id": 1}
+        ).batch_size(5000)
+        count = 0
+        async for pageview in cursor:
+            hashed = hash_value(str(pageview.get("session_id")))
+            for path in (pageview.get("page_path"), SITE_PATH):
+                row = rows[path]
+                row.views += 1
+                row.visitors.add_hash(hashed)
+            count += 1
+
+        if rows:
+            for granularity in ("hour", "day"):
+                await self._merge_rows(granularity, bucket_start(start, granularity), end, rows)
+        return count
+
+    async def _merge_rows(self, granularity: str, bucket: datetime, window_end: datetime,
+                          rows: Dict[Optional[str], _Row]):
+        existing = {}
+        async for doc in self.rollups.find(
+            {"granularity": granularity, "bucket": bucket, "page_path": {"$in": list(rows)}},
+            {"_id": 0, "page_path": 1, "visitors": 1}
+        ):
+            existing[doc.get("page_path")] = doc["visitors"]
+
+        now = datetime.utcnow()
+        fields = {"updated_at": now}
+        if granularity == "hour":
+            fields["expires_at"] = bucket + self.hourly_retention
+        operations = []
+        for path, row in rows.items():
+            visitors = row.visitors
+            if path in existing:
+                visitors = HyperLogLog.from_bytes(existing[path])
+                visitors.merge(row.visitors)
+            # Rows that already include this window don't match; their upsert then hits the unique key
+            operations.append(UpdateOne(
+                {"granularity": granularity, "bucket": bucket, "page_path": path,
+                 "window_end": {"$not": {"$gte": window_end}}},
+                {"$inc": {"views": row.views},
+                 "$set": {"visitors": Binary(visitors.to_bytes()), "window_end": window_end, **fields}},
+                upsert=True
+            ))
+        try:
+            await self.rollups.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+                if processed:
+                    logger.info(f"Rolled up {processed} pageviews")
+            except Exception:
+                logger.exception("Traffic rollup failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Queries
+
+    async def site_series(self, start: datetime, key: Callable[[datetime], str],
+                          granularity: str = "day") -> List[dict]:
+        """Site-wide rows of `granularity` since `start`, grouped by key(bucket), oldest first"""
+        groups: Dict[str, Tuple[int, HyperLogLog]] = {}
+        async for doc in self.rollups.find(
+            {"granularity": granularity, "page_path": SITE_PATH, "bucket": {"$gte": bucket_start(start, granularity)}},
+            {"_id": 0, "bucket": 1, "views": 1, "visitors": 1}
+        ).sort("bucket", 1):
+            group_key = key(doc["bucket"])
+            views, visitors = groups.get(group_key, (0, HyperLogLog(DEFAULT_PRECISION)))
+            visitors.merge(HyperLogLog.from_bytes(doc["visitors"]))
+            groups[group_key] = (views + doc["views"], visitors)
+        return [
+            {"_id": group_key, "views": views, "unique_visitors": visitors.count()}
+            for group_key, (views, visitors) in groups.items()
+        ]
+
+    async def popular_pages(self, start: datetime, limit: int, granularity: str = "day") -> List[dict]:
+        """Pages with the most views since `start`, with their unique visitors"""
+        match = {"granularity": granularity, "page_path": {"$ne": SITE_PATH},
+                 "bucket": {"$gte": bucket_start(start, granularity)}}
+        top = await self.rollups.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$page_path", "views": {"$sum": "$views"}}},
+            {"$sort": {"views": -1}},
+            {"$limit": limit}
+        ]).to_list(limit)
+
+        # Sketches are only fetched for the pages that made the cut
+        sketches = defaultdict(lambda: HyperLogLog(DEFAULT_PRECISION))
+        async for doc in self.rollups.find(
+            {**match, "page_path": {"$in": [page["_id"] for page in top]}},
+            {"_id": 0, "page_path": 1, "visitors": 1}
+        ):
+            sketches[doc["page_path"]].merge(HyperLogLog.from_bytes(doc["visitors"]))
+        for page in top:
+            page["unique_visitors_count"] = sketches[page["_id"]].count()
+        return top
+
+    async def total_views(self) -> int:
+        result = await self.rollups.aggregate([
+            {"$match": {"granularity": "day", "page_path": SITE_PATH}},
+            {"$group": {"_id": None, "views": {"$sum": "$views"}}}
+        ]).to_list(1)
+        return result[0]["views"] if result else 0
+
+    async def site_totals(self, start: datetime) -> dict:
+        """Views and unique visitors across the site since `start`"""
+        query = {"granularity": "day", "page_path": SITE_PATH, "bucket": {"$gte": bucket_start(start, "day")}}
+        views = 0
+        visitors = HyperLogLog(DEFAULT_PRECISION)
+        async for doc in self.rollups.find(query, {"_id": 0, "views": 1, "visitors": 1}):
+            views += doc["views"]
+            visitors.merge(HyperLogLog.from_bytes(doc["visitors"]))
+        return {"views": views, "unique_visitors": visitors.count()}
@@ -0,0 +1,173 @@
+"""
+Streaming multipart upload parsing.
+
+Starlette's form parser spools every file to a temp file before the handler
+runs, so size limits can only be checked afterwards. This parser feeds the raw
+request stream through python-multipart and writes each file part straight
+into a BlobWriter, enforcing the per-file and per-request caps while the bytes
+are still arriving. Finished parts stay staged in their temp files until the
+whole request has been read and every part validated; only then are they
+committed, so a rejected request leaves nothing behind in the store.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from starlette.requests import ClientDisconnect, Request
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from blob_store import IMAGE_CONTENT_TYPES, BlobStore, BlobWriter
+
+class UploadError(Exception):
+    """Upload rejected; carries the HTTP status code to respond with"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+@dataclass
+class UploadedBlob:
+    id: str
+    filename: Optional[str]
+    content_type: str
+    size: int
+
+@dataclass
+class UploadLimits:
+    max_file_size: int
+    max_request_size: int
+    max_files: int
+
+class _Part:
+    def __init__(self):
+        self.headers = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.name = None
+        self.filename = None
+        self.writer: Optional[BlobWriter] = None
+
+async def stream_upload(request: Request, store: BlobStore, limits: UploadLimits) -> List[UploadedBlob]:
+    """Parse a multipart/form-data request, storing each file part as an image blob"""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError(415, "Expected multipart/form-data")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limits.max_request_size:
+        raise UploadError(413, f"Request exceeds {limits.max_request_size} bytes")
+
+    # python-multipart callbacks are synchronous; queue events and apply them
+    # (including async blob writes) after each chunk is fed to the parser
+    events = []
+
+    def on_part_begin():
+        events.append(("part_begin", b""))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("part_data", data[start:end]))
+
+    def on_part_end():
+        events.append(("part_end", b""))
+
+    def on_header_field(data: bytes, start: int, end: int):
+        events.append(("header_field", data[start:end]))
+
+    def on_header_value(data: bytes, start: int, end: int):
+        events.append(("header_value", data[start:end]))
+
+    def on_header_end():
+        events.append(("header_end", b""))
+
+    def on_headers_finished():
+        events.append(("headers_finished", b""))
+
+    def on_end():
+        events.append(("end", b""))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_end": on_end,
+    })
+
+    staged: List[Tuple[Optional[str], BlobWriter]] = []
+    part: Optional[_Part] = None
+    received = 0
+    complete = False
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > limits.max_request_size:
+                raise UploadError(413, f"Request exceeds {limits.max_request_size} bytes")
+            parser.write(chunk)
+
+            for event, data in events:
+                if event == "part_begin":
+                    part = _Part()
+                elif event == "header_field":
+                    part.header_field += data
+                elif event == "header_value":
+                    part.header_value += data
+                elif event == "header_end":
+                    part.headers[part.header_field.lower()] = part.header_value
+                    part.header_field = b""
+                    part.header_value = b""
+                elif event == "headers_finished":
+                    _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+                    part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+                    if b"filename" in disposition:
+                        if len(staged) >= limits.max_files:
+                            raise UploadError(413, f"At most {limits.max_files} files per request")
+                        part.filename = disposition[b"filename"].decode("utf-8", "replace")
+                        part.writer = store.writer()
+                elif event == "part_data":
+                    if part.writer is None:
+                        continue  # plain form fields are ignored
+                    if part.writer.size + len(data) > limits.max_file_size:
+                        raise UploadError(413, f"File {part.filename!r} exceeds {limits.max_file_size} bytes")
+                    await part.writer.write(data)
+                elif event == "part_end":
+                    if part.writer is not None:
+                        writer, part.writer = part.writer, None
+                        if writer.content_type not in IMAGE_CONTENT_TYPES:
+                            writer.abort()
+                            raise UploadError(415, f"File {part.filename!r} is not a supported image")
+                        staged.append((part.filename, writer))
+                elif event == "end":
+                    complete = True
+            events.clear()
+        parser.finalize()
+        if not complete:
+            raise UploadError(400, "Truncated multipart body")
+
+        if not staged:
+            raise UploadError(400, "No files in upload")
+        uploaded: List[UploadedBlob] = []
+        for filename, writer in staged:
+            blob_id = await writer.commit()
+            uploaded.append(UploadedBlob(blob_id, filename, writer.content_type, writer.size))
+        return uploaded
+    except MultipartParseError:
+        raise UploadError(400, "Malformed multipart body")
+    except ClientDisconnect:
+        raise UploadError(400, "Client disconnected during upload")
+    finally:
+        if part is not None and part.writer is not None:
+            part.writer.abort()
+        # Discards the temp files of parts not committed (a no-op for committed ones)
+        for _, writer in staged:
+            writer.abort()
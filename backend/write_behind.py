@@ -0,0 +1,202 @@
+"""
+Write-behind buffers for high-volume, loss-tolerant writes.
+
+Detail-page view counts and analytics pageviews used to cost one write per
+request; these buffers collect writes in process and flush them to Mongo in
+bulk, on a timer or when they fill up, and once more on shutdown.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounterBuffer:
+    """Aggregates `views` increments per (collection, id) and flushes them with bulk_write"""
+
+    def __init__(self, db, flush_interval: float = 5.0, max_pending: int = 1000):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._flush_requested = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+
+    def increment(self, collection: str, document_id: str) -> int:
+        """Record one view; returns the views buffered for this document so far"""
+        key = (collection, document_id)
+        self._counts[key] += 1
+        if len(self._counts) >= self.max_pending:
+            self._flush_requested.set()
+        return self._counts[key]
+
+    def pending(self, collection: str, document_id: str) -> int:
+        return self._counts.get((collection, document_id), 0)
+
+    async def flush(self):
+        """Write all buffered increments, one bulk_write per collection"""
+        if not self._counts:
+            return
+        counts, self._counts = self._counts, defaultdict(int)
+
+        by_collection = defaultdict(list)
+        for (collection, document_id), count in counts.items():
+            by_collection[collection].append((document_id, count))
+
+        for collection, increments in by_collection.items():
+            operations = [UpdateOne({"id": document_id}, {"$inc": {"views": count}}) for document_id, count in increments]
+            try:
+                await self.db[collection].bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every operation but the reported ones was applied, so only those are retried
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                logger.error(f"{len(failed)} of {len(operations)} view counter updates failed for {collection}")
+                for index in failed:
+                    document_id, count = increments[index]
+                    self._counts[(collection, document_id)] += count
+            except Exception:
+                # Nothing is known to be applied; put the increments back so the next flush retries them
+                logger.exception(f"View counter flush failed for {collection}")
+                for document_id, count in increments:
+                    self._counts[(collection, document_id)] += count
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            # Shielded so that stopping the loop never drops increments taken out for a flush
+            self._flushing = asyncio.ensure_future(self.flush())
+            await asyncio.shield(self._flushing)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is not None:
+            await self._flushing
+        await self.flush()
+
+
+class InsertQueue:
+    """Bounded queue of documents written with insert_many(ordered=False) in batches.
+
+    Batches are flushed when `batch_size` documents are waiting or `flush_interval`
+    seconds after the first one arrived. When the queue is full, new documents are
+    dropped (overflow="drop") or refused so the caller can push back (overflow="reject").
+    """
+
+    def __init__(self, db, collection: str, max_size: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 2.0, overflow: str = "drop"):
+        if overflow not in ("drop", "reject"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.db = db
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: list = []
+        self._writing: Optional[asyncio.Future] = None
+        self.stats = {"accepted": 0, "written": 0, "dropped": 0, "rejected": 0, "failed": 0, "batches": 0}
+
+    def offer(self, document: dict) -> bool:
+        """Enqueue a document without waiting; False if it was dropped or rejected"""
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            self.stats["dropped" if self.overflow == "drop" else "rejected"] += 1
+            return False
+        self.stats["accepted"] += 1
+        return True
+
+    def has_room(self, count: int = 1) -> bool:
+        return self._queue.maxsize - self._queue.qsize() >= count
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _fill_batch(self):
+        """Collect into self._batch until it is full or flush_interval has passed"""
+        loop = asyncio.get_running_loop()
+        self._batch.append(await self._queue.get())
+        deadline = loop.time() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            try:
+                self._batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: list):
+        try:
+            await self.db[self.collection].insert_many(batch, ordered=False)
+            self.stats["written"] += len(batch)
+        except BulkWriteError as e:
+            failed = len(e.details.get("writeErrors", []))
+            self.stats["written"] += len(batch) - failed
+            self.stats["failed"] += failed
+            logger.error(f"{failed} of {len(batch)} {self.collection} inserts failed")
+        except Exception:
+            # Any error, e.g. an unencodable document, drops this batch but never the insert loop
+            self.stats["failed"] += len(batch)
+            logger.exception(f"Batch insert into {self.collection} failed")
+        self.stats["batches"] += 1
+
+    async def _run(self):
+        while True:
+            await self._fill_batch()
+            batch, self._batch = self._batch, []
+            # Shielded so that stopping the loop never abandons a batch mid-insert
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and flush everything still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._writing is not None:
+            await self._writing
+        if self._batch:
+            batch, self._batch = self._batch, []
+            await self._write(batch)
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._write(batch)
@@ -166,10 +166,10 @@ const AdminDashboard = () => {
       
       // Make API calls with detailed error logging
       const apiCalls = [
-        { name: 'properties', url: `${API}/properties?limit=50` },
+        { name: 'properties', url: `${API}/properties?limit=50&view=full` },
         { name: 'news', url: `${API}/news?limit=50` },
         { name: 'sims', url: `${API}/sims?limit=50` },
-        { name: 'lands', url: `${API}/lands?limit=50` },
+        { name: 'lands', url: `${API}/lands?limit=50&view=full` },
         { name: 'tickets', url: `${API}/tickets?limit=50` },
         { name: 'members', url: `${API}/admin/users` },
         { name: 'deposits', url: `${API}/admin/transactions` },
@@ -1517,22 +1517,32 @@ const AdminDashboard = () => {
                   {memberPosts.length > 0 ? memberPosts.map((post) => (
                     <div key={post.id} className="border border-gray-200 rounded-lg p-4 hover:bg-gray-50">
                       <div className="flex justify-between items-start">
-                        <div>
-                          <div className="flex items-center space-x-2 mb-2">
-                            <h3 className="font-semibold text-lg">{post.title}</h3>
-                            <span className={`px-2 py-1 rounded text-sm font-medium ${
-                              post.status === 'pending' ? 'bg-yellow-100 text-yellow-800' :
-                              post.status === 'approved' ? 'bg-green-100 text-green-800' :
-                              'bg-red-100 text-red-800'
-                            }`}>
-                              {post.status === 'pending' ? 'Chờ duyệt' : 
-                               post.status === 'approved' ? 'Đã duyệt' : 'Từ chối'}
-                            </span>
-                          </div>
-                          <p className="text-gray-600 mb-2">{post.description}</p>
-                          <div className="flex items-center space-x-4 text-sm text-gray-600">
-                            <span><i className="fas fa-user text-emerald-600 mr-1"></i>{post.author_name}</span>
-                            <span><i className="fas fa-calendar text-emerald-600 mr-1"></i>{new Date(post.created_at).toLocaleDateString('vi-VN')}</span>
+                        <div className="flex items-start space-x-4">
+                          {post.images?.length > 0 && (
+                            <img
+                              src={post.image_variants?.find((variants) => variants.original === post.images[0])?.thumb || post.images[0]}
+                              alt={post.title}
+                              loading="lazy"
+                              className="w-24 h-24 object-cover rounded-lg border border-gray-200 flex-shrink-0"
+                            />
+                          )}
+                          <div>
+                            <div className="flex items-center space-x-2 mb-2">
+                              <h3 className="font-semibold text-lg">{post.title}</h3>
+                              <span className={`px-2 py-1 rounded text-sm font-medium ${
+                                post.status === 'pending' ? 'bg-yellow-100 text-yellow-800' :
+                                post.status === 'approved' ? 'bg-green-100 text-green-800' :
+                                'bg-red-100 text-red-800'
+                              }`}>
+                                {post.status === 'pending' ? 'Chờ duyệt' : 
+                                 post.status === 'approved' ? 'Đã duyệt' : 'Từ chối'}
+                              </span>
+                            </div>
+                            <p className="text-gray-600 mb-2">{post.description}</p>
+                            <div className="flex items-center space-x-4 text-sm text-gray-600">
+                              <span><i className="fas fa-user text-emerald-600 mr-1"></i>{post.author_name}</span>
+                              <span><i className="fas fa-calendar text-emerald-600 mr-1"></i>{new Date(post.created_at).toLocaleDateString('vi-VN')}</span>
+                            </div>
                           </div>
                         </div>
                         <div className="flex space-x-2">
@@ -2549,6 +2559,20 @@ const AdminDashboard = () => {
                           <p><strong>Loại:</strong> {editingItem?.post_type}</p>
                           <p><strong>Giá:</strong> {editingItem?.price?.toLocaleString()} VNĐ</p>
                           <p><strong>Người đăng:</strong> {editingItem?.author_name}</p>
+                          {editingItem?.images?.length > 0 && (
+                            <div className="flex flex-wrap gap-2 my-2">
+                              {editingItem.images.map((image, index) => (
+                                <a key={index} href={image} target="_blank" rel="noopener noreferrer">
+                                  <img
+                                    src={editingItem.image_variants?.find((variants) => variants.original === image)?.thumb || image}
+                                    alt={`${editingItem.title} ${index + 1}`}
+                                    loading="lazy"
+                                    className="w-20 h-20 object-cover rounded border border-gray-200"
+                                  />
+                                </a>
+                              ))}
+                            </div>
+                          )}
                           <p><strong>Trạng thái hiện tại:</strong> 
                             <span className={`ml-2 px-2 py-1 rounded text-xs ${
                               editingItem?.status === 'approved' ? 'bg-green-100 text-green-800' :
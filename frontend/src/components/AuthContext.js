@@ -7,6 +7,68 @@ const API = `${BACKEND_URL}/api`;
 
 const AuthContext = createContext();
 
+// The refresh token lives in localStorage, so script running on the page (XSS)
+// can read it. An HttpOnly cookie would hide it, but the API is called
+// cross-origin with CORS allowing any origin, and credentialed requests need
+// an explicit origin list; until that is configured, reuse detection on the
+// server (a replayed old token ends the session) limits what a stolen token buys.
+const saveTokens = (accessToken, refreshToken) => {
+  localStorage.setItem('token', accessToken);
+  Cookies.set('token', accessToken, { expires: 7 });
+  if (refreshToken) {
+    localStorage.setItem('refresh_token', refreshToken);
+  }
+};
+
+const clearTokens = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+  Cookies.remove('token');
+};
+
+// One refresh at a time; concurrent 401s wait for the same request
+let refreshPromise = null;
+
+const refreshAccessToken = () => {
+  if (!refreshPromise) {
+    const refreshToken = localStorage.getItem('refresh_token');
+    refreshPromise = axios.post(`${API}/auth/refresh`, { refresh_token: refreshToken })
+      .then((response) => {
+        saveTokens(response.data.access_token, response.data.refresh_token);
+        return response.data.access_token;
+      })
+      .catch((error) => {
+        // Another tab may have rotated the token already
+        if (localStorage.getItem('refresh_token') === refreshToken) {
+          clearTokens();
+          throw error;
+        }
+        return localStorage.getItem('token');
+      })
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
+// Renew expired access tokens with the refresh token and retry the request once
+axios.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    const isAuthCall = config?.url?.includes('/auth/login') || config?.url?.includes('/auth/refresh');
+    if (error.response?.status !== 401 || !config || config._retried || isAuthCall
+        || !localStorage.getItem('refresh_token')) {
+      return Promise.reject(error);
+    }
+    config._retried = true;
+    const accessToken = await refreshAccessToken();
+    config.headers = { ...config.headers, Authorization: `Bearer ${accessToken}` };
+    return axios(config);
+  }
+);
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -33,8 +95,7 @@ export const AuthProvider = ({ children }) => {
         setUser(response.data);
       } catch (error) {
         console.error('Token verification failed:', error);
-        localStorage.removeItem('token');
-        Cookies.remove('token');
+        clearTokens();
         setUser(null);
       }
     }
@@ -48,10 +109,9 @@ export const AuthProvider = ({ children }) => {
         password
       });
       
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       
-      localStorage.setItem('token', access_token);
-      Cookies.set('token', access_token, { expires: 7 });
+      saveTokens(access_token, refresh_token);
       setUser(userData);
       
       return { success: true, user: userData };
@@ -68,10 +128,9 @@ export const AuthProvider = ({ children }) => {
     try {
       const response = await axios.post(`${API}/auth/register`, userData);
       
-      const { access_token, user: newUser } = response.data;
+      const { access_token, refresh_token, user: newUser } = response.data;
       
-      localStorage.setItem('token', access_token);
-      Cookies.set('token', access_token, { expires: 7 });
+      saveTokens(access_token, refresh_token);
       setUser(newUser);
       
       return { success: true, user: newUser };
@@ -85,8 +144,11 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
-    Cookies.remove('token');
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (refreshToken) {
+      axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
+    clearTokens();
     setUser(null);
     window.location.href = '/';
   };
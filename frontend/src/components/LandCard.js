@@ -37,7 +37,7 @@ const LandCard = ({ land, onClick }) => {
     >
       <div className="relative">
         <img 
-          src={land.images?.[0] || 'https://images.unsplash.com/photo-1500382017468-9049fed747ef?crop=entropy&cs=srgb&fm=jpg&q=85'}
+          src={land.image_variants?.[0]?.card || land.images?.[0] || 'https://images.unsplash.com/photo-1500382017468-9049fed747ef?crop=entropy&cs=srgb&fm=jpg&q=85'}
           alt={land.title}
           className="w-full h-48 object-cover group-hover:scale-105 transition-transform duration-300"
         />
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Search Text Backfill
+Computes the diacritic-folded search_text field used by /properties/search
+and /lands/search for listings written before it existed (or by scripts that
+bypass the API). Safe to re-run: by default only documents without
+search_text are touched; --all recomputes every listing, e.g. after changing
+the folding rules.
+
+Usage: python scripts/backfill_search_text.py [--batch-size 500] [--all]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add backend directory to path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR / 'backend'))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+
+from search_text import backfill
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+SEARCHABLE_COLLECTIONS = ["properties", "lands"]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Populate search_text on existing listings")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--all", action="store_true", help="Recompute documents that already have search_text")
+    args = parser.parse_args()
+
+    print("🔎 Backfilling search_text...")
+    try:
+        for name in SEARCHABLE_COLLECTIONS:
+            updated = await backfill(
+                db[name], batch_size=args.batch_size, only_missing=not args.all,
+                on_batch=lambda count, name=name: print(f"  {name}: {count} updated")
+            )
+            print(f"✅ {name}: {updated} documents updated")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
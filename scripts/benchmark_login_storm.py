@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Login Storm Benchmark
+Measures login throughput and the latency of an unrelated endpoint while many
+clients log in at once. With bcrypt on the event loop the probe's p99 jumps to
+the length of the login queue; with the hashing pool it should stay close to
+its idle baseline.
+
+Run against a live backend with an existing account (start it with
+RATE_LIMIT_ENABLED=false, or the login limit throttles the storm):
+Usage: python scripts/benchmark_login_storm.py --username admin --password admin123
+           [--base-url http://localhost:8001] [--clients 32] [--seconds 20] [--probe /api/]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def probe(url: str, stop: threading.Event, interval: float = 0.02) -> list:
+    """Request a cheap endpoint on a fixed schedule and record latencies in ms"""
+    session = requests.Session()
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        session.get(url, timeout=30)
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(interval)
+    return latencies
+
+def login_loop(url: str, username: str, password: str, stop: threading.Event) -> dict:
+    session = requests.Session()
+    counts = {"ok": 0, "busy": 0, "throttled": 0, "failed": 0}
+    while not stop.is_set():
+        response = session.post(url, json={"username": username, "password": password}, timeout=60)
+        if response.status_code == 200:
+            counts["ok"] += 1
+        elif response.status_code == 503:
+            counts["busy"] += 1
+        elif response.status_code == 429:
+            counts["throttled"] += 1
+        else:
+            counts["failed"] += 1
+    return counts
+
+def report(label: str, latencies: list):
+    print(f"  {label}: {len(latencies)} probes, p50 {percentile(latencies, 50):.1f} ms, "
+          f"p99 {percentile(latencies, 99):.1f} ms, max {max(latencies, default=0):.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe API latency during a login storm")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent login loops")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--probe", default="/api/", help="Endpoint whose latency is tracked")
+    args = parser.parse_args()
+
+    probe_url = args.base_url.rstrip("/") + args.probe
+    login_url = args.base_url.rstrip("/") + "/api/auth/login"
+
+    print(f"🔐 Baseline ({args.seconds / 2:.0f}s, no logins)...")
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        baseline = pool.submit(probe, probe_url, stop)
+        time.sleep(args.seconds / 2)
+        stop.set()
+        baseline = baseline.result()
+
+    print(f"🔐 Login storm ({args.seconds:.0f}s, {args.clients} clients)...")
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=args.clients + 1) as pool:
+        storm_probe = pool.submit(probe, probe_url, stop)
+        logins = [pool.submit(login_loop, login_url, args.username, args.password, stop)
+                  for _ in range(args.clients)]
+        time.sleep(args.seconds)
+        stop.set()
+        storm = storm_probe.result()
+        counts = {"ok": 0, "busy": 0, "throttled": 0, "failed": 0}
+        for future in logins:
+            for key, value in future.result().items():
+                counts[key] += value
+
+    print(f"\nProbe latency for {args.probe}:")
+    report("baseline", baseline)
+    report("during storm", storm)
+    print(f"\nLogins: {counts['ok'] / args.seconds:.1f}/s succeeded, "
+          f"{counts['busy']} refused with 503, {counts['throttled']} throttled with 429, "
+          f"{counts['failed']} failed")
+    if baseline and storm:
+        print(f"p99 ratio storm/baseline: {percentile(storm, 99) / max(percentile(baseline, 99), 0.001):.1f}x "
+              f"(median {statistics.median(storm):.1f} ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Unique Visitor Benchmark
+Compares exact unique-visitor counts (the old $group / $addToSet pipelines over
+raw pageviews) with HyperLogLog estimates merged from the traffic rollups, on a
+synthetic dataset written to a separate benchmark database.
+
+Usage: python scripts/benchmark_unique_visitors.py [--pageviews 10000000] [--sessions 2000000]
+           [--pages 500] [--days 30] [--reuse] [--drop]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+
+# Add backend directory to path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR / 'backend'))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+
+from hyperloglog import standard_error
+from traffic_rollups import TrafficRollups
+
+# MongoDB connection; never touches the application database
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ.get('BENCH_DB_NAME', f"{os.environ['DB_NAME']}_bench")]
+
+INSERT_BATCH = 10000
+
+async def generate(pageviews: int, sessions: int, pages: int, days: int):
+    """Insert synthetic pageviews spread over the last `days` days"""
+    await db.pageviews.drop()
+    await db.pageview_rollups.drop()
+    await db.rollup_state.drop()
+    await db.pageviews.create_index("timestamp")
+
+    rng = random.Random(42)
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    span = days * 86400
+    paths = ["/"] + [f"/property/{i}" for i in range(pages - 1)]
+    started = time.perf_counter()
+    for offset in range(0, pageviews, INSERT_BATCH):
+        batch = [{
+            "id": str(offset + i),
+            "page_path": paths[min(int(rng.paretovariate(1.2)) - 1, pages - 1)],
+            "session_id": f"session-{rng.randrange(sessions)}",
+            "user_agent": "benchmark",
+            "ip_address": "127.0.0.1",
+            "timestamp": end - timedelta(seconds=rng.randrange(span)),
+        } for i in range(min(INSERT_BATCH, pageviews - offset))]
+        await db.pageviews.insert_many(batch, ordered=False)
+        if (offset // INSERT_BATCH) % 100 == 0:
+            print(f"  inserted {offset + len(batch):,}/{pageviews:,}")
+    print(f"Generated {pageviews:,} pageviews in {time.perf_counter() - started:.1f}s")
+
+async def timed(label: str, coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    print(f"  {label}: {time.perf_counter() - started:.2f}s")
+    return result
+
+async def exact_unique(start: datetime) -> int:
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": start}}},
+        {"$group": {"_id": "$session_id"}},
+        {"$count": "unique_sessions"}
+    ]
+    result = await db.pageviews.aggregate(pipeline, allowDiskUse=True).to_list(1)
+    return result[0]["unique_sessions"] if result else 0
+
+async def exact_popular_pages(start: datetime, limit: int) -> list:
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": start}}},
+        {"$group": {"_id": "$page_path", "views": {"$sum": 1}, "unique_visitors": {"$addToSet": "$session_id"}}},
+        {"$addFields": {"unique_visitors_count": {"$size": "$unique_visitors"}}},
+        {"$project": {"unique_visitors": 0}},
+        {"$sort": {"views": -1}},
+        {"$limit": limit}
+    ]
+    return await db.pageviews.aggregate(pipeline, allowDiskUse=True).to_list(limit)
+
+def relative_error(estimate: int, exact: int) -> str:
+    return f"{(estimate - exact) / exact * 100:+.2f}%" if exact else "n/a"
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark HyperLogLog unique visitors against exact counts")
+    parser.add_argument("--pageviews", type=int, default=10_000_000)
+    parser.add_argument("--sessions", type=int, default=2_000_000)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--reuse", action="store_true", help="Keep an existing synthetic dataset")
+    parser.add_argument("--drop", action="store_true", help="Drop the benchmark database afterwards")
+    args = parser.parse_args()
+
+    try:
+        if not args.reuse:
+            print(f"📊 Generating {args.pageviews:,} pageviews in {db.name}...")
+            await generate(args.pageviews, args.sessions, args.pages, args.days)
+
+        rollups = TrafficRollups(db, lag=0)
+        if args.reuse:
+            await db.pageview_rollups.drop()
+            await db.rollup_state.drop()
+        await db.pageview_rollups.create_index([("granularity", 1), ("bucket", 1), ("page_path", 1)], unique=True)
+        await db.rollup_state.create_index("id", unique=True)
+        print("Building rollups (one-off; the server does this incrementally):")
+        await timed("rollup build", rollups.run_once())
+        stats = await db.command("collStats", "pageview_rollups")
+        print(f"  rollup storage: {stats['count']:,} documents, {stats['size'] / 1024 / 1024:.1f} MiB")
+
+        now = datetime.utcnow()
+        for days in (1, 7, args.days):
+            start = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+            print(f"\nUnique visitors, last {days} day(s):")
+            exact = await timed("exact $group", exact_unique(start))
+            estimate = (await timed("rollup sketches", rollups.site_totals(start)))["unique_visitors"]
+            print(f"  exact {exact:,}, estimate {estimate:,} ({relative_error(estimate, exact)})")
+
+        start = (now - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+        print("\nPopular pages, last 7 days:")
+        exact_pages = await timed("exact $addToSet", exact_popular_pages(start, 10))
+        estimated_pages = await timed("rollup sketches", rollups.popular_pages(start, 10))
+        estimated = {page["_id"]: page for page in estimated_pages}
+        for page in exact_pages:
+            estimate = estimated.get(page["_id"], {}).get("unique_visitors_count", 0)
+            print(f"  {page['_id']}: exact {page['unique_visitors_count']:,}, "
+                  f"estimate {estimate:,} ({relative_error(estimate, page['unique_visitors_count'])})")
+
+        print(f"\nExpected relative standard error: {standard_error() * 100:.2f}%")
+        if args.drop:
+            await client.drop_database(db.name)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Image Migration to the Blob Store
+Rewrites base64 images embedded in documents into /api/media/<sha256> URLs,
+storing each image once in the blob store. Safe to re-run: values that are
+already URLs are left untouched.
+
+Usage: python scripts/migrate_images_to_blobs.py [--batch-size 200] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Add backend directory to path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR / 'backend'))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+
+from blob_store import InvalidBlobData, create_blob_store, is_inline_image
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+blob_store = create_blob_store(
+    db,
+    os.environ.get('BLOB_BACKEND', 'local'),
+    Path(os.environ.get('MEDIA_ROOT', ROOT_DIR / 'backend' / 'media'))
+)
+
+# collection -> (list fields, single-value fields); dotted paths are nested
+IMAGE_FIELDS = {
+    "properties": (["images"], []),
+    "lands": (["images"], []),
+    "member_posts": (["images", "data.images"], []),
+    "news_articles": ([], ["featured_image"]),
+    "users": ([], ["avatar"]),
+}
+
+def get_path(document: dict, path: str):
+    value = document
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+async def migrate_document(document: dict, list_fields, value_fields) -> dict:
+    """Return the $set needed to replace inline images in one document"""
+    updates = {}
+    for field in list_fields:
+        images = get_path(document, field)
+        if isinstance(images, list) and any(isinstance(i, str) and is_inline_image(i) for i in images):
+            updates[field] = [await blob_store.store_image(i) if isinstance(i, str) else i for i in images]
+    for field in value_fields:
+        image = get_path(document, field)
+        if isinstance(image, str) and is_inline_image(image):
+            updates[field] = await blob_store.store_image(image)
+    return updates
+
+async def migrate_collection(name: str, batch_size: int, dry_run: bool):
+    list_fields, value_fields = IMAGE_FIELDS[name]
+    projection = {field: 1 for field in list_fields + value_fields}
+    collection = db[name]
+    last_id = None
+    scanned = rewritten = failed = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        scanned += len(batch)
+
+        operations = []
+        for document in batch:
+            try:
+                updates = await migrate_document(document, list_fields, value_fields)
+            except InvalidBlobData as e:
+                failed += 1
+                print(f"  ⚠️  {name} {document['_id']}: {e}")
+                continue
+            if updates:
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": updates}))
+
+        if operations and not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        rewritten += len(operations)
+        print(f"  {name}: scanned {scanned}, rewritten {rewritten}")
+
+    print(f"✅ {name}: {rewritten}/{scanned} documents rewritten, {failed} failed")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Move base64 images into the blob store")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Store blobs but do not rewrite documents")
+    args = parser.parse_args()
+
+    print("🖼️  Migrating inline images to the blob store...")
+    try:
+        for name in IMAGE_FIELDS:
+            await migrate_collection(name, args.batch_size, args.dry_run)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Location Code Migration
+Resolves city_code/district_code (see backend/admin_units.py) for listings
+written before those fields existed, so the city/district filters of
+/properties and /lands find them. Safe to re-run: only documents whose codes
+differ from the current resolution are rewritten, so it also applies new
+aliases added to the table. City and district values the table does not know
+are listed at the end, to help extend it.
+
+Usage: python scripts/migrate_location_codes.py [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from pathlib import Path
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+# Add backend directory to path
+ROOT_DIR = Path(__file__).parent.parent
+sys.path.append(str(ROOT_DIR / 'backend'))
+
+from dotenv import load_dotenv
+load_dotenv(ROOT_DIR / 'backend' / '.env')
+
+from admin_units import is_known, location_codes
+
+# MongoDB connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+LISTING_COLLECTIONS = ["properties", "lands"]
+LOCATION_PROJECTION = {"city": 1, "district": 1, "city_code": 1, "district_code": 1}
+
+async def migrate_collection(name: str, batch_size: int, dry_run: bool, unknown: Counter):
+    collection = db[name]
+    last_id = None
+    scanned = rewritten = 0
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await collection.find(query, LOCATION_PROJECTION).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        scanned += len(batch)
+
+        operations = []
+        for document in batch:
+            codes = location_codes({"city": document.get("city"), "district": document.get("district")})
+            if any(document.get(field) != code for field, code in codes.items()):
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": codes}))
+            if not is_known(document.get("city"), document.get("district")):
+                unknown[(document.get("city"), document.get("district"))] += 1
+
+        if operations and not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        rewritten += len(operations)
+        print(f"  {name}: scanned {scanned}, rewritten {rewritten}")
+
+    print(f"✅ {name}: {rewritten}/{scanned} documents rewritten")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Populate city_code/district_code on existing listings")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    args = parser.parse_args()
+
+    print("📍 Resolving listing location codes...")
+    unknown = Counter()
+    try:
+        for name in LISTING_COLLECTIONS:
+            await migrate_collection(name, args.batch_size, args.dry_run, unknown)
+    finally:
+        client.close()
+
+    if unknown:
+        print("⚠️  Locations not in the administrative-unit table (city, district: listings):")
+        for (city, district), count in unknown.most_common(50):
+            print(f"  {city!r}, {district!r}: {count}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
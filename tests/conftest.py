@@ -0,0 +1,43 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import bcrypt
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+# Backend modules import each other as top-level modules (as uvicorn runs them from backend/)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+
+
+@pytest.fixture
+def auth_api(monkeypatch):
+    """The app on an empty mock database, with fresh auth state; returns (client, db)"""
+    import server
+    from principal_cache import PrincipalCache
+    from refresh_sessions import SessionStore
+    from token_revocations import TokenRevocations
+
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "principal_cache", PrincipalCache())
+    monkeypatch.setattr(server, "token_revocations", TokenRevocations(db))
+    monkeypatch.setattr(server, "session_store", SessionStore(db))
+    server.rate_limiter._buckets.clear()
+    return TestClient(server.app), db
+
+
+def make_user(username: str = "member1", password: str = "secret123", **fields) -> dict:
+    """A user document with a cheap bcrypt hash"""
+    return {
+        "id": f"id-{username}", "username": username, "email": f"{username}@example.com",
+        "hashed_password": bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=4)).decode(),
+        "role": "member", "status": "active", "wallet_balance": 0.0, "token_version": 0,
+        "created_at": datetime.utcnow(), "profile_completed": False, **fields,
+    }
@@ -0,0 +1,109 @@
+"""The admin queues load authors in one batched query, whatever the page size"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    server.app.dependency_overrides[server.get_current_admin] = lambda: server.Principal(
+        id="admin", username="admin", role="admin", status="active"
+    )
+    try:
+        yield TestClient(server.app), db
+    finally:
+        server.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def user_queries(monkeypatch, client):
+    """Count find/find_one calls on the users collection"""
+    _, db = client
+    collection_class = type(db.users)
+    calls = []
+    for method in ("find", "find_one"):
+        original = getattr(collection_class, method)
+
+        def counted(self, *args, _original=original, **kwargs):
+            if self.name == "users":
+                calls.append(args)
+            return _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(collection_class, method, counted)
+    return calls
+
+
+def seed(db, rows: int):
+    now = datetime.utcnow()
+    users = [
+        {"id": f"u{i}", "username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}"}
+        for i in range(rows)
+    ]
+    posts = [
+        {"id": f"p{i}", "title": "t", "description": "d", "post_type": list(server.PostType)[0].value,
+         "status": "pending", "author_id": f"u{i}", "price": 1.0, "contact_phone": "1",
+         "created_at": now - timedelta(seconds=i)}
+        for i in range(rows)
+    ]
+    deposits = [
+        {"id": f"t{i}", "user_id": f"u{i}", "transaction_type": "deposit", "status": "pending",
+         "amount": 1.0, "created_at": now - timedelta(seconds=i)}
+        for i in range(rows)
+    ]
+
+    async def insert():
+        await db.users.insert_many(users)
+        await db.member_posts.insert_many(posts)
+        await db.transactions.insert_many(deposits)
+
+    asyncio.run(insert())
+
+
+@pytest.mark.parametrize("path", ["/api/admin/posts/pending", "/api/admin/deposits"])
+def test_author_lookup_is_one_query_per_page(client, user_queries, path):
+    test_client, db = client
+    seed(db, 100)
+
+    for page_size in (1, 10, 50, 100):
+        user_queries.clear()
+        response = test_client.get(path, params={"limit": page_size})
+        assert response.status_code == 200
+        assert len(response.json()) == page_size
+        assert len(user_queries) == 1
+
+
+def test_deposits_are_enriched_from_the_batch(client):
+    test_client, db = client
+    seed(db, 5)
+
+    rows = test_client.get("/api/admin/deposits").json()
+    assert [row["user_name"] for row in rows] == [f"User {i}" for i in range(5)]
+    assert [row["user_email"] for row in rows] == [f"user{i}@example.com" for i in range(5)]
+
+
+def test_author_batch_fetches_only_the_summary_fields(client, user_queries):
+    test_client, db = client
+    seed(db, 3)
+
+    test_client.get("/api/admin/deposits")
+    (_, projection), = user_queries
+    assert projection == {"_id": 0, "id": 1, "username": 1, "full_name": 1, "email": 1}
+
+
+def test_approving_a_deposit_credits_the_wallet(client):
+    test_client, db = client
+    seed(db, 1)
+    asyncio.run(db.users.update_one({"id": "u0"}, {"$set": {"wallet_balance": 10.0}}))
+
+    response = test_client.put("/api/admin/deposits/t0/approve")
+    assert response.status_code == 200
+    user = asyncio.run(db.users.find_one({"id": "u0"}))
+    assert user["wallet_balance"] == 11.0
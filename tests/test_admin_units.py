@@ -0,0 +1,49 @@
+import pytest
+
+from admin_units import city_code, district_code, is_known, location_codes
+
+
+@pytest.mark.parametrize("value", ["Hồ Chí Minh", "TP.HCM", "TP. Hồ Chí Minh", "Sài Gòn", "hochiminh", "HCM"])
+def test_city_aliases_resolve_to_one_code(value):
+    assert city_code(value) == "ho-chi-minh"
+
+
+def test_unknown_city_keeps_a_slug():
+    assert city_code("Tỉnh Mới") == "moi"
+    assert city_code("") is None
+    assert city_code(None) is None
+
+
+@pytest.mark.parametrize("value, code", [
+    ("Quận 1", "quan-1"),
+    ("Q.1", "quan-1"),
+    ("Quận 01", "quan-1"),
+    ("District 1", "quan-1"),
+    ("Q1", "quan-1"),
+    ("Quận 10", "quan-10"),
+    ("Bình Thạnh", "binh-thanh"),
+    ("Quận Bình Thạnh", "binh-thanh"),
+    ("Binh Thanh District", "binh-thanh"),
+    ("Huyện Củ Chi", "cu-chi"),
+    ("TP Thủ Đức", "thu-duc"),
+])
+def test_district_code(value, code):
+    assert district_code(value) == code
+
+
+def test_district_without_tokens():
+    assert district_code("") is None
+    assert district_code(" - ") is None
+    assert district_code(None) is None
+
+
+def test_is_known():
+    assert is_known("TP.HCM", "Q.1")
+    assert not is_known("TP.HCM", "Ba Đình")
+    assert is_known("Khánh Hòa", "Cam Ranh")  # no district table for this province
+    assert not is_known("Atlantis")
+
+
+def test_location_codes_only_for_present_fields():
+    assert location_codes({"district": "Quận 3"}) == {"district_code": "quan-3"}
+    assert location_codes({"city": "Hà Nội", "district": None}) == {"city_code": "ha-noi", "district_code": None}
@@ -0,0 +1,89 @@
+import asyncio
+import base64
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from blob_store import (
+    BlobStore,
+    InvalidBlobData,
+    STREAM_CHUNK_SIZE,
+    LocalBlobStore,
+    decode_inline_image,
+    is_inline_image,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+PNG_B64 = base64.b64encode(PNG).decode()
+
+
+def test_content_type_is_sniffed_not_declared():
+    data, content_type = decode_inline_image(f"data:text/html;base64,{PNG_B64}")
+    assert data == PNG
+    assert content_type == "image/png"
+
+
+def test_non_image_data_is_rejected():
+    html = base64.b64encode(b"<script>alert(1)</script>").decode()
+    with pytest.raises(InvalidBlobData):
+        decode_inline_image(f"data:image/png;base64,{html}")
+    with pytest.raises(InvalidBlobData):
+        decode_inline_image("data:text/html,<script>alert(1)</script>")
+
+
+def test_oversized_image_is_rejected():
+    with pytest.raises(InvalidBlobData):
+        decode_inline_image(PNG_B64, max_size=16)
+
+
+def test_invalid_base64_is_rejected():
+    with pytest.raises(InvalidBlobData):
+        decode_inline_image("data:image/png;base64,not*base64")
+
+
+@pytest.mark.parametrize("value, expected", [
+    (f"data:image/png;base64,{PNG_B64}", True),
+    (PNG_B64, True),
+    ("images/house.jpg", False),
+    ("house.jpg", False),
+    ("https://example.com/a.png", False),
+    ("/api/media/" + "a" * 64, False),
+    ("", False),
+])
+def test_is_inline_image(value, expected):
+    assert is_inline_image(value) is expected
+
+
+def test_blob_store_is_abstract():
+    with pytest.raises(TypeError):
+        BlobStore(None)
+
+
+def test_store_image_keeps_relative_paths_and_dedupes(tmp_path):
+    store = LocalBlobStore(AsyncMongoMockClient()["test"], tmp_path)
+
+    async def run():
+        first = await store.store_image(PNG_B64)
+        second = await store.store_image(f"data:image/jpeg;base64,{PNG_B64}")
+        relative = await store.store_image("images/house.jpg")
+        metadata = await store.get_metadata(first.rsplit("/", 1)[1])
+        return first, second, relative, metadata
+
+    first, second, relative, metadata = asyncio.run(run())
+    assert first == second
+    assert relative == "images/house.jpg"
+    assert metadata["content_type"] == "image/png"
+
+
+def test_local_store_streams_in_chunks(tmp_path):
+    store = LocalBlobStore(AsyncMongoMockClient()["test"], tmp_path)
+    data = PNG + bytes(range(256)) * (STREAM_CHUNK_SIZE // 128)
+
+    async def run():
+        url = await store.store_image(base64.b64encode(data).decode())
+        return [chunk async for chunk in store.stream(url.rsplit("/", 1)[1])]
+
+    chunks = asyncio.run(run())
+    assert b"".join(chunks) == data
+    assert [len(chunk) for chunk in chunks[:-1]] == [STREAM_CHUNK_SIZE] * (len(chunks) - 1)
+    assert len(chunks) == 3
@@ -0,0 +1,86 @@
+import asyncio
+from enum import Enum
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from counters import NONE_KEY, Counters, counter_key, counter_value
+
+
+class Status(str, Enum):
+    for_sale = "for_sale"
+
+
+@pytest.mark.parametrize("value, key", [
+    (None, NONE_KEY),
+    ("", NONE_KEY),
+    (True, "true"),
+    (False, "false"),
+    (Status.for_sale, "for_sale"),
+    (3, "3"),
+    ("TP.HCM", "TP．HCM"),
+    ("$where", "＄where"),
+])
+def test_counter_key(value, key):
+    assert counter_key(value) == key
+
+
+@pytest.mark.parametrize("value", ["Hà Nội", "TP.HCM", "$x.y", None])
+def test_counter_value_inverts_counter_key(value):
+    assert counter_value(counter_key(value)) == value
+
+
+def test_empty_value_is_counted():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        counters = Counters(db, {"properties": ("city",)})
+        await counters.created("properties", {"city": ""})
+        await counters.created("properties", {"city": "Hà Nội"})
+        await counters.updated("properties", {"city": ""}, {"city": "Đà Nẵng"})
+        return (await counters.read())["properties"]
+
+    properties = asyncio.run(scenario())
+    assert properties["total"] == 2
+    assert properties["city"] == {NONE_KEY: 0, "Hà Nội": 1, "Đà Nẵng": 1}
+
+
+def test_reconcile_corrects_drift_by_the_difference():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        counters = Counters(db, {"properties": ("city",)})
+        await db.properties.insert_many([{"city": "Hà Nội"}, {"city": "Hà Nội"}, {"city": "Huế"}])
+        await counters.created("properties", {"city": "Hà Nội"})
+        await counters.created("properties", {"city": "Đà Lạt"})  # no longer in the collection
+        await counters.reconcile()
+        return (await counters.read())["properties"], counters.stats
+
+    properties, stats = asyncio.run(scenario())
+    assert properties["total"] == 3
+    assert properties["city"] == {"Hà Nội": 2, "Huế": 1, "Đà Lạt": 0}
+    assert stats["drift_corrected"] == 1
+
+
+def test_reconcile_does_not_lose_a_write_made_during_the_recount():
+    async def scenario():
+        db = AsyncMongoMockClient()["test"]
+        counters = Counters(db, {"properties": ("city",)})
+        await db.properties.insert_one({"city": "Hà Nội"})
+        await counters.created("properties", {"city": "Hà Nội"})
+        recount, raced = counters._recount, []
+
+        async def racing_recount(entity):
+            counts = await recount(entity)
+            if not raced:
+                # A handler inserts a property and bumps the counters after the recount read
+                raced.append(True)
+                await db.properties.insert_one({"city": "Huế"})
+                await counters.created("properties", {"city": "Huế"})
+            return counts
+
+        counters._recount = racing_recount
+        await counters.reconcile()
+        return (await counters.read())["properties"]
+
+    properties = asyncio.run(scenario())
+    assert properties["total"] == 2
+    assert properties["city"] == {"Hà Nội": 1, "Huế": 1}
@@ -0,0 +1,50 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from server import apply_cursor, decode_cursor, encode_cursor
+
+
+def raw_cursor(value, last_id="x") -> str:
+    raw = json.dumps([value, last_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("value", [
+    datetime(2024, 5, 1, 12, 30, 15, 123000),
+    "Căn hộ",
+    1500000000,
+    12.5,
+    None,
+])
+def test_round_trip(value):
+    cursor = encode_cursor({"id": "abc", "sort": value}, "sort")
+    assert decode_cursor(cursor) == (value, "abc")
+
+
+@pytest.mark.parametrize("cursor", [
+    raw_cursor({"$gt": ""}),
+    raw_cursor({"$date": "2024-01-01T00:00:00", "$ne": 1}),
+    raw_cursor(["a"]),
+    raw_cursor("a", last_id={"$ne": ""}),
+    raw_cursor({"$date": 5}),
+    "not base64!",
+    base64.urlsafe_b64encode(b"[1]").decode(),
+])
+def test_rejects_crafted_cursors(cursor):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(cursor)
+    assert raised.value.status_code == 400
+
+
+def test_apply_cursor_builds_the_keyset_predicate():
+    cursor = encode_cursor({"id": "abc", "price": 10}, "price")
+    query = apply_cursor({"status": "for_sale"}, cursor, "price", -1)
+    assert query == {"$and": [
+        {"status": "for_sale"},
+        {"$or": [{"price": {"$lt": 10}}, {"price": 10, "id": {"$lt": "abc"}}]},
+    ]}
+    assert apply_cursor({"status": "for_sale"}, None, "price", -1) == {"status": "for_sale"}
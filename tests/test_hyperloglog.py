@@ -0,0 +1,44 @@
+import pytest
+
+from hyperloglog import HyperLogLog, standard_error
+
+
+def sketch_of(values, precision=12) -> HyperLogLog:
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_small_counts_are_exact_enough():
+    sketch = sketch_of(f"visitor-{i}" for i in range(20))
+    sketch.add("visitor-0")  # duplicates do not count
+    assert sketch.count() == 20
+
+
+@pytest.mark.parametrize("n", [1000, 50000])
+def test_count_within_error_bound(n):
+    estimate = sketch_of(f"visitor-{i}" for i in range(n)).count()
+    # 4 standard errors: a failure here means a real regression, not bad luck
+    assert abs(estimate - n) / n < 4 * standard_error(12)
+
+
+def test_merge_is_the_sketch_of_the_union():
+    a = sketch_of(f"v{i}" for i in range(0, 3000))
+    b = sketch_of(f"v{i}" for i in range(2000, 6000))
+    merged = HyperLogLog.union([a, b])
+    assert merged.to_bytes() == sketch_of(f"v{i}" for i in range(6000)).to_bytes()
+
+
+def test_sparse_and_dense_round_trip():
+    for sketch in (sketch_of(["a", "b", "c"]), sketch_of(f"v{i}" for i in range(10000))):
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+        assert restored.count() == sketch.count()
+        assert restored.to_bytes() == sketch.to_bytes()
+
+
+def test_mismatched_precision_is_rejected():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
@@ -0,0 +1,73 @@
+import asyncio
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from blob_store import LocalBlobStore, blob_url
+from image_variants import VariantGenerator
+
+CORRUPT_PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    store = LocalBlobStore(AsyncMongoMockClient()["test"], tmp_path)
+    generator = VariantGenerator(store, tmp_path, max_workers=1)
+    monkeypatch.setattr(server, "blob_store", store)
+    monkeypatch.setattr(server, "image_variants", generator)
+    yield store
+    generator.shutdown()
+
+
+def test_variants_only_for_stored_blobs():
+    stored = blob_url("a" * 64)
+    document = server.add_image_variants({"images": [stored, "https://example.com/x.jpg", "data:image/png;base64,AAAA"]})
+    assert document["image_variants"] == [{
+        "original": stored,
+        "thumb": f"{stored}/thumb.webp",
+        "card": f"{stored}/card.webp",
+        "detail": f"{stored}/detail.webp",
+    }]
+
+
+def test_corrupt_image_variant_is_not_found(media):
+    blob_id = asyncio.run(media.put(CORRUPT_PNG, "image/png"))
+    response = TestClient(server.app).get(f"/api/media/{blob_id}/thumb.webp")
+    assert response.status_code == 404
+
+
+def test_variants_are_scheduled_for_listing_images_only(media, auth_api, monkeypatch):
+    from tests.conftest import make_user
+
+    client, db = auth_api
+    scheduled = []
+    monkeypatch.setattr(server.image_variants, "schedule", scheduled.append)
+    asyncio.run(db.users.insert_one(make_user(wallet_balance=100000.0)))
+    token = client.post("/api/auth/login", json={"username": "member1", "password": "secret123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    image = "data:image/png;base64," + base64.b64encode(CORRUPT_PNG).decode()
+
+    assert client.put("/api/auth/profile", json={"avatar": image}, headers=headers).status_code == 200
+    assert client.post("/api/wallet/deposit", json={"amount": 1000, "transfer_bill": image}, headers=headers).status_code == 200
+    assert scheduled == []
+
+    response = client.post("/api/member/posts", headers=headers, json={
+        "title": "Nhà phố", "description": "...", "post_type": "property", "price": 1e9,
+        "images": [image], "contact_phone": "0900000000",
+    })
+    assert response.status_code == 200, response.text
+    assert len(scheduled) == 1
+
+    # The moderation queue gets the thumbnail URLs
+    server.app.dependency_overrides[server.get_current_admin] = lambda: server.Principal(
+        id="admin", username="admin", role="admin", status="active"
+    )
+    try:
+        post, = client.get("/api/admin/posts").json()
+    finally:
+        server.app.dependency_overrides.clear()
+    assert post["image_variants"][0]["thumb"] == f"{post['images'][0]}/thumb.webp"
+    assert "image_variants" not in asyncio.run(db.member_posts.find_one({}))
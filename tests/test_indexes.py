@@ -0,0 +1,82 @@
+"""Index builds succeed or fail one index at a time, and say which documents conflict"""
+
+import asyncio
+import logging
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "index_build_status", {})
+    return db
+
+
+def email_index():
+    return next(model for model in server.INDEX_SPECS["users"] if model.document["name"] == "email_1")
+
+
+def test_email_index_ignores_users_without_email(db):
+    model = email_index()
+    assert model.document["unique"]
+    assert model.document["partialFilterExpression"] == {"email": {"$type": "string"}}
+
+    async def run():
+        await db.users.insert_many([
+            {"id": "u1", "username": "a"},
+            {"id": "u2", "username": "b", "email": None},
+            {"id": "u3", "username": "c"},
+            {"id": "u4", "username": "d", "email": "x@example.com"},
+            {"id": "u5", "username": "e", "email": "x@example.com"},
+        ])
+        return await server.find_duplicate_keys("users", model)
+
+    assert asyncio.run(run()) == [{"_id": {"email": "x@example.com"}, "ids": ["u4", "u5"], "count": 2}]
+
+
+def test_duplicate_email_fails_only_its_index_and_is_reported(db, caplog):
+    async def run():
+        await db.users.insert_many([
+            {"id": "u1", "username": "a", "email": "x@example.com"},
+            {"id": "u2", "username": "b", "email": "x@example.com"},
+        ])
+        await server.create_indexes("users", server.INDEX_SPECS["users"])
+
+    with caplog.at_level(logging.ERROR, logger=server.logger.name):
+        asyncio.run(run())
+    status = server.index_build_status
+    assert status["users.email_1"] == "failed"
+    assert status["users.id_1"] == status["users.username_1"] == "ready"
+    assert "'u1', 'u2'" in caplog.text and "x@example.com" in caplog.text
+
+
+def test_startup_indexes_are_not_rebuilt_in_the_background(db, monkeypatch):
+    built = []
+
+    async def create_index(collection_name, model):
+        built.append(collection_name)
+        server.index_build_status[f"{collection_name}.{model.document['name']}"] = "ready"
+
+    monkeypatch.setattr(server, "create_index", create_index)
+    monkeypatch.setattr(server, "TTL_PREREQUISITES", {})
+
+    async def run():
+        await server.ensure_startup_indexes()
+        startup = set(built)
+        built.clear()
+        await server.ensure_indexes()
+        return startup
+
+    startup = asyncio.run(run())
+    assert startup == set(server.STARTUP_INDEX_COLLECTIONS)
+    regular_in_background = {
+        name for name in built
+        if any("expireAfterSeconds" not in model.document for model in server.INDEX_SPECS[name])
+    }
+    assert "rollup_state" not in regular_in_background
+    assert "counters" not in regular_in_background
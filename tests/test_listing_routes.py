@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from search_index import SearchEngine
+
+
+def land(land_id: str, title: str, featured: bool = False) -> dict:
+    return {
+        "id": land_id, "title": title, "description": "Đất thổ cư", "land_type": "residential",
+        "status": "for_sale", "price": 1e9, "area": 100, "address": "1 Lê Lợi", "district": "Bình Thạnh",
+        "city": "Hồ Chí Minh", "legal_status": "Sổ đỏ", "contact_phone": "0900000000", "featured": featured,
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = AsyncMongoMockClient()["test"]
+    engine = SearchEngine(db, server.search_engine.boosts, server.search_engine.filters)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "search_engine", engine)
+    monkeypatch.setattr(server, "SEARCH_ENGINE_ENABLED", True)
+    server.response_cache.clear()
+
+    async def seed():
+        await db.lands.insert_many([land("l1", "Đất nền Thảo Điền", featured=True), land("l2", "Đất vườn Củ Chi")])
+        await engine.build()
+
+    asyncio.run(seed())
+    yield TestClient(server.app)
+    server.response_cache.clear()
+
+
+def test_lands_search_is_not_shadowed_by_the_detail_route(client):
+    response = client.get("/api/lands/search", params={"q": "thao dien"})
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == "l1"
+    assert server.search_engine.stats["queries"] == 1
+
+
+def test_lands_featured_is_not_shadowed_by_the_detail_route(client):
+    response = client.get("/api/lands/featured")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == ["l1"]
+
+
+def test_sims_search_is_not_shadowed_by_the_detail_route(client):
+    response = client.get("/api/sims/search", params={"q": "0909"})
+    assert response.status_code == 200
+    assert response.json() == []
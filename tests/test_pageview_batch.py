@@ -0,0 +1,43 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from write_behind import InsertQueue
+
+URL = "/api/analytics/pageviews:batch"
+
+
+def events(count: int) -> list:
+    return [
+        {"page_path": f"/p{i}", "user_agent": "ua", "ip_address": "1.2.3.4", "session_id": "s"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = InsertQueue(AsyncMongoMockClient()["test"], "pageviews", max_size=5, overflow="reject")
+    monkeypatch.setattr(server, "pageview_queue", queue)
+    return queue
+
+
+def test_batch_is_queued(queue):
+    response = TestClient(server.app).post(URL, content=json.dumps(events(3)), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 202
+    assert queue.depth() == 3
+
+
+def test_batch_that_does_not_fit_is_refused_whole(queue):
+    response = TestClient(server.app).post(URL, json=events(6))
+    assert response.status_code == 503
+    assert queue.depth() == 0
+
+
+def test_oversized_body_is_refused_before_parsing(queue, monkeypatch):
+    monkeypatch.setattr(server, "PAGEVIEW_BATCH_MAX_BYTES", 100)
+    response = TestClient(server.app).post(URL, json=events(3))
+    assert response.status_code == 413
+    assert queue.depth() == 0
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import ASCENDING, IndexModel
+
+from pageview_retention import TTL_INDEX_NAME, PageviewRetention
+from traffic_rollups import ROLLUP_STATE_ID, TrafficRollups
+
+
+def make_retention():
+    db = AsyncMongoMockClient()["test"]
+    rollups = TrafficRollups(db, lag=0)
+    return db, rollups, PageviewRetention(db, rollups, retention_days=1, interval=60)
+
+
+async def seed(db, age: timedelta):
+    await db.pageview_rollups.create_indexes([IndexModel(
+        [("granularity", ASCENDING), ("bucket", ASCENDING), ("page_path", ASCENDING)], unique=True
+    )])
+    await db.rollup_state.create_indexes([IndexModel([("id", ASCENDING)], unique=True)])
+    await db.pageviews.insert_one({"page_path": "/", "session_id": "s", "timestamp": datetime.utcnow() - age})
+
+
+def test_expiry_is_safe_once_rolled_up():
+    db, rollups, retention = make_retention()
+
+    async def run():
+        await seed(db, timedelta(days=2))
+        safe = await retention.run_once()
+        await retention.apply_expiry(safe)
+        return safe, await db.pageviews.index_information()
+
+    safe, indexes = asyncio.run(run())
+    assert safe
+    assert indexes[TTL_INDEX_NAME]["expireAfterSeconds"] == 86400
+
+
+def test_expiry_is_suspended_while_another_worker_holds_the_lease():
+    db, rollups, retention = make_retention()
+
+    async def run():
+        await seed(db, timedelta(days=2))
+        # Longer than the pageview's age: mongomock applies TTL expiry on reads
+        await db.pageviews.create_index([("timestamp", ASCENDING)], name=TTL_INDEX_NAME, expireAfterSeconds=7 * 86400)
+        await db.rollup_state.insert_one({
+            "id": ROLLUP_STATE_ID, "lease_owner": "other", "lease_until": datetime.utcnow() + timedelta(minutes=5),
+            "watermark": datetime.utcnow() - timedelta(days=3),
+        })
+        safe = await retention.run_once()
+        await retention.apply_expiry(safe)
+        return safe, await db.pageviews.index_information()
+
+    safe, indexes = asyncio.run(run())
+    assert not safe
+    assert TTL_INDEX_NAME not in indexes
+
+
+def test_expiry_is_safe_when_nothing_is_old_enough():
+    db, rollups, retention = make_retention()
+
+    async def run():
+        await seed(db, timedelta(hours=1))
+        return await retention.expiry_safe()
+
+    assert asyncio.run(run())
@@ -0,0 +1,49 @@
+import asyncio
+
+import bcrypt
+import pytest
+
+import server
+from password_hashing import HasherBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    hasher = PasswordHasher(max_workers=2)
+    monkeypatch.setattr(server, "password_hasher", hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_through_the_pool(hasher):
+    async def run():
+        hashed = await server.hash_password("mật khẩu 123")
+        return hashed, await server.verify_password("mật khẩu 123", hashed), \
+            await server.verify_password("wrong", hashed)
+
+    hashed, good, bad = asyncio.run(run())
+    assert hashed.startswith("$2b$")
+    assert good and not bad
+    assert hasher.metrics()["completed"] == 3
+
+
+@pytest.mark.parametrize("prefix", [b"2b", b"2a"])
+def test_legacy_hashes_still_verify(hasher, prefix):
+    # Written by the old inline bcrypt.hashpw call (and by other bcrypt libraries as $2a$)
+    legacy = bcrypt.hashpw(b"admin123", bcrypt.gensalt(rounds=4, prefix=prefix)).decode()
+    assert asyncio.run(server.verify_password("admin123", legacy))
+    assert not asyncio.run(server.verify_password("admin124", legacy))
+
+
+def test_full_queue_is_refused():
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+
+    async def run():
+        hashed = bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=4)).decode()
+        results = await asyncio.gather(*(hasher.verify("x", hashed) for _ in range(3)), return_exceptions=True)
+        return results
+
+    results = asyncio.run(run())
+    hasher.shutdown()
+    assert [isinstance(result, HasherBusy) for result in results] == [False, False, True]
+    assert hasher.stats["rejected"] == 1
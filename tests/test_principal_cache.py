@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import server
+from principal_cache import PrincipalCache
+from tests.conftest import make_user
+
+
+def bearer(user: dict) -> dict:
+    return {"Authorization": f"Bearer {server.create_access_token(server.token_claims(user))}"}
+
+
+def as_admin():
+    server.app.dependency_overrides[server.get_current_admin] = lambda: server.Principal(
+        id="admin", username="admin", role="admin", status="active"
+    )
+
+
+def seed(db, *users):
+    asyncio.run(db.users.insert_many([dict(user) for user in users]))
+
+
+def test_lru_ttl_and_invalidation_by_id():
+    cache = PrincipalCache(max_size=2, ttl=60)
+    for name in ("a", "b", "c"):
+        cache.put(name, {"id": f"id-{name}"}, cache.generation())
+    assert cache.get("a") is None  # evicted, least recently used
+    cache.invalidate("id-b")
+    assert cache.get("b") is None
+    assert cache.get("c") == {"id": "id-c"}
+
+    expired = PrincipalCache(ttl=-1)
+    expired.put("a", {"id": "id-a"}, expired.generation())
+    assert expired.get("a") is None
+
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = PrincipalCache()
+    generation = cache.generation()
+    cache.invalidate("id-a")  # the user changed while it was being loaded
+    cache.put("a", {"id": "id-a"}, generation)
+    assert cache.get("a") is None
+
+
+def test_authenticated_requests_reuse_the_cached_principal(auth_api):
+    client, db = auth_api
+    user = make_user()
+    seed(db, user)
+    for _ in range(3):
+        assert client.get("/api/auth/me", headers=bearer(user)).status_code == 200
+    assert server.principal_cache.stats == {"hits": 2, "misses": 1, "evictions": 0, "invalidations": 0}
+
+
+@pytest.mark.parametrize("change", [{"role": "admin"}, {"status": "suspended"}, {"hashed_password": "$2b$04$new"}])
+def test_update_member_evicts_on_role_status_and_password_changes(auth_api, change):
+    client, db = auth_api
+    user = make_user()
+    seed(db, user)
+    as_admin()
+    try:
+        assert client.get("/api/auth/me", headers=bearer(user)).status_code == 200
+        assert server.principal_cache.get(user["username"]) is not None
+        assert client.put(f"/api/admin/members/{user['id']}", json=change).status_code == 200
+        assert server.principal_cache.get(user["username"]) is None
+        # The old token no longer authorizes either
+        assert client.get("/api/auth/me", headers=bearer(user)).status_code == 401
+    finally:
+        server.app.dependency_overrides.clear()
+
+
+def test_update_user_profile_evicts_and_the_change_is_seen(auth_api):
+    client, db = auth_api
+    user = make_user(full_name="Old Name")
+    seed(db, user)
+    as_admin()
+    try:
+        assert client.get("/api/auth/me", headers=bearer(user)).json()["full_name"] == "Old Name"
+        response = client.put(f"/api/admin/users/{user['id']}", json={"full_name": "New Name"})
+        assert response.status_code == 200
+        assert client.get("/api/auth/me", headers=bearer(user)).json()["full_name"] == "New Name"
+
+        client.put(f"/api/admin/users/{user['id']}", json={"status": "suspended"})
+        assert server.principal_cache.get(user["username"]) is None
+        assert client.get("/api/auth/me", headers=bearer(user)).status_code in (401, 403)
+    finally:
+        server.app.dependency_overrides.clear()
@@ -0,0 +1,46 @@
+import pytest
+from starlette.datastructures import Headers
+
+from rate_limit import RateLimiter, RateLimitRule, parse_networks
+
+RULE = RateLimitRule.parse("login", "POST", ("/api/auth/login",), "2/60")
+
+
+def client_key(limiter: RateLimiter, peer: str, forwarded=None) -> str:
+    headers = Headers({"x-forwarded-for": forwarded} if forwarded else {})
+    return limiter.client_key(RULE, {"client": (peer, 1234)}, headers)
+
+
+def test_forwarded_for_is_used_from_a_trusted_proxy():
+    limiter = RateLimiter([RULE])
+    assert client_key(limiter, "10.0.0.5", "203.0.113.7") == "ip:203.0.113.7"
+
+
+def test_forwarded_for_is_ignored_from_untrusted_peers():
+    limiter = RateLimiter([RULE])
+    assert client_key(limiter, "198.51.100.2", "203.0.113.7") == "ip:198.51.100.2"
+
+
+def test_spoofed_hops_before_the_proxy_are_ignored():
+    limiter = RateLimiter([RULE], trusted_proxies=["10.0.0.0/8"])
+    # The client sent "1.1.1.1"; the proxy appended the address it saw
+    assert client_key(limiter, "10.0.0.5", "1.1.1.1, 203.0.113.7, 10.0.0.9") == "ip:203.0.113.7"
+
+
+def test_no_trusted_proxies():
+    limiter = RateLimiter([RULE], trusted_proxies=[])
+    assert client_key(limiter, "10.0.0.5", "203.0.113.7") == "ip:10.0.0.5"
+
+
+def test_bucket_throttles_after_capacity():
+    limiter = RateLimiter([RULE])
+    assert limiter.take(RULE, "ip:a") == 0
+    assert limiter.take(RULE, "ip:a") == 0
+    assert limiter.take(RULE, "ip:a") > 0
+    assert limiter.take(RULE, "ip:b") == 0
+
+
+def test_parse_networks():
+    assert parse_networks(" 10.0.0.0/8, 192.0.2.1 ,") == ["10.0.0.0/8", "192.0.2.1"]
+    with pytest.raises(ValueError):
+        parse_networks("proxy.internal")
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from refresh_sessions import REUSE_GRACE
+from tests.conftest import make_user
+
+
+class ReturnAfterSessions:
+    """mongomock re-reads a ReturnDocument.AFTER result by the original filter unless
+    _id is projected, so a rotation (which changes the filtered token_hash) returns
+    None there; real Mongo returns the updated document. Keep _id in the projection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one_and_update(self, filter, update, projection=None, **kwargs):
+        projection = {field: value for field, value in (projection or {}).items() if field != "_id"}
+        document = await self.collection.find_one_and_update(filter, update, projection=projection or None, **kwargs)
+        if document is not None:
+            document.pop("_id", None)
+        return document
+
+
+@pytest.fixture(autouse=True)
+def sessions(auth_api):
+    server.session_store.sessions = ReturnAfterSessions(server.session_store.sessions)
+
+
+def login(client, db, **fields) -> dict:
+    asyncio.run(db.users.insert_one(make_user(**fields)))
+    response = client.post("/api/auth/login", json={"username": "member1", "password": "secret123"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client, token: str):
+    return client.post("/api/auth/refresh", json={"refresh_token": token})
+
+
+def age_sessions(db, seconds: float):
+    """Move last use back in time, past the reuse grace period"""
+    asyncio.run(db.sessions.update_many({}, {"$set": {"last_used_at": datetime.utcnow() - timedelta(seconds=seconds)}}))
+
+
+def test_refresh_rotates_the_token(auth_api):
+    client, db = auth_api
+    first = login(client, db)["refresh_token"]
+    response = refresh(client, first)
+    assert response.status_code == 200
+    second = response.json()["refresh_token"]
+    assert second != first
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).status_code == 200
+    assert refresh(client, second).status_code == 200
+    stored = asyncio.run(db.sessions.find_one({}))
+    assert first not in str(stored) and second not in str(stored)  # only hashes are stored
+
+
+def test_reused_old_token_kills_the_session(auth_api):
+    client, db = auth_api
+    stolen = login(client, db)["refresh_token"]
+    current = refresh(client, stolen).json()["refresh_token"]
+    age_sessions(db, REUSE_GRACE.total_seconds() + 1)
+
+    response = refresh(client, stolen)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Session has been revoked, please log in again"
+    # The legitimate holder's token died with the session
+    assert refresh(client, current).status_code == 401
+    assert asyncio.run(db.sessions.count_documents({})) == 0
+    assert server.session_store.stats["reuse_detected"] == 1
+
+
+def test_reuse_within_the_grace_period_keeps_the_session(auth_api):
+    client, db = auth_api
+    first = login(client, db)["refresh_token"]
+    current = refresh(client, first).json()["refresh_token"]
+    assert refresh(client, first).status_code == 401  # two tabs raced
+    assert refresh(client, current).status_code == 200
+
+
+def test_version_bump_ends_the_session(auth_api):
+    client, db = auth_api
+    token = login(client, db)["refresh_token"]
+    asyncio.run(server.token_revocations.revoke("id-member1", "active"))
+    assert refresh(client, token).status_code == 401
+    assert asyncio.run(db.sessions.count_documents({})) == 0
+
+
+def test_logout_ends_the_session(auth_api):
+    client, db = auth_api
+    token = login(client, db)["refresh_token"]
+    assert client.post("/api/auth/logout", json={"refresh_token": token}).status_code == 200
+    assert refresh(client, token).status_code == 401
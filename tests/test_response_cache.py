@@ -0,0 +1,98 @@
+import asyncio
+
+from response_cache import MISS, ResponseCache
+
+
+def make_endpoint(cache: ResponseCache, calls: list, ttl: float = 60):
+    @cache.cached(ttl=ttl, tags=["properties"])
+    async def featured(limit: int = 6):
+        calls.append(limit)
+        return [f"p{i}" for i in range(limit)]
+    return featured
+
+
+def test_hits_are_served_from_the_cache_per_parameters():
+    cache, calls = ResponseCache(), []
+    featured = make_endpoint(cache, calls)
+
+    async def run():
+        return [await featured(limit=2), await featured(limit=2), await featured(limit=3)]
+
+    assert asyncio.run(run()) == [["p0", "p1"], ["p0", "p1"], ["p0", "p1", "p2"]]
+    assert calls == [2, 3]
+    assert cache.metrics()["hits"] == 1
+
+
+def test_invalidate_drops_tagged_entries():
+    cache, calls = ResponseCache(), []
+    featured = make_endpoint(cache, calls)
+
+    async def run():
+        await featured(limit=2)
+        cache.invalidate("lands")
+        await featured(limit=2)
+        cache.invalidate("properties")
+        await featured(limit=2)
+
+    asyncio.run(run())
+    assert calls == [2, 2]
+
+
+def test_result_computed_across_an_invalidation_is_not_stored():
+    cache = ResponseCache()
+
+    @cache.cached(ttl=60, tags=["settings"])
+    async def settings():
+        cache.invalidate("settings")  # a write lands while the read is in flight
+        return {"site_name": "old"}
+
+    asyncio.run(settings())
+    assert cache.metrics()["size"] == 0
+
+
+def test_expired_and_evicted_entries():
+    cache = ResponseCache(max_size=2)
+    cache.put(("a",), 1, ttl=-1, tags=(), generation=0)
+    assert cache.get(("a",)) is MISS
+    for key in "bcd":
+        cache.put((key,), key, ttl=60, tags=(), generation=0)
+    assert cache.get(("b",)) is MISS
+    assert cache.get(("d",)) == "d"
+    assert cache.stats["evictions"] == 1
+
+
+def test_none_results_are_cached():
+    cache, calls = ResponseCache(), []
+
+    @cache.cached(ttl=60, tags=["settings"])
+    async def settings():
+        calls.append(1)
+        return None
+
+    async def run():
+        return [await settings(), await settings()]
+
+    assert asyncio.run(run()) == [None, None]
+    assert calls == [1]
+
+
+def test_stats_reflect_a_new_ticket_immediately(monkeypatch):
+    from fastapi.testclient import TestClient
+    from mongomock_motor import AsyncMongoMockClient
+
+    import server
+    from counters import Counters
+    from traffic_rollups import TrafficRollups
+
+    db = AsyncMongoMockClient()["test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "counters", Counters(db, server.counters.tracked))
+    monkeypatch.setattr(server, "traffic_rollups", TrafficRollups(db))
+    server.response_cache.clear()
+    client = TestClient(server.app)
+
+    assert client.get("/api/stats").json()["total_tickets"] == 0
+    ticket = {"name": "An", "email": "an@example.com", "subject": "Hỏi giá", "message": "..."}
+    assert client.post("/api/tickets", json=ticket).status_code == 200
+    assert client.get("/api/stats").json()["total_tickets"] == 1
+    server.response_cache.clear()
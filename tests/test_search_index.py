@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from search_index import SearchEngine, SearchIndex, _within_one_edit
+
+BOOSTS = {"title": 3.0, "description": 1.0}
+
+
+def build_index(docs):
+    index = SearchIndex(BOOSTS)
+    for doc_id, title, description in docs:
+        index.add(doc_id, {"title": title, "description": description})
+    return index
+
+
+def ids(hits):
+    return [doc_id for doc_id, _ in hits]
+
+
+def test_title_matches_outrank_description_matches():
+    index = build_index([
+        ("a", "Căn hộ", "gần chợ Bình Thạnh"),
+        ("b", "Nhà phố Bình Thạnh", "mặt tiền"),
+        ("c", "Biệt thự", "Thảo Điền"),
+    ])
+    assert ids(index.search("binh thanh", 10)) == ["b", "a"]
+
+
+def test_diacritics_and_one_typo_still_match():
+    index = build_index([("a", "Nhà Bình Thạnh", ""), ("b", "Căn hộ Gò Vấp", "")])
+    assert ids(index.search("bình thạnh", 10)) == ["a"]
+    assert ids(index.search("binh thnah", 10)) == ["a"]
+    assert index.search("xyzzy", 10) == []
+
+
+def test_within_one_edit():
+    assert _within_one_edit("thanh", "thnah")  # transposition
+    assert _within_one_edit("thanh", "than")  # deletion
+    assert _within_one_edit("thanh", "thamh")  # substitution
+    assert not _within_one_edit("thanh", "tahnt")
+
+
+def test_paging_is_consistent():
+    index = build_index([(str(i), f"nhà {'đẹp ' * i}", "") for i in range(1, 11)])
+    everything = ids(index.search("dep", 10))
+    assert ids(index.search("dep", 3)) == everything[:3]
+    assert ids(index.search("dep", 3, offset=3)) == everything[3:6]
+    assert ids(index.search("dep", 10, offset=8)) == everything[8:]
+
+
+def test_readding_replaces_and_removing_drops():
+    index = build_index([("a", "Căn hộ Quận 7", ""), ("b", "Căn hộ Quận 1", "")])
+    index.add("a", {"title": "Biệt thự"})
+    assert ids(index.search("can ho", 10)) == ["b"]
+    assert index.remove("b")
+    assert not index.remove("b")
+    assert index.search("can ho", 10) == []
+    assert len(index) == 1
+
+
+def test_compaction_keeps_results():
+    index = build_index([(str(i), f"căn hộ {i}", "") for i in range(3000)])
+    for i in range(2000):
+        index.remove(str(i))
+    assert index.metrics()["removed_pending_compaction"] < 2000
+    assert ids(index.search("2500", 10)) == ["2500"]
+    assert len(index.search("can ho", 5000)) == 1000
+
+
+def test_engine_keeps_filtered_out_documents_out_of_pages():
+    db = AsyncMongoMockClient()["test"]
+    engine = SearchEngine(
+        db, {"news_articles": {"title": 1.0}}, filters={"news_articles": {"published": True}}
+    )
+    now = datetime.utcnow()
+
+    async def run():
+        await db.news_articles.insert_many([
+            {"id": f"n{i}", "title": f"thị trường {i}", "published": i % 2 == 0, "updated_at": now}
+            for i in range(10)
+        ] + [{"title": "thị trường không có id", "published": True, "updated_at": now}])
+        await engine.build()
+        first = engine.search("news_articles", "thi truong", 3)
+        second = engine.search("news_articles", "thi truong", 3, offset=3)
+
+        engine.index("news_articles", {"id": "n0", "title": "thị trường 0", "published": False})
+        unpublished = engine.search("news_articles", "thi truong", 10)
+        return first, second, unpublished
+
+    first, second, unpublished = asyncio.run(run())
+    assert len(first) == 3 and len(second) == 2
+    assert {doc_id for doc_id, _ in first + second} == {"n0", "n2", "n4", "n6", "n8"}
+    assert "n0" not in ids(unpublished)
@@ -0,0 +1,15 @@
+from search_text import search_text, text_query
+
+
+def test_text_query_requires_every_folded_token():
+    assert text_query("Quận 1") == '"quan" "1"'
+    assert text_query("  Đống-Đa!! ") == '"dong" "da"'
+
+
+def test_text_query_without_tokens_is_empty():
+    assert text_query("?! -") == ""
+
+
+def test_search_text_folds_searchable_fields():
+    doc = {"title": "Căn hộ", "district": "Quận 1", "city": "Hồ Chí Minh", "price": 5}
+    assert search_text(doc) == "can ho quan 1 ho chi minh"
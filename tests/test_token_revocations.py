@@ -0,0 +1,68 @@
+import asyncio
+
+import server
+from tests.conftest import make_user
+from token_revocations import TokenRevocations
+
+
+def bearer(user: dict, **claims) -> dict:
+    token = server.create_access_token({**server.token_claims(user), **claims})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_claims_carry_identity_role_status_and_version():
+    user = make_user(role="admin", token_version=3)
+    assert server.token_claims(user) == {
+        "sub": "member1", "uid": "id-member1", "role": "admin", "status": "active", "ver": 3,
+    }
+
+
+def test_bumped_version_rejects_older_tokens(auth_api):
+    client, db = auth_api
+    user = make_user()
+    asyncio.run(db.users.insert_one(dict(user)))
+    asyncio.run(server.token_revocations.refresh())
+    old = bearer(user)
+    assert client.get("/api/auth/me", headers=old).status_code == 200
+
+    version = asyncio.run(server.token_revocations.revoke(user["id"], "active"))
+    response = client.get("/api/auth/me", headers=old)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    assert client.get("/api/auth/me", headers=bearer(user, ver=version)).status_code == 200
+
+
+def test_revocation_by_another_worker_is_seen_after_refresh(auth_api):
+    client, db = auth_api
+    user = make_user()
+    asyncio.run(db.users.insert_one(dict(user)))
+    asyncio.run(server.token_revocations.refresh())
+
+    asyncio.run(TokenRevocations(db).revoke(user["id"], "suspended"))
+    assert client.get("/api/auth/me", headers=bearer(user)).status_code == 200  # not refreshed yet
+    asyncio.run(server.token_revocations.refresh())
+    assert client.get("/api/auth/me", headers=bearer(user)).status_code == 401
+    # A token issued at the new version is still refused while the account is suspended
+    assert client.get("/api/auth/me", headers=bearer(user, ver=1)).status_code == 403
+
+
+def test_principal_from_claims_needs_no_user_lookup(auth_api):
+    client, db = auth_api
+    user = make_user(role="admin")
+    asyncio.run(db.users.insert_one(dict(user)))
+    asyncio.run(server.token_revocations.refresh())
+
+    asyncio.run(db.users.delete_one({"id": user["id"]}))  # only the token is consulted
+    assert client.get("/api/admin/auth/principals", headers=bearer(user)).status_code == 200
+    assert client.get("/api/admin/auth/principals", headers=bearer(user, role="member")).status_code == 403
+
+
+def test_suspending_through_the_admin_api_revokes_tokens(auth_api):
+    client, db = auth_api
+    admin, member = make_user("admin1", role="admin"), make_user()
+    asyncio.run(db.users.insert_many([dict(admin), dict(member)]))
+    asyncio.run(server.token_revocations.refresh())
+
+    response = client.put(f"/api/admin/users/{member['id']}", json={"status": "suspended"}, headers=bearer(admin))
+    assert response.status_code == 200
+    assert client.get("/api/auth/me", headers=bearer(member)).status_code == 401
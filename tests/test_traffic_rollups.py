@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo import ASCENDING, IndexModel
+
+from traffic_rollups import ROLLUP_STATE_ID, SITE_PATH, TrafficRollups, bucket_start
+
+
+def make_rollups():
+    db = AsyncMongoMockClient()["test"]
+    return db, TrafficRollups(db, lag=0)
+
+
+async def seed(db, hour: datetime):
+    await db.pageview_rollups.create_indexes([IndexModel(
+        [("granularity", ASCENDING), ("bucket", ASCENDING), ("page_path", ASCENDING)], unique=True
+    )])
+    await db.rollup_state.create_indexes([IndexModel([("id", ASCENDING)], unique=True)])
+    await db.pageviews.insert_many([
+        {"page_path": f"/p{i % 3}", "session_id": f"s{i % 7}", "timestamp": hour + timedelta(minutes=i)}
+        for i in range(30)
+    ])
+
+
+async def site_views(db, granularity: str) -> int:
+    row = await db.pageview_rollups.find_one({"granularity": granularity, "page_path": SITE_PATH})
+    return row["views"]
+
+
+def test_rollup_counts_views_and_visitors():
+    db, rollups = make_rollups()
+    hour = bucket_start(datetime.utcnow() - timedelta(hours=3), "hour")
+
+    async def run():
+        await seed(db, hour)
+        processed = await rollups.run_once()
+        return processed, await site_views(db, "hour"), await site_views(db, "day"), \
+            await rollups.site_totals(hour)
+
+    processed, hourly, daily, totals = asyncio.run(run())
+    assert processed == 30
+    assert hourly == daily == 30
+    assert totals == {"views": 30, "unique_visitors": 7}
+
+
+def test_interrupted_window_is_not_counted_twice():
+    db, rollups = make_rollups()
+    hour = bucket_start(datetime.utcnow() - timedelta(hours=3), "hour")
+
+    async def run():
+        await seed(db, hour)
+        await rollups.run_once()
+        # Simulate a crash after the first window's rows were written but before
+        # the watermark moved past it
+        await db.rollup_state.update_one(
+            {"id": ROLLUP_STATE_ID},
+            {"$set": {"watermark": hour, "pending_end": hour + timedelta(hours=1)}}
+        )
+        await rollups.run_once()
+        return await site_views(db, "hour"), await site_views(db, "day")
+
+    assert asyncio.run(run()) == (30, 30)
+
+
+def test_lost_lease_stops_the_run():
+    db, rollups = make_rollups()
+    hour = bucket_start(datetime.utcnow() - timedelta(hours=3), "hour")
+
+    async def run():
+        await seed(db, hour)
+        await rollups.run_once()
+        await db.rollup_state.update_one(
+            {"id": ROLLUP_STATE_ID},
+            {"$set": {"lease_owner": "other", "lease_until": datetime.utcnow() + timedelta(minutes=5)}}
+        )
+        await db.pageviews.insert_one({"page_path": "/p0", "session_id": "x", "timestamp": datetime.utcnow()})
+        return await rollups.run_once()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_hourly_queries_read_the_hourly_rows():
+    db, rollups = make_rollups()
+    # Two hours that fall in the same day bucket
+    hour = bucket_start(datetime.utcnow() - timedelta(hours=3), "hour")
+    if hour.hour == 23:
+        hour -= timedelta(hours=1)
+    later = hour + timedelta(hours=1)
+
+    async def run():
+        await seed(db, hour)
+        await db.pageviews.insert_many([
+            {"page_path": "/late", "session_id": "s", "timestamp": later + timedelta(minutes=i)}
+            for i in range(5)
+        ])
+        await rollups.run_once()
+        series = await rollups.site_series(hour, lambda bucket: bucket.strftime("%H"), "hour")
+        return series, await rollups.popular_pages(later, 10, "hour"), await rollups.popular_pages(later, 10)
+
+    series, last_hour, same_day = asyncio.run(run())
+    assert [(row["_id"], row["views"]) for row in series] == [(hour.strftime("%H"), 30), (later.strftime("%H"), 5)]
+    assert [page["_id"] for page in last_hour] == ["/late"]
+    assert len(same_day) == 4
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from starlette.requests import Request
+
+from blob_store import LocalBlobStore
+from uploads import UploadError, UploadLimits, stream_upload
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+BOUNDARY = "boundary42"
+LIMITS = UploadLimits(max_file_size=1024, max_request_size=8192, max_files=5)
+
+
+def multipart(files) -> bytes:
+    body = b""
+    for filename, data in files:
+        body += (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def make_request(body: bytes) -> Request:
+    chunks = [body[i:i + 64] for i in range(0, len(body), 64)]
+
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b""
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/uploads",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode())],
+    }, receive)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LocalBlobStore(AsyncMongoMockClient()["test"], tmp_path / "media")
+
+
+def stored_files(store):
+    return [path for path in store.root.rglob("*") if path.is_file()]
+
+
+def test_valid_parts_are_committed(store):
+    uploaded = asyncio.run(stream_upload(make_request(multipart([("a.png", PNG)])), store, LIMITS))
+    assert [blob.content_type for blob in uploaded] == ["image/png"]
+    assert len(stored_files(store)) == 1
+
+
+@pytest.mark.parametrize("second, status", [
+    (b"<html></html>", 415),
+    (b"\x89PNG\r\n\x1a\n" + b"\x00" * 2048, 413),
+], ids=["not-an-image", "too-large"])
+def test_rejected_part_leaves_earlier_parts_uncommitted(store, second, status):
+    body = multipart([("a.png", PNG), ("b.png", second)])
+    with pytest.raises(UploadError) as raised:
+        asyncio.run(stream_upload(make_request(body), store, LIMITS))
+    assert raised.value.status_code == status
+
+    async def blob_count():
+        return await store.db.blobs.count_documents({})
+
+    assert asyncio.run(blob_count()) == 0
+    assert stored_files(store) == []
+
+
+@pytest.mark.parametrize("body", [
+    b"not a multipart body",
+    multipart([("a.png", PNG), ("b.png", PNG)])[:-40],
+], ids=["malformed", "truncated"])
+def test_unparseable_body_is_a_client_error(store, body):
+    with pytest.raises(UploadError) as raised:
+        asyncio.run(stream_upload(make_request(body), store, LIMITS))
+    assert raised.value.status_code == 400
+    assert stored_files(store) == []
@@ -0,0 +1,124 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import BulkWriteError
+
+from write_behind import InsertQueue, ViewCounterBuffer
+
+
+class FlakyCollection:
+    """bulk_write that applies every operation except the given indexes"""
+
+    def __init__(self, collection, failing):
+        self.collection = collection
+        self.failing = failing
+
+    async def bulk_write(self, operations, ordered=True):
+        applied = [op for index, op in enumerate(operations) if index not in self.failing]
+        await self.collection.bulk_write(applied, ordered=ordered)
+        raise BulkWriteError({"writeErrors": [{"index": index, "code": 1} for index in self.failing]})
+
+
+class FlakyDb:
+    def __init__(self, db, failing):
+        self.db = db
+        self.failing = failing
+
+    def __getitem__(self, name):
+        return FlakyCollection(self.db[name], self.failing)
+
+
+def views(db, ids):
+    async def read():
+        docs = await db.properties.find({"id": {"$in": ids}}).to_list(None)
+        return {doc["id"]: doc["views"] for doc in docs}
+    return asyncio.run(read())
+
+
+def test_partial_bulk_failure_retries_only_failed_updates():
+    db = AsyncMongoMockClient()["test"]
+    asyncio.run(db.properties.insert_many([{"id": name, "views": 0} for name in "abc"]))
+    buffer = ViewCounterBuffer(FlakyDb(db, failing={1}))
+    for name in "abc":
+        buffer.increment("properties", name)
+        buffer.increment("properties", name)
+
+    asyncio.run(buffer.flush())
+    assert views(db, list("abc")) == {"a": 2, "b": 0, "c": 2}
+    assert buffer.pending("properties", "b") == 2
+    assert buffer.pending("properties", "a") == 0
+
+    buffer.db = db
+    asyncio.run(buffer.flush())
+    assert views(db, list("abc")) == {"a": 2, "b": 2, "c": 2}
+
+
+class SlowDb:
+    """bulk_write that signals when it starts and takes a while"""
+
+    def __init__(self, db):
+        self.db = db
+        self.started = asyncio.Event()
+
+    def __getitem__(self, name):
+        slow = self
+
+        class SlowCollection:
+            async def bulk_write(self, operations, ordered=True):
+                slow.started.set()
+                await asyncio.sleep(0.05)
+                return await slow.db[name].bulk_write(operations, ordered=ordered)
+
+        return SlowCollection()
+
+
+def test_stop_during_flush_keeps_increments():
+    db = AsyncMongoMockClient()["test"]
+
+    async def run():
+        await db.properties.insert_one({"id": "a", "views": 0})
+        slow_db = SlowDb(db)
+        buffer = ViewCounterBuffer(slow_db, flush_interval=0.01)
+        buffer.start()
+        buffer.increment("properties", "a")
+        await slow_db.started.wait()
+        await buffer.stop()
+        return (await db.properties.find_one({"id": "a"}))["views"]
+
+    assert asyncio.run(run()) == 1
+
+
+class BrokenOnceDb:
+    """insert_many that raises a non-Mongo error for the first batch"""
+
+    def __init__(self, db):
+        self.db = db
+        self.calls = 0
+
+    def __getitem__(self, name):
+        return self
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.calls == 1:
+            raise ValueError("cannot encode object")
+        await self.db.pageviews.insert_many(documents, ordered=ordered)
+
+
+def test_insert_loop_survives_unexpected_errors():
+    db = AsyncMongoMockClient()["test"]
+    queue = InsertQueue(BrokenOnceDb(db), "pageviews", flush_interval=0.01)
+
+    async def run():
+        queue.start()
+        queue.offer({"page_path": "/a"})
+        await asyncio.sleep(0.05)
+        queue.offer({"page_path": "/b"})
+        await asyncio.sleep(0.05)
+        assert not queue._task.done()
+        await queue.stop()
+        return await db.pageviews.distinct("page_path")
+
+    assert asyncio.run(run()) == ["/b"]
+    assert queue.stats["failed"] == 1
+    assert queue.stats["written"] == 1